@@ -0,0 +1,208 @@
+import os
+import json
+import zlib
+import struct
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional
+
+import numpy as np
+
+from app.core.db import InMemoryDB, LibrarySnapshot
+from app.models.chunk_models import Chunk
+from app.models.library_models import Library
+from app.models.metadata_models import ChunkMetadata
+from app.utils.indexing.index_type import IndexType
+
+MAGIC = b"VDBK"
+FORMAT_VERSION = 1
+# Chunks per chunk record and its vector record
+BACKUP_BLOCK_ROWS = int(os.getenv("BACKUP_BLOCK_ROWS", "1024"))
+
+# Stream: MAGIC, u16 format version, then records of kind, u32 payload length, payload, u32 crc32 of the payload
+_VERSION = struct.Struct("<H")
+_RECORD_HEADER = struct.Struct("<cI")
+_CHECKSUM = struct.Struct("<I")
+
+BEGIN = b"B"  # JSON: format, created_at, change-log seq at the start of the backup
+LIBRARY = b"L"  # JSON: library header, index type, version, dimension, chunk count, saved index layout
+CHUNKS = b"C"  # JSON: [id, document_id, text, metadata, duplicate_of] per chunk
+VECTORS = b"V"  # little-endian float32 rows, one per chunk of the preceding chunk record
+END = b"E"  # JSON: library and chunk counts
+
+
+class BackupFormatError(ValueError):
+    pass
+
+
+class RestoredLibrary(NamedTuple):
+    library: Library
+    index_type: IndexType
+    layout: Optional[Dict[str, Any]]
+
+
+def _record(kind: bytes, payload: bytes) -> bytes:
+    return _RECORD_HEADER.pack(kind, len(payload)) + payload + _CHECKSUM.pack(zlib.crc32(payload))
+
+
+def _json_record(kind: bytes, value: Any) -> bytes:
+    return _record(kind, json.dumps(value, separators=(",", ":")).encode())
+
+
+def encode_backup(database: InMemoryDB, library_ids: Optional[List[str]] = None) -> Iterator[bytes]:
+    """
+    Stream a backup of the given libraries (all by default). Each library is written from a
+    snapshot of one version, taken without holding the DB lock while encoding; the begin
+    record carries the change-log seq from before the first snapshot.
+    """
+    seq = database.changes.last_seq
+    if library_ids is None:
+        library_ids = [library.id for library in database.list_libraries()]
+    yield MAGIC + _VERSION.pack(FORMAT_VERSION)
+    yield _json_record(BEGIN, {
+        "format": FORMAT_VERSION, "created_at": datetime.now(timezone.utc).isoformat(), "seq": seq,
+    })
+    libraries = chunks = 0
+    for library_id in library_ids:
+        snapshot = database.snapshot_library(library_id, with_layout=True)
+        if snapshot is None:
+            continue  # deleted meanwhile
+        yield from _encode_library(snapshot)
+        libraries += 1
+        chunks += len(snapshot.chunks)
+    yield _json_record(END, {"libraries": libraries, "chunks": chunks})
+
+
+def _encode_library(snapshot: LibrarySnapshot) -> Iterator[bytes]:
+    dimension = len(snapshot.chunks[0].embedding) if snapshot.chunks else 0
+    yield _json_record(LIBRARY, {
+        "library": snapshot.header,
+        "index_type": snapshot.index_type.value,
+        "version": snapshot.version,
+        "dimension": dimension,
+        "chunks": len(snapshot.chunks),
+        "layout": snapshot.layout,
+    })
+    for start in range(0, len(snapshot.chunks), BACKUP_BLOCK_ROWS):
+        block = snapshot.chunks[start:start + BACKUP_BLOCK_ROWS]
+        yield _json_record(CHUNKS, [
+            [chunk.id, chunk.document_id, chunk.text, chunk.metadata.model_dump() if chunk.metadata else None,
+             chunk.duplicate_of]
+            for chunk in block
+        ])
+        matrix = np.asarray([chunk.embedding for chunk in block], dtype="<f4").reshape(len(block), dimension)
+        yield _record(VECTORS, matrix.tobytes())
+
+
+class BackupReader:
+    """
+    Incremental decoder: `feed` the stream as it arrives, then `finish`. Records are checked
+    against their checksums as they complete, and chunks are built straight from the decoded
+    rows without validating each one. Raises BackupFormatError on any inconsistency.
+    """
+    def __init__(self):
+        self.info: Optional[Dict[str, Any]] = None
+        self.libraries: List[RestoredLibrary] = []
+        self._buffer = bytearray()
+        self._started = False
+        self._ended = False
+        self._current: Optional[Dict[str, Any]] = None  # library being read
+        self._rows: Optional[List[list]] = None  # chunk record waiting for its vectors
+
+    def feed(self, data: bytes):
+        self._buffer += data
+        if not self._started:
+            prefix = len(MAGIC) + _VERSION.size
+            if len(self._buffer) < prefix:
+                return
+            if self._buffer[:len(MAGIC)] != MAGIC:
+                raise BackupFormatError("Not a backup stream")
+            version = _VERSION.unpack_from(self._buffer, len(MAGIC))[0]
+            if version != FORMAT_VERSION:
+                raise BackupFormatError(f"Unsupported backup format {version}")
+            del self._buffer[:prefix]
+            self._started = True
+        while len(self._buffer) >= _RECORD_HEADER.size:
+            kind, length = _RECORD_HEADER.unpack_from(self._buffer)
+            end = _RECORD_HEADER.size + length
+            if len(self._buffer) < end + _CHECKSUM.size:
+                return
+            payload = bytes(self._buffer[_RECORD_HEADER.size:end])
+            if zlib.crc32(payload) != _CHECKSUM.unpack_from(self._buffer, end)[0]:
+                raise BackupFormatError(f"Checksum mismatch in {kind.decode(errors='replace')} record")
+            del self._buffer[:end + _CHECKSUM.size]
+            self._handle(kind, payload)
+
+    def finish(self):
+        if not self._ended or self._buffer:
+            raise BackupFormatError("Backup stream is truncated")
+
+    def _handle(self, kind: bytes, payload: bytes):
+        if self._ended:
+            raise BackupFormatError("Data after the end record")
+        if kind == VECTORS:
+            self._add_vectors(payload)
+            return
+        try:
+            value = json.loads(payload)
+        except ValueError:
+            raise BackupFormatError(f"Malformed {kind.decode(errors='replace')} record")
+        if kind == BEGIN:
+            self.info = value
+        elif kind == LIBRARY:
+            self._expect_library_boundary()
+            self._current = value
+            self._current["chunk_map"] = {}
+            self._complete_library()
+        elif kind == CHUNKS:
+            if self._current is None or self._rows is not None:
+                raise BackupFormatError("Chunk record out of place")
+            self._rows = value
+        elif kind == END:
+            self._expect_library_boundary()
+            chunks = sum(len(restored.library.chunk_map) for restored in self.libraries)
+            if value != {"libraries": len(self.libraries), "chunks": chunks}:
+                raise BackupFormatError("Backup contents do not match its end record")
+            self._ended = True
+        else:
+            raise BackupFormatError(f"Unknown record kind {kind!r}")
+
+    def _expect_library_boundary(self):
+        if self.info is None or self._current is not None:
+            raise BackupFormatError("Library record out of place")
+
+    def _add_vectors(self, payload: bytes):
+        rows, current = self._rows, self._current
+        if rows is None:
+            raise BackupFormatError("Vector record without chunks")
+        dimension = current["dimension"]
+        if len(payload) != len(rows) * dimension * 4:
+            raise BackupFormatError("Vector record does not match its chunks")
+        vectors = np.frombuffer(payload, dtype="<f4").reshape(len(rows), dimension).astype(np.float64).tolist()
+        chunk_map = current["chunk_map"]
+        for (chunk_id, document_id, text, metadata, duplicate_of), vector in zip(rows, vectors):
+            chunk_map[chunk_id] = Chunk.model_construct(
+                id=chunk_id,
+                text=text,
+                document_id=document_id,
+                embedding=vector,
+                metadata=ChunkMetadata.model_construct(**metadata) if metadata else None,
+                duplicate_of=duplicate_of,
+            )
+        self._rows = None
+        self._complete_library()
+
+    def _complete_library(self):
+        current = self._current
+        if len(current["chunk_map"]) < current["chunks"]:
+            return
+        # Headers are validated once per library; chunks were built unvalidated above
+        library = Library(**current["library"])
+        library.chunk_map = current["chunk_map"]
+        self.libraries.append(RestoredLibrary(library, IndexType(current["index_type"]), current["layout"]))
+        self._current = None
+
+
+def restore_backup(database: InMemoryDB, libraries: List[RestoredLibrary]):
+    """Install decoded libraries, replacing existing ones with the same ids."""
+    for restored in libraries:
+        database.restore_library(restored.library, restored.index_type, restored.layout)
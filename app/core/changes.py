@@ -0,0 +1,149 @@
+import os
+import logging
+from bisect import bisect_right
+from collections import deque
+from datetime import datetime, timezone
+from itertools import islice
+from operator import attrgetter
+from pathlib import Path
+from threading import Condition
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+from app.models.change_models import Change, ChangeEntity, ChangeOp
+from app.models.library_models import Library
+
+logger = logging.getLogger(__name__)
+
+# How many of the most recent changes stay readable; older `since` values must resync
+CHANGE_FEED_MAX_ENTRIES = int(os.getenv("CHANGE_FEED_MAX_ENTRIES", "10000"))
+
+_seq = attrgetter("seq")
+
+
+class Mutation(NamedTuple):
+    """A change to record, before it is given a sequence number."""
+    entity: ChangeEntity
+    op: ChangeOp
+    entity_id: str
+    document_id: Optional[str] = None
+
+
+class ChangeLog:
+    """
+    Every mutation gets the next sequence number, global across libraries. The last
+    `max_entries` changes are kept in a ring and appended to a JSON lines file, so the
+    feed and its numbering survive restarts; the file is rewritten from the ring once it
+    holds twice that many lines. Readers block in `wait` for new changes (long-polling).
+    Without a path the log lives in memory only. Unreadable lines are skipped on load, which
+    leaves gaps in the ring; reads that would cross one ask the caller to resync.
+    """
+    def __init__(self, path: Optional[Path], max_entries: int = CHANGE_FEED_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._entries: deque = deque(maxlen=max_entries)
+        self._seq = 0
+        self._lines_on_disk = 0
+        self._cond = Condition()
+        self._load()
+
+    def _load(self):
+        if self.path is None or not self.path.exists():
+            return
+        with open(self.path, "r") as f:
+            for line in f:
+                try:
+                    self._entries.append(Change.model_validate_json(line))
+                except ValueError:
+                    logger.warning(f"Skipping unreadable change feed line in {self.path}")
+                    continue
+                self._lines_on_disk += 1
+        if self._entries:
+            self._seq = self._entries[-1].seq
+
+    def _append_to_disk(self, changes: List[Change]):
+        if self.path is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if self._lines_on_disk + len(changes) > 2 * self.max_entries:
+            # Compact: the ring already holds the new changes, so rewriting it is enough
+            tmp = self.path.with_name(self.path.name + ".tmp")
+            with open(tmp, "w") as f:
+                f.writelines(change.model_dump_json() + "\n" for change in self._entries)
+            os.replace(tmp, self.path)
+            self._lines_on_disk = len(self._entries)
+            return
+        with open(self.path, "a") as f:
+            f.writelines(change.model_dump_json() + "\n" for change in changes)
+        self._lines_on_disk += len(changes)
+
+    @property
+    def last_seq(self) -> int:
+        return self._seq
+
+    def record(self, library_id: str, mutations: List[Mutation]) -> List[Change]:
+        if not mutations:
+            return []
+        timestamp = datetime.now(timezone.utc).isoformat()
+        with self._cond:
+            changes = []
+            for mutation in mutations:
+                self._seq += 1
+                changes.append(Change(seq=self._seq, library_id=library_id, timestamp=timestamp, **mutation._asdict()))
+            self._entries.extend(changes)
+            self._append_to_disk(changes)
+            self._cond.notify_all()
+            return changes
+
+    def read(self, library_id: Optional[str], since: int, limit: int) -> Tuple[List[Change], int, bool]:
+        """
+        Up to `limit` changes of the library (of all libraries for None) with seq > since, the `since` to resume from
+        and whether more are pending. Raises ValueError when changes after `since` have
+        already left the ring (or `since` is from the future), i.e. the caller must resync.
+        """
+        with self._cond:
+            first = self._entries[0].seq if self._entries else self._seq + 1
+            if since < first - 1 or since > self._seq:
+                raise ValueError(
+                    f"Cannot resume from seq {since}: the feed holds seqs {first} to {self._seq}; resync the library"
+                )
+            start = bisect_right(self._entries, since, key=_seq)
+            found: List[Change] = []
+            expected = since + 1
+            for change in islice(self._entries, start, None):
+                if change.seq != expected:
+                    # A change lost from the file on load; skipping past it would hide it from the caller
+                    raise ValueError(
+                        f"Cannot resume from seq {since}: seq {expected} is missing from the feed; resync the library"
+                    )
+                expected += 1
+                if library_id is not None and change.library_id != library_id:
+                    continue
+                if len(found) == limit:
+                    return found, found[-1].seq, True
+                found.append(change)
+            # Nothing else for this library up to the head, so the next call can start there
+            return found, self._seq, False
+
+    def _has_newer(self, library_id: Optional[str], since: int) -> bool:
+        newer = len(self._entries) - bisect_right(self._entries, since, key=_seq)
+        return any(
+            library_id is None or change.library_id == library_id
+            for change in islice(reversed(self._entries), newer)
+        )
+
+    def wait(self, library_id: Optional[str], since: int, timeout: float) -> bool:
+        """Block until a change of the library newer than `since` is recorded; False on timeout."""
+        with self._cond:
+            return self._cond.wait_for(lambda: self._has_newer(library_id, since), timeout)
+
+
+def entity_state(library: Optional[Library], change: Change, include_embedding: bool) -> Optional[Dict[str, Any]]:
+    """Current state of the entity a change refers to, or None once it is gone."""
+    if library is None or change.op == ChangeOp.DELETE:
+        return None
+    if change.entity == ChangeEntity.LIBRARY:
+        return library.model_dump(include={"id", "name", "metadata"})
+    if change.entity == ChangeEntity.DOCUMENT:
+        document = library.documents.get(change.entity_id)
+        return document.model_dump() if document else None
+    chunk = library.chunk_map.get(change.entity_id)
+    return chunk.model_dump(exclude=None if include_embedding else {"embedding"}) if chunk else None
@@ -1,27 +1,217 @@
 import os
 import json
+import time
+import logging
+import weakref
+import itertools
+from functools import partial
+from collections import OrderedDict, deque
 from pathlib import Path
-from threading import RLock
-from typing import Dict, Optional
+from threading import Condition, Event, RLock, Thread
+from typing import Any, Dict, List, NamedTuple, Optional, Set, Tuple
+from app.models.chunk_models import Chunk
 from app.models.library_models import Library
+from app.models.metadata_models import LibraryMetadata
 from app.utils.indexing.indexing_service import IndexingService
 from app.utils.indexing.index_type import IndexType
+from app.utils.indexing.base import Indexer
 from app.utils.indexing.factory import create_index_by_type
+from app.utils.indexing.precision_type import Precision
+from app.utils.indexing.quantization import Quantization
+from app.utils.indexing.reduction import create_reducer_by_type
+from app.utils.dedupe import DedupePolicy, DuplicateIndex
+from app.core.changes import ChangeLog, Mutation
+from app.models.change_models import ChangeEntity, ChangeOp
+
+logger = logging.getLogger(__name__)
 
 PERSIST_PATH = Path("data/db.json")
+SPILL_DIR = Path("data/spill")
+CHANGES_PATH = Path("data/changes.jsonl")
+# Estimated resident size above which idle libraries are spilled to disk; 0 disables eviction
+DB_MEMORY_BUDGET_MB = float(os.getenv("DB_MEMORY_BUDGET_MB", "0"))
+# Libraries used more recently than this are not evicted, so a library is rarely spilled under a request still using it
+DB_EVICTION_MIN_IDLE_SECONDS = float(os.getenv("DB_EVICTION_MIN_IDLE_SECONDS", "30"))
+# Rough per-float cost of an embedding held in a Python list (float object plus list slot)
+_BYTES_PER_FLOAT = 32
+_BYTES_PER_CHUNK = 256
 
-class InMemoryDB:
+def _estimate_size(library: Library) -> int:
+    return sum(
+        len(chunk.embedding) * _BYTES_PER_FLOAT + len(chunk.text) + _BYTES_PER_CHUNK
+        for chunk in library.chunk_map.values()
+    )
+
+def _stored_vector(library: Library, chunk_id: str) -> Optional[List[float]]:
+    chunk = library.chunk_map.get(chunk_id)
+    return chunk.embedding if chunk is not None else None
+
+def _create_strategy(library: Library, index_type: IndexType) -> Indexer:
+    metadata = library.metadata
+    if metadata is None or (metadata.reduction is None and metadata.precision == Precision.FLOAT64):
+        return create_index_by_type(index_type)
+    reducer = create_reducer_by_type(metadata.reduction, metadata.reduced_dimension) if metadata.reduction else None
+    quantization = None
+    if metadata.precision != Precision.FLOAT64:
+        quantization = Quantization(metadata.precision, metadata.candidate_multiplier, metadata.rescore)
+    # A quantized index keeps only its quantized rows and reads full vectors from the stored chunks
+    return create_index_by_type(index_type, reducer=reducer, candidate_multiplier=metadata.candidate_multiplier,
+                                quantization=quantization, vector_lookup=partial(_stored_vector, library))
+
+def index_settings(metadata: Optional[LibraryMetadata]):
+    """Settings an index is built with besides its type; a change to them means rebuilding it."""
+    if metadata is None:
+        return None
+    reduction = (metadata.reduction, metadata.reduced_dimension) if metadata.reduction is not None else None
+    quantization = (metadata.precision, metadata.rescore) if metadata.precision != Precision.FLOAT64 else None
+    multiplier = metadata.candidate_multiplier if reduction or quantization else None
+    return reduction, quantization, multiplier
+
+def _indexed_chunks(library: Library) -> Dict[str, Chunk]:
+    # Linked duplicates share their canonical chunk's vector and never get a slot of their own
+    return {cid: chunk for cid, chunk in library.chunk_map.items() if chunk.duplicate_of is None}
+
+class LibrarySnapshot(NamedTuple):
+    """A library as of one version, for export; `layout` is the index's saved structure when requested."""
+    version: int
+    header: Dict[str, Any]
+    index_type: IndexType
+    chunks: List[Chunk]
+    layout: Optional[Dict[str, Any]] = None
+
+class _Reload:
+    """A library reload in progress; concurrent requests for the same library wait on it."""
     def __init__(self):
+        self.done = Event()
+        self.error: Optional[Exception] = None
+
+class _SavedLibrary(NamedTuple):
+    """A library as captured for db.json: references only, serialized later by the persister."""
+    key: Tuple[int, bool]  # (version, spilled); a new key means it has to be serialized again
+    header: Dict[str, Any]
+    chunks: List[Chunk]
+
+class _SaveRequest(NamedTuple):
+    seq: int
+    path: Path
+    libraries: Dict[str, _SavedLibrary]
+
+class InMemoryDB:
+    """
+    Libraries keep their headers (name, metadata, documents) in memory at all times. Under a
+    memory budget, the chunks and indexes of the least recently used idle libraries are
+    spilled to SPILL_DIR and paged back in on next access.
+    With `persist=False` (replication followers) nothing is read from or written to disk.
+    """
+    def __init__(self, memory_budget_bytes: Optional[int] = None, persist: bool = True):
+        self.persist = persist
         self._libraries: Dict[str, Library] = {}
         self._indexing_services: Dict[str, IndexingService] = {}
+        self._versions: Dict[str, int] = {}
+        self._duplicates: Dict[str, DuplicateIndex] = {}
+        self._version_counter = itertools.count(1)
         self._lock = RLock()
-        self._load_from_disk()
+        # Tiered memory: evicted library id -> index type to rebuild on reload
+        if memory_budget_bytes is None:
+            memory_budget_bytes = int(DB_MEMORY_BUDGET_MB * 1024 * 1024) if persist else 0
+        self.memory_budget_bytes = memory_budget_bytes
+        self._evicted: Dict[str, IndexType] = {}
+        # Full objects of evicted libraries, while some request still holds them
+        self._spilled_objects: Dict[str, weakref.ref] = {}
+        self._last_access: "OrderedDict[str, float]" = OrderedDict()  # LRU order, oldest first
+        self._sizes: Dict[str, Tuple[int, int]] = {}  # library id -> (version, estimated bytes)
+        self._reloads: Dict[str, _Reload] = {}
+        self._stale_spills: Set[str] = set()
+        self._evictions = 0
+        self._reload_count = 0
+        self._reload_latencies_ms: deque = deque(maxlen=100)
+        self.changes = ChangeLog(CHANGES_PATH if persist else None)
+        # Write-behind persistence: saves are captured under the lock and written by one thread
+        self._save_parts: Dict[str, _SavedLibrary] = {}
+        self._save_request: Optional[_SaveRequest] = None
+        self._saved_seq = 0
+        self._saves = Condition()
+        if persist:
+            self._load_from_disk()
+            Thread(target=self._persist_loop, name="db-persister", daemon=True).start()
+
+    def _spill_path(self, library_id: str) -> Path:
+        return SPILL_DIR / f"{library_id}.json"
 
     def _save_to_disk(self):
+        """
+        Queue a save of the current state to db.json. Only references are captured under the
+        lock, and only for libraries changed since the last save; the persister thread encodes
+        and writes the file, so requests waiting on the lock never wait for the JSON encoding.
+        """
+        if not self.persist:
+            return
         with self._lock:
-            PERSIST_PATH.parent.mkdir(parents=True, exist_ok=True)
-            with open(PERSIST_PATH, "w") as f:
-                json.dump({lid: lib.model_dump() for lid, lib in self._libraries.items()}, f, indent=2)
+            parts = {}
+            for lid, library in self._libraries.items():
+                key = (self._versions[lid], lid in self._evicted)
+                part = self._save_parts.get(lid)
+                if part is None or part.key != key:
+                    if key[1]:
+                        part = _SavedLibrary(key, {**library.model_dump(), "spilled": True}, [])  # chunks live in the spill file
+                    else:
+                        # Chunks are replaced on update; only duplicate links are rewritten in place
+                        chunks = [chunk.model_copy() if chunk.duplicate_of else chunk for chunk in library.chunk_map.values()]
+                        part = _SavedLibrary(key, library.model_dump(exclude={"chunk_map"}), chunks)
+                parts[lid] = part
+            self._save_parts = parts
+            with self._saves:
+                seq = self._save_request.seq + 1 if self._save_request else 1
+                self._save_request = _SaveRequest(seq, PERSIST_PATH, parts)
+                self._saves.notify_all()
+
+    def flush(self, timeout: Optional[float] = 30.0) -> bool:
+        """Wait until every save queued so far is on disk; False when it is not within `timeout`."""
+        if not self.persist:
+            return True
+        with self._saves:
+            target = self._save_request.seq if self._save_request else 0
+            return self._saves.wait_for(lambda: self._saved_seq >= target, timeout)
+
+    def _persist_loop(self):
+        encoded: Dict[str, Tuple[Tuple[int, bool], str]] = {}  # library id -> (key, JSON text)
+        while True:
+            with self._saves:
+                self._saves.wait_for(lambda: self._save_request and self._save_request.seq > self._saved_seq)
+                request = self._save_request
+            try:
+                encoded = {lid: self._encode(part, encoded.get(lid)) for lid, part in request.libraries.items()}
+                request.path.parent.mkdir(parents=True, exist_ok=True)
+                tmp = request.path.with_suffix(".tmp")
+                with open(tmp, "w") as f:
+                    f.write("{" + ", ".join(f"{json.dumps(lid)}: {text}" for lid, (_, text) in encoded.items()) + "}")
+                os.replace(tmp, request.path)
+            except Exception:
+                logger.exception("Saving the database failed; retrying with the next change")
+                encoded = {}
+                with self._saves:
+                    self._saves.wait_for(lambda: self._save_request.seq > request.seq)
+                continue
+            # Reloaded libraries are fully in db.json again, so their spill files can go
+            with self._lock:
+                for lid in list(self._stale_spills):
+                    part = request.libraries.get(lid)
+                    if part is not None and not part.key[1] and lid not in self._evicted:
+                        self._spill_path(lid).unlink(missing_ok=True)
+                        self._stale_spills.discard(lid)
+            with self._saves:
+                self._saved_seq = request.seq
+                self._saves.notify_all()
+
+    @staticmethod
+    def _encode(part: _SavedLibrary, previous: Optional[Tuple[Tuple[int, bool], str]]) -> Tuple[Tuple[int, bool], str]:
+        # Libraries that did not change since the last save keep their encoded text
+        if previous is not None and previous[0] == part.key:
+            return previous
+        data = dict(part.header)
+        if not part.key[1]:
+            data["chunk_map"] = {chunk.id: chunk.model_dump() for chunk in part.chunks}
+        return part.key, json.dumps(data)
 
     def _load_from_disk(self):
         if not PERSIST_PATH.exists():
@@ -31,47 +221,521 @@ class InMemoryDB:
         for lid, lib_data in raw.items():
             library = Library(**lib_data)
             self._libraries[lid] = library
-            strategy = create_index_by_type(lib_data["metadata"]["index_type"])
-            indexing_service = IndexingService(strategy)
-            indexing_service.rebuild_index(library.chunk_map)
+            index_type = IndexType(lib_data["metadata"]["index_type"])
+            self._bump_version(lid)
+            if lib_data.get("spilled"):
+                # Stays on disk until first use
+                self._evicted[lid] = index_type
+                continue
+            indexing_service = IndexingService(_create_strategy(library, index_type), index_type=index_type)
+            indexing_service.rebuild_index(_indexed_chunks(library))
             self._indexing_services[lid] = indexing_service
+            self._sync_duplicates(library)
+            self._last_access[lid] = float("-inf")  # loaded but never used: first to go
+        self._enforce_budget()
+
+    def _touch(self, library_id: str):
+        self._last_access[library_id] = time.monotonic()
+        self._last_access.move_to_end(library_id)
 
-    def _persist_and_rebuild(self, library: Library):
-        self._libraries[str(library.id)] = library
-        indexing_service = self._indexing_services.get(str(library.id))
-        if indexing_service:
-            indexing_service.rebuild_index(library.chunk_map)
+    def _resident_size(self, library_id: str) -> int:
+        version = self._versions.get(library_id)
+        cached = self._sizes.get(library_id)
+        if cached is None or cached[0] != version:
+            # Quantized rows are held by the index on top of the chunks' own vectors
+            size = _estimate_size(self._libraries[library_id])
+            indexing_service = self._indexing_services.get(library_id)
+            if indexing_service is not None:
+                size += indexing_service.strategy.quantized_bytes()
+            cached = self._sizes[library_id] = (version, size)
+        return cached[1]
+
+    def _enforce_budget(self):
+        """Spill least recently used idle libraries until the resident estimate fits the budget."""
+        if self.memory_budget_bytes <= 0:
+            return
+        with self._lock:
+            total = sum(self._resident_size(lid) for lid in self._last_access)
+            now = time.monotonic()
+            for lid, last_access in list(self._last_access.items()):
+                if total <= self.memory_budget_bytes:
+                    break
+                if now - last_access < DB_EVICTION_MIN_IDLE_SECONDS:
+                    break  # everything after this one was used even more recently
+                indexing_service = self._indexing_services.get(lid)
+                if indexing_service is None or indexing_service.migrating_to is not None:
+                    continue
+                total -= self._resident_size(lid)
+                self._evict(lid)
+
+    def _evict(self, library_id: str):
+        library = self._libraries[library_id]
+        SPILL_DIR.mkdir(parents=True, exist_ok=True)
+        path = self._spill_path(library_id)
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, "w") as f:
+            json.dump({cid: chunk.model_dump() for cid, chunk in library.chunk_map.items()}, f)
+        os.replace(tmp, path)
+        # Requests still holding the full object keep working on it; it is reinstated instead of
+        # the spill file if it is still alive on the next access, so their writes are not lost
+        self._libraries[library_id] = library.model_copy(update={"chunk_map": {}})
+        self._spilled_objects[library_id] = weakref.ref(library)
+        self._evicted[library_id] = self._indexing_services.pop(library_id).index_type
+        self._duplicates.pop(library_id, None)
+        self._sizes.pop(library_id, None)
+        self._last_access.pop(library_id, None)
+        self._stale_spills.discard(library_id)
+        self._evictions += 1
+        # db.json keeps the full library until the next save marks it spilled, so no save is needed here
+        logger.info(f"Evicted library {library_id} to {path}")
+
+    def _page_in(self, library_id: str) -> Optional[Library]:
+        """
+        Return the resident library, reloading it from its spill file when evicted.
+        Concurrent callers share one reload. Must not be called while holding the DB lock.
+        """
+        while True:
+            with self._lock:
+                library = self._libraries.get(library_id)
+                if library is None:
+                    return None
+                if library_id not in self._evicted:
+                    self._touch(library_id)
+                    return library
+                reload = self._reloads.get(library_id)
+                leader = reload is None
+                if leader:
+                    reload = self._reloads[library_id] = _Reload()
+                    header, index_type = library, self._evicted[library_id]
+            if not leader:
+                reload.done.wait()
+                if reload.error is not None:
+                    raise reload.error
+                continue
+            try:
+                self._reload(library_id, header, index_type)
+            except Exception as e:
+                reload.error = e
+                raise
+            finally:
+                with self._lock:
+                    self._reloads.pop(library_id, None)
+                reload.done.set()
+
+    def _reload(self, library_id: str, header: Library, index_type: IndexType):
+        start = time.perf_counter()
+        held = self._spilled_objects.get(library_id)
+        library = held() if held else None
+        if library is None:
+            with open(self._spill_path(library_id), "r") as f:
+                chunk_map = {cid: Chunk(**data) for cid, data in json.load(f).items()}
+            library = header.model_copy(update={"chunk_map": chunk_map})
+        indexing_service = IndexingService(_create_strategy(library, index_type), index_type=index_type)
+        indexing_service.rebuild_index(_indexed_chunks(library))
+        with self._lock:
+            if self._libraries.get(library_id) is not header:
+                return  # deleted, or reinstated by a write, while loading
+            self._reinstate(library_id, library, indexing_service)
+            self._reload_count += 1
+            self._reload_latencies_ms.append((time.perf_counter() - start) * 1000)
+            logger.info(f"Reloaded library {library_id} in {self._reload_latencies_ms[-1]:.1f}ms")
+            self._enforce_budget()
+
+    def _reinstate(self, library_id: str, library: Library, indexing_service: IndexingService):
+        """Make an evicted library resident again as `library`. Called with the DB lock held."""
+        self._libraries[library_id] = library
+        self._indexing_services[library_id] = indexing_service
+        del self._evicted[library_id]
+        self._spilled_objects.pop(library_id, None)
+        self._sync_duplicates(library)
+        self._touch(library_id)
+        self._stale_spills.add(library_id)
+
+    def memory_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            latencies = list(self._reload_latencies_ms)
+            return {
+                "resident_libraries": len(self._libraries) - len(self._evicted),
+                "evicted_libraries": len(self._evicted),
+                "resident_bytes_estimate": sum(self._resident_size(lid) for lid in self._last_access),
+                "quantized_bytes": sum(
+                    service.strategy.quantized_bytes() for service in self._indexing_services.values()
+                ),
+                "memory_budget_bytes": self.memory_budget_bytes,
+                "evictions": self._evictions,
+                "reloads": self._reload_count,
+                "reload_latency_ms": {
+                    "last": latencies[-1] if latencies else None,
+                    "avg": sum(latencies) / len(latencies) if latencies else None,
+                    "max": max(latencies) if latencies else None,
+                },
+            }
+
+    def _bump_version(self, library_id: str):
+        # Versions come from a global counter so a deleted and re-created id never reuses one
+        self._versions[library_id] = next(self._version_counter)
+
+    def _persist(self, library: Library):
+        lid = str(library.id)
+        if lid in self._evicted and library is not self._libraries.get(lid):
+            # The library was spilled while a request held and edited the full object: make that
+            # object resident again, or the next access would reload the stale spill file
+            index_type = self._evicted[lid]
+            indexing_service = IndexingService(_create_strategy(library, index_type), index_type=index_type)
+            indexing_service.rebuild_index(_indexed_chunks(library))
+            self._reinstate(lid, library, indexing_service)
+        # Index maintenance is incremental (add_chunk/remove_chunk), so persisting never rebuilds
+        self._libraries[lid] = library
+        self._sync_duplicates(library)
+        self._bump_version(lid)
         self._save_to_disk()
+        self._enforce_budget()
+
+    def _sync_duplicates(self, library: Library):
+        """Create, rebuild or drop the library's duplicate index to match its dedupe settings."""
+        lid = str(library.id)
+        metadata = library.metadata
+        current = self._duplicates.get(lid)
+        if metadata is None or metadata.dedupe is None:
+            if current is None:
+                return
+            del self._duplicates[lid]
+            # Without dedupe nothing tracks links any more, so linked chunks get their own vector slot
+            unlinked = []
+            for linked in current.links.values():
+                for cid in linked:
+                    chunk = library.chunk_map.get(cid)
+                    if chunk is not None:
+                        chunk.duplicate_of = None
+                        self._indexing_services[lid].add_chunk(chunk)
+                        unlinked.append(Mutation(ChangeEntity.CHUNK, ChangeOp.UPDATE, chunk.id, chunk.document_id))
+            self.changes.record(lid, unlinked)
+            return
+        if current is not None and current.threshold == metadata.near_duplicate_threshold:
+            return
+        duplicates = DuplicateIndex(metadata.near_duplicate_threshold)
+        for chunk in library.chunk_map.values():
+            if chunk.duplicate_of is None:
+                duplicates.add(chunk.id, chunk.text)
+            else:
+                duplicates.link(chunk.id, chunk.duplicate_of)
+        self._duplicates[lid] = duplicates
+
+    def dedupe_policy(self, library_id: str) -> Optional[DedupePolicy]:
+        with self._lock:
+            library = self._libraries.get(library_id)
+            return library.metadata.dedupe if library and library.metadata else None
+
+    def find_duplicate(self, library_id: str, text: str) -> Optional[Tuple[Chunk, bool]]:
+        """The stored chunk `text` duplicates and whether the match is exact, or None (also when dedupe is off)."""
+        self._page_in(library_id)
+        with self._lock:
+            duplicates = self._duplicates.get(library_id)
+            match = duplicates.find(text) if duplicates else None
+            if match is None:
+                return None
+            chunk = self._libraries[library_id].chunk_map.get(match[0])
+            return (chunk, match[1]) if chunk else None
+
+    def index_chunk(self, library_id: str, chunk: Chunk):
+        """Index a chunk already stored in chunk_map; linked duplicates are only recorded as links."""
+        self._page_in(library_id)
+        with self._lock:
+            self._index_chunk(library_id, chunk)
+
+    def _index_chunk(self, library_id: str, chunk: Chunk):
+        library = self._libraries[library_id]
+        duplicates = self._duplicates.get(library_id)
+        if chunk.duplicate_of is not None:
+            if duplicates is not None and chunk.duplicate_of in library.chunk_map:
+                duplicates.link(chunk.id, chunk.duplicate_of)
+                return
+            chunk.duplicate_of = None  # the canonical chunk is gone, so this one stands alone
+        self._indexing_services[library_id].add_chunk(chunk)
+        if duplicates is not None:
+            duplicates.add(chunk.id, chunk.text)
+
+    def unindex_chunk(self, library_id: str, chunk: Chunk):
+        """
+        Drop a chunk removed from chunk_map from the index. When it was the canonical copy of
+        linked duplicates, the first one still stored takes over its vector slot.
+        """
+        self._page_in(library_id)
+        with self._lock:
+            library = self._libraries[library_id]
+            indexing_service = self._indexing_services[library_id]
+            duplicates = self._duplicates.get(library_id)
+            if chunk.duplicate_of is not None:
+                if duplicates is not None:
+                    duplicates.unlink(chunk.id, chunk.duplicate_of)
+                return
+            indexing_service.remove_chunk(chunk.id)
+            if duplicates is None:
+                return
+            survivors = [library.chunk_map[cid] for cid in sorted(duplicates.remove(chunk.id)) if cid in library.chunk_map]
+            if not survivors:
+                return
+            heir = survivors[0]
+            heir.duplicate_of = None
+            indexing_service.add_chunk(heir)
+            duplicates.add(heir.id, heir.text)
+            for linked in survivors[1:]:
+                linked.duplicate_of = heir.id
+                duplicates.link(linked.id, heir.id)
+            self.changes.record(library_id, [
+                Mutation(ChangeEntity.CHUNK, ChangeOp.UPDATE, survivor.id, survivor.document_id) for survivor in survivors
+            ])
     
     def get_indexing_service(self, library_id: str) -> Optional[IndexingService]:
+        self._page_in(library_id)
         with self._lock:
             return self._indexing_services.get(library_id)
 
+    def get_library_version(self, library_id: str) -> Optional[int]:
+        with self._lock:
+            return self._versions.get(library_id)
+
+    def library_versions(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._versions)
+
+    def snapshot_library(self, library_id: str, with_layout: bool = False) -> Optional[LibrarySnapshot]:
+        """
+        A library as of one consistent point, for export. Only references are copied under the lock.
+        An evicted library is read from its spill file and stays evicted, so exporting never undoes
+        the memory budget; it has no index, hence no layout.
+        """
+        while True:
+            with self._lock:
+                library = self._libraries.get(library_id)
+                if library is None:
+                    return None
+                version = self._versions[library_id]
+                header = library.model_dump(exclude={"chunk_map"})
+                if library_id not in self._evicted:
+                    indexing_service = self._indexing_services[library_id]
+                    return LibrarySnapshot(
+                        version,
+                        header,
+                        indexing_service.index_type,
+                        # Chunks are replaced on update; only duplicate links are rewritten in place
+                        [chunk.model_copy() if chunk.duplicate_of else chunk for chunk in library.chunk_map.values()],
+                        indexing_service.strategy.export_layout() if with_layout else None,
+                    )
+                index_type = self._evicted[library_id]
+                held = self._spilled_objects.get(library_id)
+                held = held() if held else None
+                if held is not None:
+                    chunks = [chunk.model_copy() if chunk.duplicate_of else chunk for chunk in held.chunk_map.values()]
+                    return LibrarySnapshot(version, header, index_type, chunks, None)
+            try:
+                with open(self._spill_path(library_id), "r") as f:
+                    chunks = [Chunk(**data) for data in json.load(f).values()]
+            except FileNotFoundError:
+                continue  # reloaded (or deleted) meanwhile; its spill file is gone
+            return LibrarySnapshot(version, header, index_type, chunks, None)
+
     def add_library(self, library: Library, index_type: IndexType = IndexType.LINEAR):
         with self._lock:
             self._libraries[str(library.id)] = library
-            strategy = create_index_by_type(index_type)
-            indexing_service = IndexingService(strategy)
-            indexing_service.rebuild_index(library.chunk_map)
+            index_type = IndexType(index_type)
+            indexing_service = IndexingService(_create_strategy(library, index_type), index_type=index_type)
+            indexing_service.rebuild_index(_indexed_chunks(library))
             self._indexing_services[str(library.id)] = indexing_service
+            self._sync_duplicates(library)
+            self._bump_version(str(library.id))
+            self._touch(str(library.id))
+            self.changes.record(str(library.id), [Mutation(ChangeEntity.LIBRARY, ChangeOp.INSERT, str(library.id))])
             self._save_to_disk()
+            self._enforce_budget()
 
-    def get_library(self, library_id: str) -> Optional[Library]:
+    def restore_library(self, library: Library, index_type: IndexType, layout: Optional[Dict[str, Any]] = None):
+        """
+        Install a library loaded from a backup in place of any library with the same id. The
+        index is built before the lock is taken, from the saved layout when it still fits.
+        The change feed sees the old library deleted and every restored entity inserted.
+        """
+        lid = str(library.id)
+        index_type = IndexType(index_type)
+        indexing_service = IndexingService(_create_strategy(library, index_type), index_type=index_type)
+        indexing_service.rebuild_index(_indexed_chunks(library), layout)
         with self._lock:
-            return self._libraries.get(library_id)
+            mutations = [Mutation(ChangeEntity.LIBRARY, ChangeOp.DELETE, lid)] if self._drop_library(lid) else []
+            self._libraries[lid] = library
+            self._indexing_services[lid] = indexing_service
+            self._sync_duplicates(library)
+            self._bump_version(lid)
+            self._touch(lid)
+            mutations.append(Mutation(ChangeEntity.LIBRARY, ChangeOp.INSERT, lid))
+            for document in library.documents.values():
+                mutations.append(Mutation(ChangeEntity.DOCUMENT, ChangeOp.INSERT, document.id))
+                mutations.extend(
+                    Mutation(ChangeEntity.CHUNK, ChangeOp.INSERT, cid, document.id)
+                    for cid in document.chunk_ids if cid in library.chunk_map
+                )
+            self.changes.record(lid, mutations)
+            self._save_to_disk()
+            self._enforce_budget()
+
+    def get_library(self, library_id: str) -> Optional[Library]:
+        return self._page_in(library_id)
         
     def list_libraries(self):
+        """All libraries; evicted ones are returned as headers (empty chunk_map) without reloading them."""
         with self._lock:
             return list(self._libraries.values())
 
-    def update_library(self, library: Library):
+    def update_library(self, library: Library, mutations: Optional[List[Mutation]] = None):
+        """Persist a library edited in place; `mutations` describe the edit for the change feed."""
+        with self._lock:
+            if mutations is None:
+                mutations = [Mutation(ChangeEntity.LIBRARY, ChangeOp.UPDATE, str(library.id))]
+            self.changes.record(str(library.id), mutations)
+            self._persist(library)
+
+    def migrate_index(self, library_id: str, index_type: IndexType, force: bool = False) -> bool:
+        """
+        Switch a library to another index type without downtime.
+        The new index is built on a background thread from a snapshot of chunk_map while
+        queries keep using the current one; writes arriving meanwhile are recorded by the
+        IndexingService and replayed before the atomic swap.
+        Returns False when the library already uses (or is migrating to) that type, unless
+        `force` asks for a rebuild anyway (e.g. after the reduction settings changed).
+        """
+        index_type = IndexType(index_type)
+        self._page_in(library_id)
+        with self._lock:
+            library, indexing_service = self._library_and_index(library_id)
+            snapshot = self._begin_migration(library, indexing_service, index_type, force)
+        if snapshot is None:
+            return False
+        self._start_build(library, indexing_service, index_type, snapshot)
+        return True
+
+    def reconfigure_library(self, library_id: str, name: str, metadata: Optional[LibraryMetadata]) -> Library:
+        """
+        Rename a library and replace its metadata, migrating its index when the index type or
+        settings change. The migration is accepted before anything is saved, so a conflicting
+        one (RuntimeError) leaves the stored library as it was.
+        """
+        self._page_in(library_id)
         with self._lock:
-            self._persist_and_rebuild(library)
+            library, indexing_service = self._library_and_index(library_id)
+            snapshot = None
+            if metadata is not None:
+                snapshot = self._begin_migration(library, indexing_service, metadata.index_type,
+                                                 force=index_settings(metadata) != index_settings(library.metadata))
+            library.name = name
+            if metadata is not None:
+                library.metadata = metadata
+            self.update_library(library)
+        # The build reads the new settings from the library, so it starts once they are saved
+        if snapshot is not None:
+            self._start_build(library, indexing_service, metadata.index_type, snapshot)
+        return library
+
+    def _library_and_index(self, library_id: str) -> Tuple[Library, IndexingService]:
+        library = self._libraries.get(library_id)
+        indexing_service = self._indexing_services.get(library_id)
+        if not library or not indexing_service:
+            raise KeyError(f"Library {library_id} not found")
+        return library, indexing_service
+
+    def _begin_migration(self, library: Library, indexing_service: IndexingService, index_type: IndexType,
+                         force: bool) -> Optional[Dict[str, Chunk]]:
+        """Start recording writes and return the snapshot to build from; None when no migration is needed."""
+        index_type = IndexType(index_type)
+        if not force and index_type in (indexing_service.index_type, indexing_service.migrating_to):
+            return None
+        # Start recording before taking the snapshot so no write falls in between
+        indexing_service.begin_migration(index_type)
+        return _indexed_chunks(library)
+
+    def _start_build(self, library: Library, indexing_service: IndexingService, index_type: IndexType,
+                     snapshot: Dict[str, Chunk]):
+        Thread(
+            target=self._build_and_swap,
+            args=(library, indexing_service, IndexType(index_type), snapshot),
+            name=f"index-migration-{library.id}",
+            daemon=True,
+        ).start()
+
+    def _build_and_swap(self, library: Library, indexing_service: IndexingService, index_type: IndexType, snapshot: Dict[str, Chunk]):
+        try:
+            new_strategy = _create_strategy(library, index_type)
+            new_strategy.rebuild(snapshot)
+            indexing_service.complete_migration(new_strategy, _indexed_chunks(library))
+        except Exception:
+            logger.exception(f"Index migration of library {library.id} to {index_type.value} failed")
+            indexing_service.abort_migration()
+            return
+        with self._lock:
+            self._bump_version(str(library.id))
+
+    def add_chunks(self, library_id: str, document_id: str, chunks: List[Chunk]) -> int:
+        """
+        Atomically append a batch of chunks to a document, index them and persist once.
+        Chunks whose id is already stored are skipped, so replaying a batch is a no-op.
+        """
+        self._page_in(library_id)
+        with self._lock:
+            library = self._libraries.get(library_id)
+            if not library:
+                raise KeyError(f"Library {library_id} not found")
+            document = library.documents.get(document_id)
+            if not document:
+                raise KeyError(f"Document {document_id} not found")
+            indexing_service = self._indexing_services[library_id]
+
+            new_chunks = [chunk for chunk in chunks if chunk.id not in library.chunk_map]
+            if len({len(chunk.embedding) for chunk in new_chunks}) > 1:
+                raise ValueError("Inconsistent vector dimensions within batch")
+            for chunk in new_chunks:
+                indexing_service.validate_vector(chunk.embedding)
+            for chunk in new_chunks:
+                library.chunk_map[chunk.id] = chunk
+                document.chunk_ids.append(chunk.id)
+                self._index_chunk(library_id, chunk)
+
+            if new_chunks:
+                self._bump_version(library_id)
+                self.changes.record(library_id, [
+                    Mutation(ChangeEntity.CHUNK, ChangeOp.INSERT, chunk.id, document_id) for chunk in new_chunks
+                ])
+                self._save_to_disk()
+                self._enforce_budget()
+            return len(new_chunks)
 
     def delete_library(self, library_id: str):
         with self._lock:
-            self._libraries.pop(library_id, None)
-            self._indexing_services.pop(library_id, None)
+            if self._drop_library(library_id):
+                self.changes.record(library_id, [Mutation(ChangeEntity.LIBRARY, ChangeOp.DELETE, library_id)])
             self._save_to_disk()
 
-db = InMemoryDB()
\ No newline at end of file
+    def _drop_library(self, library_id: str) -> bool:
+        """Forget everything held for a library; returns whether it existed."""
+        existed = self._libraries.pop(library_id, None) is not None
+        self._indexing_services.pop(library_id, None)
+        self._versions.pop(library_id, None)
+        self._duplicates.pop(library_id, None)
+        self._sizes.pop(library_id, None)
+        self._last_access.pop(library_id, None)
+        self._spilled_objects.pop(library_id, None)
+        if self._evicted.pop(library_id, None) is not None or library_id in self._stale_spills:
+            self._stale_spills.discard(library_id)
+            self._spill_path(library_id).unlink(missing_ok=True)
+        return existed
+
+# standalone: one process serves everything. writer: owns all mutations and publishes
+# snapshots for readers. reader: serves queries from the writer's snapshots (see app.serve).
+# follower: replica of another node that applies its change log and serves queries
+DB_ROLE = os.getenv("DB_ROLE", "standalone")
+
+if DB_ROLE == "reader":
+    from app.core.snapshots import SnapshotDB
+    db = SnapshotDB()
+elif DB_ROLE == "follower":
+    # State comes from the primary's replication log (see app.core.replication)
+    db = InMemoryDB(persist=False)
+else:
+    db = InMemoryDB()
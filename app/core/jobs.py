@@ -0,0 +1,266 @@
+import os
+import json
+import time
+import logging
+from pathlib import Path
+from uuid import NAMESPACE_URL, uuid5
+from datetime import datetime, timezone
+from threading import BoundedSemaphore, Lock
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from app.core.db import db
+from app.core.scheduler import scheduler
+from app.models.chunk_models import Chunk, ChunkInput
+from app.models.job_models import IngestionJob, JobStatus
+from app.models.metadata_models import ChunkMetadata
+from app.utils.embeddings import get_embeddings
+from app.utils.dedupe import DedupePolicy, text_fingerprint
+
+logger = logging.getLogger(__name__)
+
+JOBS_DIR = Path("data/jobs")
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+INGEST_MAX_PENDING_JOBS = int(os.getenv("INGEST_MAX_PENDING_JOBS", "16"))
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "32"))
+INGEST_MAX_RETRIES = int(os.getenv("INGEST_MAX_RETRIES", "3"))
+# Pause between batches so ingestion workers yield the GIL and the DB lock to query traffic
+INGEST_BATCH_PAUSE_SECONDS = float(os.getenv("INGEST_BATCH_PAUSE_SECONDS", "0.01"))
+# How long completed and failed jobs stay listed (and on disk) after they finish
+INGEST_JOB_RETENTION_SECONDS = float(os.getenv("INGEST_JOB_RETENTION_SECONDS", "3600"))
+
+
+def now_iso():
+    return datetime.now(timezone.utc).isoformat()
+
+
+class JobQueueFullError(Exception):
+    pass
+
+
+def match_duplicates(library_id: str, inputs: List[ChunkInput]) -> List[Optional[Tuple[Chunk, bool]]]:
+    """Per input, the stored chunk it duplicates and whether exactly; exact copies of earlier inputs count too."""
+    matches = [db.find_duplicate(library_id, chunk_input.text) for chunk_input in inputs]
+    first_seen: Dict[str, int] = {}
+    for offset, chunk_input in enumerate(inputs):
+        if matches[offset] is None:
+            fingerprint = text_fingerprint(chunk_input.text)
+            if fingerprint in first_seen:
+                matches[offset] = (first_seen[fingerprint], True)
+            else:
+                first_seen[fingerprint] = offset
+    return matches
+
+
+def build_chunks(library_id: str, document_id: str, inputs: List[ChunkInput], chunk_ids: List[str]) -> Tuple[List[Chunk], int]:
+    """
+    Chunks to store for a batch of inputs, embedded through the shared dispatcher, plus how many
+    inputs duplicated a stored or earlier chunk. `chunk_ids` gives the id of each input.
+    """
+    policy = db.dedupe_policy(library_id)
+    matches = match_duplicates(library_id, inputs) if policy else [None] * len(inputs)
+    # In a batch replayed after a restart, inputs committed the first time find their own chunk:
+    # they duplicate nothing and add_chunks would skip them anyway
+    replayed = {offset for offset, match in enumerate(matches)
+                if match is not None and isinstance(match[0], Chunk) and match[0].id == chunk_ids[offset]}
+    # Only inputs that cannot reuse a stored embedding go to the provider
+    to_embed = [i for i, match in enumerate(matches)
+                if i not in replayed and (match is None or not policy.reuses_embedding(match[1]))]
+    embedded = get_embeddings([inputs[i].text for i in to_embed]) if to_embed else []
+    embeddings = dict(zip(to_embed, embedded))
+
+    created_at = now_iso()
+    built: Dict[int, Chunk] = {}
+    for offset, chunk_input in enumerate(inputs):
+        if offset in replayed:
+            continue
+        match = matches[offset]
+        canonical = None
+        if match is not None:
+            # In-batch matches carry the offset of their first occurrence
+            canonical = built[match[0]] if isinstance(match[0], int) else match[0]
+            if policy == DedupePolicy.SKIP:
+                continue
+        metadata = ChunkMetadata(**chunk_input.metadata.model_dump()) if chunk_input.metadata else None
+        if metadata:
+            metadata.created_at = created_at
+        built[offset] = Chunk(
+            id=chunk_ids[offset],
+            text=chunk_input.text,
+            document_id=document_id,
+            embedding=embeddings[offset] if offset in embeddings else canonical.embedding,
+            metadata=metadata,
+            duplicate_of=canonical.id if canonical is not None and policy == DedupePolicy.LINK else None,
+        )
+    duplicates = sum(match is not None for offset, match in enumerate(matches) if offset not in replayed)
+    return list(built.values()), duplicates
+
+
+class JobManager:
+    """
+    Runs ingestion jobs on a bounded worker pool.
+    A job's inputs are written once under JOBS_DIR when it is submitted and its progress
+    cursor is checkpointed after every batch. Chunk ids are derived from (job id, position),
+    so a job resumed after a restart continues from its cursor and re-applying a committed
+    batch is a no-op. Finished jobs are forgotten INGEST_JOB_RETENTION_SECONDS after they end.
+    """
+    def __init__(self, jobs_dir: Path = JOBS_DIR, workers: int = INGEST_WORKERS,
+                 max_pending: int = INGEST_MAX_PENDING_JOBS, batch_size: int = INGEST_BATCH_SIZE,
+                 retention_seconds: float = INGEST_JOB_RETENTION_SECONDS):
+        self.jobs_dir = jobs_dir
+        self.batch_size = batch_size
+        self.retention_seconds = retention_seconds
+        self._jobs: Dict[str, IngestionJob] = {}
+        self._inputs: Dict[str, List[ChunkInput]] = {}
+        self._lock = Lock()
+        self._slots = BoundedSemaphore(max_pending)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ingest")
+
+    def _job_path(self, job_id: str) -> Path:
+        return self.jobs_dir / f"{job_id}.json"
+
+    def _inputs_path(self, job_id: str) -> Path:
+        return self.jobs_dir / "inputs" / f"{job_id}.json"
+
+    @staticmethod
+    def _write(path: Path, payload):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, "w") as f:
+            json.dump(payload, f)
+        os.replace(tmp, path)
+
+    def _persist_inputs(self, job_id: str, inputs: List[ChunkInput]):
+        self._write(self._inputs_path(job_id), [c.model_dump() for c in inputs])
+
+    def _checkpoint(self, job: IngestionJob):
+        # Only the job and its cursor; the inputs were written once on submit
+        self._write(self._job_path(job.id), job.model_dump(exclude={"progress"}))
+
+    def _expire(self):
+        """Forget finished jobs past their retention, in memory and on disk."""
+        cutoff = time.time() - self.retention_seconds
+        with self._lock:
+            expired = [
+                job_id for job_id, job in self._jobs.items()
+                if job.finished_at and datetime.fromisoformat(job.finished_at).timestamp() < cutoff
+            ]
+            for job_id in expired:
+                del self._jobs[job_id]
+        for job_id in expired:
+            self._job_path(job_id).unlink(missing_ok=True)
+            self._inputs_path(job_id).unlink(missing_ok=True)
+
+    def _reserve_slot(self):
+        # Backpressure: callers are rejected instead of queueing without bound
+        if not self._slots.acquire(blocking=False):
+            raise JobQueueFullError("Too many pending ingestion jobs, retry later")
+
+    def submit(self, library_id: str, document_id: str, inputs: List[ChunkInput]) -> IngestionJob:
+        self._expire()
+        self._reserve_slot()
+        job = IngestionJob(library_id=library_id, document_id=document_id, total=len(inputs), created_at=now_iso())
+        with self._lock:
+            self._jobs[job.id] = job
+            self._inputs[job.id] = inputs
+        self._persist_inputs(job.id, inputs)
+        self._checkpoint(job)
+        self._executor.submit(self._run, job.id)
+        return job
+
+    def get(self, job_id: str) -> Optional[IngestionJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self) -> List[IngestionJob]:
+        self._expire()
+        with self._lock:
+            return list(self._jobs.values())
+
+    def resume_pending(self):
+        """Reload persisted jobs and re-enqueue the ones that had not finished."""
+        if not self.jobs_dir.exists():
+            return
+        for path in sorted(self.jobs_dir.glob("*.json")):
+            with open(path, "r") as f:
+                job = IngestionJob(**json.load(f))
+            with self._lock:
+                if job.id in self._jobs:
+                    continue
+                self._jobs[job.id] = job
+            if job.status not in (JobStatus.QUEUED, JobStatus.RUNNING):
+                continue
+            try:
+                with open(self._inputs_path(job.id), "r") as f:
+                    inputs = [ChunkInput(**c) for c in json.load(f)]
+            except (OSError, ValueError) as e:
+                logger.warning(f"Could not resume ingestion job {job.id}: inputs unreadable ({e})")
+                continue
+            try:
+                self._reserve_slot()
+            except JobQueueFullError:
+                logger.warning(f"Could not resume ingestion job {job.id}: queue full")
+                continue
+            with self._lock:
+                self._inputs[job.id] = inputs
+            job.status = JobStatus.QUEUED
+            self._executor.submit(self._run, job.id)
+        self._expire()
+
+    def _run(self, job_id: str):
+        job = self.get(job_id)
+        status = JobStatus.FAILED
+        try:
+            inputs = self._inputs[job_id]
+            job.status = JobStatus.RUNNING
+            job.started_at = now_iso()
+            run_start, run_processed = time.monotonic(), 0
+
+            while job.processed < job.total:
+                start = job.processed
+                batch = inputs[start:start + self.batch_size]
+                for attempt in range(INGEST_MAX_RETRIES):
+                    try:
+                        # Ids derive from the input's position, so a replayed batch creates the same chunks
+                        chunk_ids = [str(uuid5(NAMESPACE_URL, f"{job.id}/{start + offset}")) for offset in range(len(batch))]
+                        chunks, duplicates = build_chunks(job.library_id, job.document_id, batch, chunk_ids)
+                        # Waits behind interactive requests for a write slot
+                        with scheduler.background_write(job.library_id):
+                            db.add_chunks(job.library_id, job.document_id, chunks)
+                        # The cursor below must not get ahead of what is on disk
+                        if not db.flush():
+                            raise RuntimeError("Timed out saving the database")
+                        job.duplicates += duplicates
+                        break
+                    except (KeyError, ValueError):
+                        # The library or document is gone, or the input is invalid: retrying cannot help
+                        raise
+                    except Exception as e:
+                        # Provider errors (HTTP failures, timeouts, rate limits) are transient: back off and retry
+                        job.errors.append(f"batch at {start}: {e}")
+                        if attempt == INGEST_MAX_RETRIES - 1:
+                            raise
+                        time.sleep(2 ** attempt)
+
+                job.processed = start + len(batch)
+                run_processed += len(batch)
+                job.throughput = run_processed / max(time.monotonic() - run_start, 1e-9)
+                self._checkpoint(job)
+                time.sleep(INGEST_BATCH_PAUSE_SECONDS)
+
+            status = JobStatus.COMPLETED
+        except Exception as e:
+            logger.exception(f"Ingestion job {job_id} failed")
+            job.errors.append(str(e))
+        finally:
+            finished_at = now_iso()
+            # The final state is on disk before the inputs go, and visible to pollers only after
+            self._checkpoint(job.model_copy(update={"status": status, "finished_at": finished_at}))
+            with self._lock:
+                self._inputs.pop(job_id, None)
+            self._inputs_path(job_id).unlink(missing_ok=True)
+            job.finished_at = finished_at
+            job.status = status
+            self._slots.release()
+
+
+job_manager = JobManager()
@@ -0,0 +1,243 @@
+import os
+import json
+import time
+import socket
+import logging
+from datetime import datetime, timezone
+from threading import Condition, Event, Lock, Thread
+from typing import Any, Dict, Optional
+
+import httpx
+
+from app.core.db import DB_ROLE, InMemoryDB, db, index_settings
+from app.models.change_models import ChangeEntity, ChangeEvent, ChangeOp, ReplicationBatch
+from app.models.chunk_models import Chunk
+from app.models.document_models import Document
+from app.models.library_models import Library
+from app.models.metadata_models import LibraryMetadata
+from app.utils.indexing.index_type import IndexType
+
+logger = logging.getLogger(__name__)
+
+PRIMARY_URL = os.getenv("PRIMARY_URL", "http://127.0.0.1:8000")
+REPLICA_ID = os.getenv("REPLICA_ID", f"{socket.gethostname()}-{os.getpid()}")
+REPLICATION_BATCH_SIZE = int(os.getenv("REPLICATION_BATCH_SIZE", "500"))
+# Long-poll duration of each log request; an idle follower re-polls this often
+REPLICATION_WAIT_MS = int(os.getenv("REPLICATION_WAIT_MS", "10000"))
+REPLICATION_RETRY_SECONDS = float(os.getenv("REPLICATION_RETRY_SECONDS", "1"))
+
+
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class Replica:
+    """
+    Follower side of log shipping. Starts from a full snapshot of the primary, then
+    long-polls its change log and applies each event to the local InMemoryDB. Events
+    carry the entity's current state on the primary, so applying them is idempotent and
+    a replayed or reordered-by-snapshot event converges to the primary's state. When the
+    primary no longer retains the follower's position (410) it resyncs from a snapshot.
+    """
+    def __init__(self, database: InMemoryDB, client: Optional[httpx.Client] = None,
+                 replica_id: str = REPLICA_ID, batch_size: int = REPLICATION_BATCH_SIZE):
+        self.database = database
+        self.client = client or httpx.Client(base_url=PRIMARY_URL, timeout=REPLICATION_WAIT_MS / 1000 + 30)
+        self.replica_id = replica_id
+        self.batch_size = batch_size
+        self.applied_seq: Optional[int] = None  # None until the first snapshot is loaded
+        self.primary_seq: Optional[int] = None
+        self.caught_up_at: Optional[float] = None
+        self.last_contact: Optional[str] = None
+        self.resyncs = 0
+        self._applied = Condition()
+        self._stop = Event()
+        self._thread: Optional[Thread] = None
+
+    # Lifecycle
+
+    def start(self):
+        self._thread = Thread(target=self._loop, name="replication", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                if self.applied_seq is None:
+                    self.resync()
+                self.sync_once(wait_ms=REPLICATION_WAIT_MS)
+            except (httpx.HTTPError, ValueError) as e:
+                logger.warning(f"Replication from {self.client.base_url} failed: {e}; retrying")
+                self._stop.wait(REPLICATION_RETRY_SECONDS)
+
+    # Read-your-writes
+
+    def wait_for(self, seq: int, timeout: float) -> bool:
+        """Block until changes up to `seq` have been applied; False on timeout."""
+        with self._applied:
+            return self._applied.wait_for(lambda: self.applied_seq is not None and self.applied_seq >= seq, timeout)
+
+    def _advance(self, applied_seq: int, primary_seq: int):
+        with self._applied:
+            self.applied_seq = applied_seq
+            self.primary_seq = max(primary_seq, applied_seq)
+            self.last_contact = _now_iso()
+            if self.applied_seq >= self.primary_seq:
+                self.caught_up_at = time.monotonic()
+            self._applied.notify_all()
+
+    def status(self) -> Dict[str, Any]:
+        with self._applied:
+            if self.caught_up_at is None:
+                lag_seconds = None
+            elif self.applied_seq < self.primary_seq:
+                # Time since the follower last had everything the primary had
+                lag_seconds = time.monotonic() - self.caught_up_at
+            else:
+                lag_seconds = 0.0
+            return {
+                "role": "follower",
+                "replica_id": self.replica_id,
+                "primary": str(self.client.base_url),
+                "applied_seq": self.applied_seq,
+                "primary_seq": self.primary_seq,
+                "lag_seq": (self.primary_seq or 0) - (self.applied_seq or 0),
+                "lag_seconds": lag_seconds,
+                "last_contact": self.last_contact,
+                "resyncs": self.resyncs,
+            }
+
+    # Log shipping
+
+    def sync_once(self, wait_ms: int = 0) -> int:
+        """Fetch and apply one batch of changes; returns how many were applied."""
+        if self.applied_seq is None:
+            self.resync()
+        response = self.client.get("/replication/log", params={
+            "since": self.applied_seq, "limit": self.batch_size, "wait_ms": wait_ms, "replica_id": self.replica_id,
+        })
+        if response.status_code == 410:
+            logger.warning(f"Primary no longer has changes after seq {self.applied_seq}; resyncing")
+            self.resync()
+            return 0
+        response.raise_for_status()
+        batch = ReplicationBatch(**response.json())
+        for event in batch.changes:
+            self._apply(event)
+        self._advance(batch.next_since, batch.head)
+        return len(batch.changes)
+
+    def catch_up(self) -> int:
+        """Apply batches until the follower has every change the primary had when it started."""
+        applied = self.sync_once()
+        while self.applied_seq < self.primary_seq:
+            applied += self.sync_once()
+        return applied
+
+    def resync(self):
+        """Replace the local state with a full snapshot of the primary."""
+        seen = set()
+        seq = None
+        with self.client.stream("GET", "/replication/snapshot") as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                item = json.loads(line)
+                if seq is None:
+                    seq = item["seq"]  # header line
+                    continue
+                library = Library(**item["library"])
+                library.chunk_map = {chunk["id"]: Chunk(**chunk) for chunk in item["chunks"]}
+                self.database.delete_library(library.id)
+                self.database.add_library(library, index_type=IndexType(item["index_type"]))
+                seen.add(library.id)
+        for library in self.database.list_libraries():
+            if library.id not in seen:
+                self.database.delete_library(library.id)
+        self.resyncs += 1
+        self._advance(seq, seq)
+        logger.info(f"Loaded snapshot of {len(seen)} libraries at seq {seq}")
+
+    def _apply(self, event: ChangeEvent):
+        if event.data is None and event.op != ChangeOp.DELETE:
+            return  # deleted on the primary since; its delete event follows
+        database = self.database
+        lid = event.library_id
+        if event.entity == ChangeEntity.LIBRARY:
+            self._apply_library(event)
+            return
+        library = database.get_library(lid)
+        if library is None:
+            return
+
+        if event.entity == ChangeEntity.DOCUMENT:
+            if event.op == ChangeOp.DELETE:
+                library.documents.pop(event.entity_id, None)
+            else:
+                library.documents[event.entity_id] = Document(**event.data)
+        elif event.op == ChangeOp.DELETE:
+            chunk = library.chunk_map.pop(event.entity_id, None)
+            document = library.documents.get(event.document_id)
+            if document and event.entity_id in document.chunk_ids:
+                document.chunk_ids.remove(event.entity_id)
+            if chunk:
+                database.unindex_chunk(lid, chunk)
+        else:
+            chunk = Chunk(**event.data)
+            previous = library.chunk_map.get(chunk.id)
+            library.chunk_map[chunk.id] = chunk
+            document = library.documents.get(chunk.document_id)
+            if document and chunk.id not in document.chunk_ids:
+                document.chunk_ids.append(chunk.id)
+            if previous:
+                database.unindex_chunk(lid, previous)
+            database.index_chunk(lid, chunk)
+        database.update_library(library, [])
+
+    def _apply_library(self, event: ChangeEvent):
+        database = self.database
+        if event.op == ChangeOp.DELETE:
+            database.delete_library(event.library_id)
+            return
+        metadata = LibraryMetadata(**event.data["metadata"]) if event.data["metadata"] else None
+        index_type = metadata.index_type if metadata else IndexType.LINEAR
+        library = database.get_library(event.library_id)
+        if library is None:
+            database.add_library(Library(id=event.library_id, name=event.data["name"], metadata=metadata), index_type=index_type)
+            return
+        rebuild = index_settings(metadata) != index_settings(library.metadata)
+        library.name = event.data["name"]
+        library.metadata = metadata
+        database.update_library(library, [])
+        try:
+            database.migrate_index(event.library_id, index_type, force=rebuild)
+        except RuntimeError as e:
+            logger.warning(f"Could not migrate replicated library {event.library_id}: {e}")
+
+
+class FollowerRegistry:
+    """Primary side: where each follower polling the log has got to."""
+    def __init__(self):
+        self._followers: Dict[str, Dict[str, Any]] = {}
+        self._lock = Lock()
+
+    def seen(self, replica_id: str, applied_seq: int):
+        with self._lock:
+            self._followers[replica_id] = {"applied_seq": applied_seq, "last_seen": _now_iso()}
+
+    def status(self, head: int) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {
+                replica_id: {**follower, "lag_seq": head - follower["applied_seq"]}
+                for replica_id, follower in self._followers.items()
+            }
+
+
+followers = FollowerRegistry()
+replica = Replica(db) if DB_ROLE == "follower" else None
@@ -0,0 +1,277 @@
+import os
+import re
+import json
+import math
+import time
+import asyncio
+import heapq
+import itertools
+from contextlib import asynccontextmanager, contextmanager
+from threading import Event, Lock
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import Request
+
+# Concurrent requests each traffic class may run; the rest wait in that class's queue
+SCHEDULER_READ_CONCURRENCY = int(os.getenv("SCHEDULER_READ_CONCURRENCY", "16"))
+SCHEDULER_WRITE_CONCURRENCY = int(os.getenv("SCHEDULER_WRITE_CONCURRENCY", "4"))
+SCHEDULER_READ_QUEUE = int(os.getenv("SCHEDULER_READ_QUEUE", "64"))
+SCHEDULER_WRITE_QUEUE = int(os.getenv("SCHEDULER_WRITE_QUEUE", "64"))
+# Requests expected to wait longer than this are shed with 503 instead of queueing
+SCHEDULER_READ_MAX_WAIT_MS = float(os.getenv("SCHEDULER_READ_MAX_WAIT_MS", "1000"))
+SCHEDULER_WRITE_MAX_WAIT_MS = float(os.getenv("SCHEDULER_WRITE_MAX_WAIT_MS", "5000"))
+# Requests of all classes running against one library at a time
+SCHEDULER_LIBRARY_CONCURRENCY = int(os.getenv("SCHEDULER_LIBRARY_CONCURRENCY", "8"))
+
+# Lower runs first
+PRIORITY_INTERACTIVE = 0  # searches
+PRIORITY_NORMAL = 1  # CRUD requests
+PRIORITY_BACKGROUND = 2  # ingestion job batches
+
+_LIBRARY_PATH = re.compile(r"^/libraries/([^/]+)/")
+# Long-polls and docs mostly wait instead of working, so they bypass admission; snapshots do not
+_UNSCHEDULED_PREFIXES = ("/replication/log", "/replication/status", "/docs", "/redoc", "/openapi.json")
+
+
+class Overloaded(Exception):
+    def __init__(self, message: str, status_code: int, retry_after: int):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    __slots__ = ("granted", "abandoned", "wake")
+
+    def __init__(self, wake):
+        self.granted = False
+        self.abandoned = False
+        self.wake = wake
+
+
+class Gate:
+    """
+    A concurrency limit with a priority queue in front of it. A released slot goes straight
+    to the highest-priority waiter (FIFO within a priority). Requests are rejected when the
+    queue is full (429) or when the estimated wait, from the queue length and the running
+    average service time, exceeds max_wait (503). Usable from the event loop (`enter`) and
+    from worker threads (`enter_blocking`).
+    """
+    def __init__(self, name: str, limit: int, max_queue: int, max_wait_ms: float):
+        self.name = name
+        self.limit = limit
+        self.max_queue = max_queue
+        self.max_wait = max_wait_ms / 1000
+        self._lock = Lock()
+        self._active = 0
+        self._queued = 0
+        self._heap: List[Tuple[int, int, _Waiter]] = []
+        self._order = itertools.count()
+        self._service_time = 0.0  # moving average, seconds
+        self.admitted = 0
+        self.rejected = 0
+
+    def _admit_or_queue(self, priority: int, wake, shed: bool) -> Optional[_Waiter]:
+        """None when a slot was free, else the queued waiter. Raises Overloaded when shedding."""
+        with self._lock:
+            if self._active < self.limit and not self._queued:
+                self._active += 1
+                self.admitted += 1
+                return None
+            if shed:
+                if self._queued >= self.max_queue:
+                    self.rejected += 1
+                    raise Overloaded(f"Too many queued {self.name} requests", 429, self._retry_after())
+                if self._estimated_wait() > self.max_wait:
+                    self.rejected += 1
+                    raise Overloaded(f"{self.name.capitalize()} capacity exhausted", 503, self._retry_after())
+            waiter = _Waiter(wake)
+            heapq.heappush(self._heap, (priority, next(self._order), waiter))
+            self._queued += 1
+            return waiter
+
+    def _estimated_wait(self) -> float:
+        return (self._queued + 1) / self.limit * self._service_time
+
+    def _retry_after(self) -> int:
+        return max(1, math.ceil(self._estimated_wait()))
+
+    def _abandon(self, waiter: _Waiter) -> bool:
+        """Withdraw a waiter; False if it was granted a slot meanwhile, which the caller now holds."""
+        with self._lock:
+            if waiter.granted:
+                return False
+            waiter.abandoned = True
+            self._queued -= 1
+            return True
+
+    async def enter(self, priority: int):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def wake():
+            loop.call_soon_threadsafe(lambda: future.done() or future.set_result(None))
+
+        waiter = self._admit_or_queue(priority, wake, shed=True)
+        if waiter is None:
+            return
+        try:
+            await asyncio.wait_for(future, self.max_wait)
+        except asyncio.TimeoutError:
+            if self._abandon(waiter):
+                with self._lock:
+                    self.rejected += 1
+                raise Overloaded(f"Timed out waiting for {self.name} capacity", 503, self._retry_after())
+        except BaseException:
+            # Client gone: hand back a slot granted in the meantime
+            if not self._abandon(waiter):
+                self.leave(0.0)
+            raise
+
+    def enter_blocking(self, priority: int):
+        """Wait for a slot without shedding; for background work that must eventually run."""
+        event = Event()
+        if self._admit_or_queue(priority, event.set, shed=False) is not None:
+            event.wait()
+
+    def leave(self, service_time: float):
+        with self._lock:
+            if service_time:
+                self._service_time = 0.8 * self._service_time + 0.2 * service_time
+            while self._heap:
+                _, _, waiter = heapq.heappop(self._heap)
+                if waiter.abandoned:
+                    continue
+                # The slot passes directly to the waiter, so _active is unchanged
+                waiter.granted = True
+                self._queued -= 1
+                self.admitted += 1
+                waiter.wake()
+                return
+            self._active -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "limit": self.limit,
+                "active": self._active,
+                "queued": self._queued,
+                "avg_service_ms": round(self._service_time * 1000, 3),
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+            }
+
+
+class Scheduler:
+    """
+    Admission control in front of the request handlers. Reads (searches and GETs) and writes
+    get separate gates, so a bulk load cannot take the worker threads searches need, and
+    searches are served ahead of other reads. Every request also passes a per-library gate,
+    taken first, so one busy library cannot occupy a whole class.
+    """
+    def __init__(self, read_concurrency: int = SCHEDULER_READ_CONCURRENCY,
+                 write_concurrency: int = SCHEDULER_WRITE_CONCURRENCY,
+                 library_concurrency: int = SCHEDULER_LIBRARY_CONCURRENCY,
+                 read_queue: int = SCHEDULER_READ_QUEUE, write_queue: int = SCHEDULER_WRITE_QUEUE,
+                 read_max_wait_ms: float = SCHEDULER_READ_MAX_WAIT_MS,
+                 write_max_wait_ms: float = SCHEDULER_WRITE_MAX_WAIT_MS):
+        self.reads = Gate("read", read_concurrency, read_queue, read_max_wait_ms)
+        self.writes = Gate("write", write_concurrency, write_queue, write_max_wait_ms)
+        self.library_concurrency = library_concurrency
+        # A library's queue may hold what both classes could queue for it
+        self._library_queue = read_queue + write_queue
+        self._library_max_wait_ms = max(read_max_wait_ms, write_max_wait_ms)
+        self._libraries: Dict[str, Tuple[Gate, int]] = {}
+        self._lock = Lock()
+
+    def _library_gate(self, library_id: str) -> Gate:
+        with self._lock:
+            gate, users = self._libraries.get(library_id) or (
+                Gate(f"library {library_id}", self.library_concurrency, self._library_queue, self._library_max_wait_ms), 0)
+            self._libraries[library_id] = (gate, users + 1)
+            return gate
+
+    def _release_library_gate(self, library_id: str):
+        with self._lock:
+            gate, users = self._libraries[library_id]
+            if users == 1:
+                del self._libraries[library_id]
+            else:
+                self._libraries[library_id] = (gate, users - 1)
+
+    @asynccontextmanager
+    async def admit(self, gate: Gate, priority: int, library_id: Optional[str] = None):
+        library_gate = self._library_gate(library_id) if library_id else None
+        try:
+            if library_gate:
+                await library_gate.enter(priority)
+            try:
+                await gate.enter(priority)
+            except BaseException:
+                if library_gate:
+                    library_gate.leave(0.0)
+                raise
+            start = time.monotonic()
+            try:
+                yield
+            finally:
+                elapsed = time.monotonic() - start
+                gate.leave(elapsed)
+                if library_gate:
+                    library_gate.leave(elapsed)
+        finally:
+            if library_gate:
+                self._release_library_gate(library_id)
+
+    @contextmanager
+    def background_write(self, library_id: str):
+        """A write slot for background work, granted after every waiting request."""
+        library_gate = self._library_gate(library_id)
+        try:
+            library_gate.enter_blocking(PRIORITY_BACKGROUND)
+            self.writes.enter_blocking(PRIORITY_BACKGROUND)
+            start = time.monotonic()
+            try:
+                yield
+            finally:
+                elapsed = time.monotonic() - start
+                self.writes.leave(elapsed)
+                library_gate.leave(elapsed)
+        finally:
+            self._release_library_gate(library_id)
+
+    async def classify(self, request: Request) -> Optional[Tuple[Gate, int, Optional[str]]]:
+        """(gate, priority, library id) for a request, or None if it is not scheduled."""
+        path = request.url.path
+        if path.startswith(_UNSCHEDULED_PREFIXES) or "wait_ms" in request.query_params:
+            return None
+        match = _LIBRARY_PATH.match(path)
+        library_id = match.group(1) if match else None
+        if path.startswith("/query"):
+            if library_id is None and request.method == "POST":
+                library_id = await _body_library_id(request)
+            return self.reads, PRIORITY_INTERACTIVE, library_id
+        if request.method in ("GET", "HEAD", "OPTIONS"):
+            return self.reads, PRIORITY_NORMAL, library_id
+        return self.writes, PRIORITY_NORMAL, library_id
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            libraries = {library_id: gate for library_id, (gate, _) in self._libraries.items()}
+        return {
+            "read": self.reads.stats(),
+            "write": self.writes.stats(),
+            "libraries": {library_id: gate.stats() for library_id, gate in libraries.items()},
+        }
+
+
+async def _body_library_id(request: Request) -> Optional[str]:
+    # Search bodies are small; the middleware buffers the body and replays it to the handler
+    try:
+        library_id = json.loads(await request.body()).get("library_id")
+    except (ValueError, AttributeError):
+        return None
+    return library_id if isinstance(library_id, str) else None
+
+
+scheduler = Scheduler()
@@ -0,0 +1,242 @@
+import os
+import json
+import time
+import logging
+from pathlib import Path
+from threading import Event, Lock, Thread
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from app.models.chunk_models import Chunk
+from app.models.library_models import Library
+from app.utils.indexing.index_type import IndexType
+from app.utils.indexing.indexing_service import IndexingService
+from app.utils.indexing.mapped_index import MappedIndex
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_DIR = Path(os.getenv("SNAPSHOT_DIR", "data/snapshots"))
+# How often the writer looks for changed libraries to publish
+SNAPSHOT_INTERVAL_SECONDS = float(os.getenv("SNAPSHOT_INTERVAL_SECONDS", "0.2"))
+# A library that keeps changing (e.g. under ingestion) is rewritten at most this often
+SNAPSHOT_MAX_DELAY_SECONDS = float(os.getenv("SNAPSHOT_MAX_DELAY_SECONDS", "2"))
+# How often readers look at the manifest for a new generation
+SNAPSHOT_POLL_SECONDS = float(os.getenv("SNAPSHOT_POLL_SECONDS", "0.1"))
+
+MANIFEST_NAME = "manifest.json"
+
+
+def _write_atomic(path: Path, write):
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        write(f)
+    os.replace(tmp, path)
+
+
+class SnapshotExporter:
+    """
+    Runs in the writer process. Every `interval` seconds, libraries whose version changed
+    are written to `directory` as a vector matrix (`<id>-<version>.npy`, canonical chunks
+    only) plus a JSON file with the library header and chunk texts. The manifest naming the
+    current file of every library is then replaced atomically; readers treat a new manifest
+    as the change notification. Files of the previous generation are kept until the next
+    one is published, so readers that just read the old manifest can still open them.
+
+    Every file is a full rewrite of its library, so changes are debounced: a changed library
+    is written once it stayed unchanged for a tick, or once it has waited `max_delay` seconds
+    while changes kept coming. New and deleted libraries are published on the next tick.
+    Evicted libraries are exported from their spill files and stay evicted.
+    """
+    def __init__(self, database, directory: Path = None, interval: float = None, max_delay: float = None):
+        self.database = database
+        self.directory = directory if directory is not None else SNAPSHOT_DIR
+        self.interval = interval if interval is not None else SNAPSHOT_INTERVAL_SECONDS
+        self.max_delay = max_delay if max_delay is not None else SNAPSHOT_MAX_DELAY_SECONDS
+        self.generation = 0
+        self._entries: Dict[str, Dict[str, Any]] = {}  # library id -> {"version", "name"}
+        self._pending: Dict[str, Tuple[int, float]] = {}  # library id -> (version seen, unpublished since)
+        self._files: Set[str] = set()  # snapshot names still on disk
+        self._stop = Event()
+        self._thread: Optional[Thread] = None
+
+    def start(self):
+        self.export_changed()
+        self._thread = Thread(target=self._loop, name="snapshot-exporter", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.export_changed()
+            except Exception:
+                logger.exception("Snapshot export failed; retrying next interval")
+
+    def _write_library(self, library_id: str) -> Optional[Dict[str, Any]]:
+        snapshot = self.database.snapshot_library(library_id)
+        if snapshot is None:
+            return None
+        version, header, index_type, chunks, _ = snapshot
+        name = f"{library_id}-{version}"
+        indexed = [chunk for chunk in chunks if chunk.duplicate_of is None]
+        dimension = len(indexed[0].embedding) if indexed else 0
+        matrix = np.array([chunk.embedding for chunk in indexed], dtype=np.float64).reshape(len(indexed), dimension)
+        _write_atomic(self.directory / f"{name}.npy", lambda f: np.save(f, matrix))
+        meta = {
+            "library": header,
+            "index_type": index_type.value,
+            "rows": [chunk.id for chunk in indexed],
+            "chunks": [chunk.model_dump(exclude={"embedding"}) for chunk in chunks],
+        }
+        _write_atomic(self.directory / f"{name}.json", lambda f: f.write(json.dumps(meta).encode()))
+        return {"version": version, "name": name}
+
+    def _due(self, changed: List[str], versions: Dict[str, int]) -> List[str]:
+        """The changed libraries to write now; the others wait for their changes to settle."""
+        now = time.monotonic()
+        pending, due = {}, []
+        for lid in changed:
+            seen = self._pending.get(lid)
+            since = seen[1] if seen is not None else now
+            settled = seen is not None and seen[0] == versions[lid]
+            if not self.generation or lid not in self._entries or settled or now - since >= self.max_delay:
+                due.append(lid)
+            else:
+                pending[lid] = (versions[lid], since)
+        self._pending = pending
+        return due
+
+    def export_changed(self) -> bool:
+        """Publish a new generation if any library changed; returns whether one was published."""
+        versions = self.database.library_versions()
+        changed = self._due(
+            [lid for lid, version in versions.items() if self._entries.get(lid, {}).get("version") != version], versions
+        )
+        removed = [lid for lid in self._entries if lid not in versions]
+        if not changed and not removed and self.generation:
+            return False
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        entries = dict(self._entries)
+        for lid in removed:
+            del entries[lid]
+        for lid in changed:
+            entry = self._write_library(lid)
+            if entry is None:
+                entries.pop(lid, None)  # deleted since versions were read
+            else:
+                entries[lid] = entry
+        self.generation += 1
+        manifest = {"generation": self.generation, "libraries": entries}
+        _write_atomic(self.directory / MANIFEST_NAME, lambda f: f.write(json.dumps(manifest).encode()))
+
+        keep = {entry["name"] for entry in entries.values()} | {entry["name"] for entry in self._entries.values()}
+        for name in self._files - keep:
+            for suffix in (".npy", ".json"):
+                (self.directory / f"{name}{suffix}").unlink(missing_ok=True)
+        self._files = keep
+        self._entries = entries
+        return True
+
+
+class SnapshotDB:
+    """
+    Read-only view of the database for reader workers, loaded from the writer's snapshots.
+    Vector matrices are memory-mapped, so N readers on one host share a single copy of
+    them; chunk embeddings are views into the mapping rather than Python lists. Offers the
+    subset of the InMemoryDB interface the query endpoints use. Every library is searched
+    with an exact MappedIndex; its index type, precision and reduction only apply on the writer.
+    """
+    def __init__(self, directory: Path = None, poll_interval: float = None):
+        self.directory = directory if directory is not None else SNAPSHOT_DIR
+        self.poll_interval = poll_interval if poll_interval is not None else SNAPSHOT_POLL_SECONDS
+        self._libraries: Dict[str, Library] = {}
+        self._indexing_services: Dict[str, IndexingService] = {}
+        self._versions: Dict[str, int] = {}
+        self._names: Dict[str, str] = {}
+        self._manifest_mtime: Optional[int] = None
+        self._next_check = 0.0
+        self._lock = Lock()
+        self.generation = 0
+
+    def _load_library(self, name: str):
+        with open(self.directory / f"{name}.json", "r") as f:
+            meta = json.load(f)
+        matrix = np.load(self.directory / f"{name}.npy", mmap_mode="r")
+        rows = {cid: row for row, cid in enumerate(meta["rows"])}
+
+        library = Library(**meta["library"])
+        for data in meta["chunks"]:
+            chunk = Chunk(**data, embedding=[])
+            row = rows.get(chunk.duplicate_of or chunk.id)
+            if row is not None:
+                # Assigned after validation, which would have copied the mapped row into a list
+                chunk.embedding = matrix[row]
+            library.chunk_map[chunk.id] = chunk
+
+        index_type = IndexType(meta["index_type"])
+        dimension = matrix.shape[1] if len(matrix) else None
+        indexing_service = IndexingService(MappedIndex(matrix, meta["rows"]), dimension=dimension, index_type=index_type)
+        return library, indexing_service
+
+    def refresh(self, force: bool = False):
+        """Load whatever the writer published since the last call; rate-limited to `poll_interval`."""
+        now = time.monotonic()
+        if not force and now < self._next_check:
+            return
+        self._next_check = now + self.poll_interval
+        manifest_path = self.directory / MANIFEST_NAME
+        try:
+            mtime = manifest_path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime == self._manifest_mtime:
+            return
+        with self._lock:
+            if mtime == self._manifest_mtime:
+                return
+            try:
+                with open(manifest_path, "r") as f:
+                    manifest = json.load(f)
+                loaded = {
+                    lid: self._load_library(entry["name"])
+                    for lid, entry in manifest["libraries"].items()
+                    if self._names.get(lid) != entry["name"]
+                }
+            except (OSError, ValueError) as e:
+                # A newer generation replaced these files mid-load; pick it up on the next poll
+                logger.warning(f"Could not load snapshot generation: {e}")
+                return
+            libraries = {lid: lib for lid, lib in self._libraries.items() if lid in manifest["libraries"]}
+            services = {lid: s for lid, s in self._indexing_services.items() if lid in manifest["libraries"]}
+            for lid, (library, indexing_service) in loaded.items():
+                libraries[lid] = library
+                services[lid] = indexing_service
+            # Swap whole dicts so lock-free readers never see a half-applied generation
+            self._libraries = libraries
+            self._indexing_services = services
+            self._versions = {lid: entry["version"] for lid, entry in manifest["libraries"].items()}
+            self._names = {lid: entry["name"] for lid, entry in manifest["libraries"].items()}
+            self.generation = manifest["generation"]
+            self._manifest_mtime = mtime
+
+    def get_library(self, library_id: str) -> Optional[Library]:
+        self.refresh()
+        return self._libraries.get(library_id)
+
+    def get_indexing_service(self, library_id: str) -> Optional[IndexingService]:
+        self.refresh()
+        return self._indexing_services.get(library_id)
+
+    def get_library_version(self, library_id: str) -> Optional[int]:
+        self.refresh()
+        return self._versions.get(library_id)
+
+    def list_libraries(self) -> List[Library]:
+        self.refresh()
+        return list(self._libraries.values())
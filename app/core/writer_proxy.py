@@ -0,0 +1,53 @@
+import os
+import logging
+from typing import Optional
+
+import httpx
+from fastapi import Request, Response
+
+logger = logging.getLogger(__name__)
+
+# Where a node sends requests it does not serve: the writer process (readers) or the primary (followers)
+WRITER_URL = os.getenv("WRITER_URL") or os.getenv("PRIMARY_URL") or "http://127.0.0.1:8001"
+WRITER_TIMEOUT_SECONDS = float(os.getenv("WRITER_TIMEOUT_SECONDS", "60"))
+
+# Hop-by-hop headers and ones httpx recomputes for the forwarded body
+_DROPPED_HEADERS = {"host", "content-length", "transfer-encoding", "connection", "keep-alive"}
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def _get_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(base_url=WRITER_URL, timeout=WRITER_TIMEOUT_SECONDS)
+    return _client
+
+
+def is_served_locally(request: Request) -> bool:
+    """Readers and followers answer searches themselves; everything else belongs to the writer."""
+    return request.url.path.startswith("/query")
+
+
+async def forward_to_writer(request: Request) -> Response:
+    headers = {k: v for k, v in request.headers.items() if k.lower() not in _DROPPED_HEADERS}
+    try:
+        upstream = await _get_client().request(
+            request.method,
+            request.url.path,
+            params=request.query_params,
+            headers=headers,
+            content=await request.body(),
+        )
+    except httpx.TransportError as e:
+        logger.warning(f"Writer unreachable at {WRITER_URL}: {e}")
+        return Response(status_code=503, content=b'{"detail":"Writer process unavailable"}', media_type="application/json")
+    response_headers = {k: v for k, v in upstream.headers.items() if k.lower() not in _DROPPED_HEADERS | {"content-encoding"}}
+    return Response(content=upstream.content, status_code=upstream.status_code, headers=response_headers)
+
+
+async def close():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
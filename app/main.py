@@ -1,13 +1,115 @@
-from fastapi import FastAPI
-from app.routers import libraries, documents, chunks, query
+import os
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
+from app.core import writer_proxy
+from app.core.db import DB_ROLE, db
+from app.core.jobs import job_manager
+from app.core.replication import replica
+from app.core.scheduler import Overloaded, scheduler
+from app.core.snapshots import SnapshotExporter
+from app.routers import libraries, documents, chunks, query, jobs, replication, backup, stats
+
+# How long a follower holds a query for its X-Min-Seq before giving up with 503
+REPLICA_READ_WAIT_MS = float(os.getenv("REPLICA_READ_WAIT_MS", "5000"))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if DB_ROLE in ("reader", "follower"):
+        # Jobs and persistence live in the writer or primary
+        if replica:
+            replica.start()
+        yield
+        if replica:
+            replica.stop()
+        await writer_proxy.close()
+        return
+    # Pick up ingestion jobs interrupted by the previous shutdown
+    job_manager.resume_pending()
+    exporter = SnapshotExporter(db) if DB_ROLE == "writer" else None
+    if exporter:
+        exporter.start()
+    yield
+    if exporter:
+        exporter.stop()
+    # db.json is written in the background; the last changes go out before the process exits
+    db.flush()
 
 app = FastAPI(
     title="Stack AI Vector DB API",
     version="1.0.0",
-    description="API for managing libraries, documents, chunks, and performing vector similarity search."
+    description="API for managing libraries, documents, chunks, and performing vector similarity search.",
+    lifespan=lifespan
 )
 
+# Registered first so it runs innermost: requests a reader or follower proxies are not admitted here
+@app.middleware("http")
+async def admission_control(request: Request, call_next):
+    admission = await scheduler.classify(request)
+    if admission is None:
+        return await call_next(request)
+    slot = scheduler.admit(*admission)
+    try:
+        await slot.__aenter__()
+    except Overloaded as e:
+        return JSONResponse(status_code=e.status_code, content={"detail": str(e)},
+                            headers={"Retry-After": str(e.retry_after)})
+    try:
+        response = await call_next(request)
+    except BaseException as e:
+        await slot.__aexit__(type(e), e, e.__traceback__)
+        raise
+    # call_next returns once headers are ready; streamed bodies (NDJSON lists, snapshots,
+    # backups) are still being produced, so the slot is held until the body is done
+    response.body_iterator = _release_after(response.body_iterator, slot)
+    return response
+
+async def _release_after(body, slot):
+    try:
+        async for part in body:
+            yield part
+    finally:
+        await slot.__aexit__(None, None, None)
+
+if DB_ROLE == "reader":
+    @app.middleware("http")
+    async def route_to_writer(request: Request, call_next):
+        if writer_proxy.is_served_locally(request):
+            return await call_next(request)
+        return await writer_proxy.forward_to_writer(request)
+elif DB_ROLE == "follower":
+    @app.middleware("http")
+    async def route_to_primary(request: Request, call_next):
+        if request.url.path == "/replication/status":
+            return await call_next(request)
+        if not writer_proxy.is_served_locally(request):
+            return await writer_proxy.forward_to_writer(request)
+        # Read-your-writes: hold the query until this follower has applied the client's last write
+        min_seq = request.headers.get("X-Min-Seq")
+        if min_seq is not None:
+            if not min_seq.isdigit():
+                return JSONResponse(status_code=400, content={"detail": "X-Min-Seq must be a sequence number"})
+            if not await run_in_threadpool(replica.wait_for, int(min_seq), REPLICA_READ_WAIT_MS / 1000):
+                return JSONResponse(status_code=503, content={"detail": f"Replica has not applied seq {min_seq} yet"},
+                                    headers={"Retry-After": "1"})
+        response = await call_next(request)
+        response.headers["X-Applied-Seq"] = str(replica.applied_seq)
+        return response
+else:
+    @app.middleware("http")
+    async def report_change_seq(request: Request, call_next):
+        response = await call_next(request)
+        if request.method not in ("GET", "HEAD", "OPTIONS"):
+            # Covers the request's own changes; send it as X-Min-Seq to a follower to read them back
+            response.headers["X-Change-Seq"] = str(db.changes.last_seq)
+        return response
+
 app.include_router(libraries.router)
 app.include_router(documents.router)
 app.include_router(chunks.router)
 app.include_router(query.router)
+app.include_router(jobs.router)
+app.include_router(replication.router)
+app.include_router(backup.router)
+app.include_router(stats.router)
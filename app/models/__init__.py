@@ -12,7 +12,25 @@ from .library_models import (
 )
 from .query_models import (
     QueryResult,
-    QueryRequest
+    QueryRequest,
+    SimilarChunksRequest,
+    DocumentQueryResult,
+    FederatedQueryRequest,
+    FederatedQueryResult,
+    FederatedQueryResponse
+)
+from .job_models import (
+    JobStatus,
+    IngestionRequest,
+    IngestionJob
+)
+from .change_models import (
+    ChangeEntity,
+    ChangeOp,
+    Change,
+    ChangeEvent,
+    ChangeFeedResponse,
+    ReplicationBatch
 )
 
 __all__ = [
@@ -27,5 +45,19 @@ __all__ = [
     "LibraryCreate",
     "LibraryResponse",
     "QueryResult",
-    "QueryRequest"
+    "QueryRequest",
+    "SimilarChunksRequest",
+    "DocumentQueryResult",
+    "FederatedQueryRequest",
+    "FederatedQueryResult",
+    "FederatedQueryResponse",
+    "JobStatus",
+    "IngestionRequest",
+    "IngestionJob",
+    "ChangeEntity",
+    "ChangeOp",
+    "Change",
+    "ChangeEvent",
+    "ChangeFeedResponse",
+    "ReplicationBatch"
 ]
@@ -0,0 +1,33 @@
+from enum import Enum
+from typing import Any, Dict, List, Optional
+from pydantic import BaseModel
+
+class ChangeEntity(str, Enum):
+    LIBRARY = "library"
+    DOCUMENT = "document"
+    CHUNK = "chunk"
+
+class ChangeOp(str, Enum):
+    INSERT = "insert"
+    UPDATE = "update"
+    DELETE = "delete"
+
+class Change(BaseModel):
+    seq: int
+    library_id: str
+    entity: ChangeEntity
+    op: ChangeOp
+    entity_id: str
+    document_id: Optional[str] = None  # owning document of chunk changes
+    timestamp: str
+
+class ChangeEvent(Change):
+    data: Optional[Dict[str, Any]] = None  # current state of the entity; None once it is deleted
+
+class ChangeFeedResponse(BaseModel):
+    changes: List[ChangeEvent]
+    next_since: int  # pass as `since` on the next call
+    has_more: bool
+
+class ReplicationBatch(ChangeFeedResponse):
+    head: int  # primary's latest seq, for lag reporting
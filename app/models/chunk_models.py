@@ -9,6 +9,7 @@ class Chunk(BaseModel):
     document_id: str
     embedding: List[float]
     metadata: Optional[ChunkMetadata] = None
+    duplicate_of: Optional[str] = None  # set for linked duplicates, which share that chunk's vector
 
 class ChunkInput(BaseModel):
     text: str
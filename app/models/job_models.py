@@ -0,0 +1,33 @@
+from enum import Enum
+from uuid import uuid4
+from typing import List, Optional
+from pydantic import BaseModel, Field, computed_field
+from .chunk_models import ChunkInput
+
+class JobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+class IngestionRequest(BaseModel):
+    chunks: List[ChunkInput] = Field(min_length=1)
+
+class IngestionJob(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid4()))
+    library_id: str
+    document_id: str
+    status: JobStatus = JobStatus.QUEUED
+    total: int
+    processed: int = 0
+    duplicates: int = 0  # inputs matched to an existing chunk by the library's dedupe policy
+    errors: List[str] = Field(default_factory=list)
+    created_at: str
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+    throughput: float = 0.0  # chunks per second over the current run
+
+    @computed_field
+    @property
+    def progress(self) -> float:
+        return self.processed / self.total if self.total else 1.0
@@ -1,6 +1,9 @@
-from typing import List, Literal
-from pydantic import BaseModel
+from typing import List, Literal, Optional
+from pydantic import BaseModel, Field, model_validator
 from app.utils.indexing.index_type import IndexType
+from app.utils.indexing.precision_type import Precision
+from app.utils.indexing.reduction_type import ReductionType
+from app.utils.dedupe import DedupePolicy
 
 class ChunkMetadata(BaseModel):
     source: str
@@ -19,4 +22,30 @@ class LibraryMetadata(BaseModel):
     created_at: str
     use_case: str
     access_level: Literal["private", "public", "restricted"] = "private"
-    index_type: IndexType = IndexType.LINEAR
\ No newline at end of file
+    index_type: IndexType = IndexType.LINEAR
+    # Optional two-stage search: scan reduced vectors, then re-rank candidate_multiplier * k of them exactly
+    reduction: Optional[ReductionType] = None
+    reduced_dimension: int = Field(default=64, ge=1)
+    candidate_multiplier: int = Field(default=4, ge=1)
+    # Index scans over quantized copies of the vectors; rescore re-ranks candidate_multiplier * k of them exactly
+    precision: Precision = Precision.FLOAT64
+    rescore: bool = True
+    # Duplicate detection on chunk ingestion; disabled when no policy is set
+    dedupe: Optional[DedupePolicy] = None
+    near_duplicate_threshold: Optional[float] = Field(default=0.8, gt=0, le=1)  # None: exact matches only
+
+    @model_validator(mode="after")
+    def check_reduction(self):
+        if self.reduction is not None and self.index_type not in (IndexType.LINEAR, IndexType.CLUSTERED):
+            raise ValueError("reduction is only supported by the linear and clustered indexes")
+        return self
+
+    @model_validator(mode="after")
+    def check_precision(self):
+        if self.precision == Precision.FLOAT64:
+            return self
+        if self.index_type not in (IndexType.LINEAR, IndexType.CLUSTERED):
+            raise ValueError("precision is only supported by the linear and clustered indexes")
+        if self.reduction is not None:
+            raise ValueError("precision cannot be combined with reduction")
+        return self
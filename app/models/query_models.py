@@ -1,15 +1,89 @@
-from typing import Literal
-from pydantic import BaseModel, Field
+from typing import Any, Dict, List, Literal, Optional
+from pydantic import BaseModel, Field, model_validator
 from app.models.metadata_models import ChunkMetadata
 
+DistanceMetric = Literal["euclidean", "cosine"]
+
 class QueryRequest(BaseModel):
     library_id: str
-    query_text: str
+    query_text: Optional[str] = None
+    query_vector: Optional[List[float]] = None
+    chunk_id: Optional[str] = None  # "more like this": reuse the stored embedding of an existing chunk
+    k: Optional[int] = Field(default=5, ge=1)  # result cap; may be null for range queries
+    distance_metric: DistanceMetric = "euclidean"
+    # Range query: only return chunks within max_distance, or with cosine similarity >= min_score
+    max_distance: Optional[float] = Field(default=None, ge=0)
+    min_score: Optional[float] = Field(default=None, ge=-1, le=1)
+    # Grouped retrieval: k then counts distinct documents, each with up to chunks_per_group chunks
+    group_by: Optional[Literal["document"]] = None
+    chunks_per_group: int = Field(default=1, ge=1)
+    # Search budget: when exhausted the best results found so far are returned, flagged as approximate
+    deadline_ms: Optional[float] = Field(default=None, gt=0)
+    max_candidates: Optional[int] = Field(default=None, ge=1)
+
+    @model_validator(mode="after")
+    def check_single_query_source(self):
+        sources = [self.query_text, self.query_vector, self.chunk_id]
+        if sum(source is not None for source in sources) != 1:
+            raise ValueError("Exactly one of query_text, query_vector or chunk_id must be provided")
+        if self.min_score is not None and self.distance_metric != "cosine":
+            raise ValueError("min_score is only supported with the cosine distance metric")
+        if self.k is None and self.range_distance() is None:
+            raise ValueError("k may only be omitted for range queries (max_distance or min_score)")
+        return self
+
+    def range_distance(self) -> Optional[float]:
+        """The range bound expressed as a distance (cosine distance = 1 - similarity)."""
+        bounds = []
+        if self.max_distance is not None:
+            bounds.append(self.max_distance)
+        if self.min_score is not None:
+            bounds.append(1.0 - self.min_score)
+        return min(bounds) if bounds else None
+
+class SimilarChunksRequest(BaseModel):
+    library_id: str
+    chunk_ids: List[str] = Field(min_length=1)
+    k: int = Field(default=5, ge=1)
+    distance_metric: DistanceMetric = "euclidean"
+
+class FederatedQueryRequest(BaseModel):
+    library_ids: Optional[List[str]] = None
+    library_filter: Optional[Dict[str, Any]] = None  # LibraryMetadata field -> required value
+    query_text: Optional[str] = None
+    query_vector: Optional[List[float]] = None
     k: int = Field(default=5, ge=1)
-    distance_metric: Literal["euclidean", "cosine"] = "euclidean"
+    distance_metric: DistanceMetric = "euclidean"
+    timeout_ms: int = Field(default=1000, ge=1)  # per-library deadline
+    max_candidates: Optional[int] = Field(default=None, ge=1)  # per-library search budget
+
+    @model_validator(mode="after")
+    def check_sources(self):
+        if self.library_ids is None and self.library_filter is None:
+            raise ValueError("Either library_ids or library_filter must be provided")
+        if (self.query_text is None) == (self.query_vector is None):
+            raise ValueError("Exactly one of query_text or query_vector must be provided")
+        return self
 
 class QueryResult(BaseModel):
     chunk_id: str
     score: float
     text: str
-    metadata: ChunkMetadata
\ No newline at end of file
+    metadata: ChunkMetadata
+
+class DocumentQueryResult(BaseModel):
+    document_id: str
+    title: Optional[str] = None
+    score: float  # score of the document's best chunk
+    chunks: List[QueryResult]
+
+class FederatedQueryResult(QueryResult):
+    library_id: str
+
+class FederatedQueryResponse(BaseModel):
+    results: List[FederatedQueryResult]
+    searched_libraries: List[str]
+    timed_out_libraries: List[str] = Field(default_factory=list)
+    failed_libraries: Dict[str, str] = Field(default_factory=dict)
+    partial: bool = False
+    approximate: bool = False
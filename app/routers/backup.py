@@ -0,0 +1,43 @@
+from typing import List, Optional
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from app.core.backup import BackupReader, encode_backup, restore_backup
+from app.core.db import db
+
+router = APIRouter(prefix="/backup", tags=["backup"])
+
+@router.get("/")
+def export_backup(library_id: Optional[List[str]] = Query(default=None)):
+    """Binary backup of the given libraries (all by default), streamed while writes continue."""
+    for lid in library_id or []:
+        if db.get_library(lid) is None:
+            raise HTTPException(status_code=404, detail=f"Library {lid} not found")
+    return StreamingResponse(
+        encode_backup(db, library_id),
+        media_type="application/octet-stream",
+        headers={"Content-Disposition": 'attachment; filename="vectordb.backup"'},
+    )
+
+@router.post("/restore", openapi_extra={
+    "requestBody": {"required": True, "content": {"application/octet-stream": {"schema": {"type": "string", "format": "binary"}}}}
+})
+async def restore_from_backup(request: Request):
+    """
+    Load a backup produced by GET /backup, replacing libraries with the same ids. Nothing
+    is restored unless the whole stream decodes and every checksum matches.
+    """
+    reader = BackupReader()
+    try:
+        async for data in request.stream():
+            await run_in_threadpool(reader.feed, data)
+        reader.finish()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid backup: {e}")
+
+    await run_in_threadpool(restore_backup, db, reader.libraries)
+    return {
+        "libraries": [restored.library.id for restored in reader.libraries],
+        "chunks": sum(len(restored.library.chunk_map) for restored in reader.libraries),
+        "seq": reader.info["seq"],
+    }
@@ -1,10 +1,16 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query, Response
 from uuid import uuid4
+from typing import List, Optional
 from datetime import datetime, timezone
 from app.models.chunk_models import Chunk, ChunkInput
+from app.models.change_models import ChangeEntity, ChangeOp
 from app.models.metadata_models import ChunkMetadata
+from app.core.changes import Mutation
 from app.core.db import db  # InMemoryDB instance
-from app.utils.embeddings import get_embedding
+from app.utils.embeddings import get_embedding, get_embedding_provider
+from app.utils.dedupe import DedupePolicy
+from app.utils.indexing.indexing_service import IndexingService
+from app.utils.pagination import MAX_PAGE_SIZE, OutputFormat, list_response, resolve_fields
 
 router = APIRouter(
     prefix="/libraries/{library_id}/documents/{document_id}/chunks",
@@ -14,8 +20,17 @@ router = APIRouter(
 def now_iso():
     return datetime.now(timezone.utc).isoformat()
 
+def _embed(indexing_service: IndexingService, text: str) -> List[float]:
+    # Checked before the provider call: a library indexed with another provider's dimension cannot hold this vector
+    provider = get_embedding_provider()
+    try:
+        indexing_service.validate_provider(provider)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return get_embedding(text)
+
 @router.post("/")
-def add_chunk(library_id: str, document_id: str, chunk_input: ChunkInput):
+def add_chunk(library_id: str, document_id: str, chunk_input: ChunkInput, response: Response):
     library = db.get_library(library_id)
     if not library:
         raise HTTPException(status_code=404, detail="Library not found")
@@ -24,7 +39,22 @@ def add_chunk(library_id: str, document_id: str, chunk_input: ChunkInput):
     if not document:
         raise HTTPException(status_code=404, detail="Document not found")
 
-    embedding = get_embedding(chunk_input.text)
+    indexing_service = db.get_indexing_service(library_id)
+    if not indexing_service:
+        raise HTTPException(status_code=500, detail="Indexing service not initialized for this library")
+
+    policy = db.dedupe_policy(library_id)
+    duplicate, exact = db.find_duplicate(library_id, chunk_input.text) or (None, False)
+    if duplicate and policy == DedupePolicy.SKIP:
+        response.headers["X-Duplicate-Of"] = duplicate.id
+        return duplicate
+
+    # Duplicates reuse the stored embedding instead of calling the provider again
+    if duplicate and policy and policy.reuses_embedding(exact):
+        embedding = duplicate.embedding
+    else:
+        embedding = _embed(indexing_service, chunk_input.text)
+
     metadata = ChunkMetadata(**chunk_input.metadata.model_dump()) if chunk_input.metadata else ChunkMetadata()
     metadata.created_at = now_iso()
 
@@ -33,23 +63,29 @@ def add_chunk(library_id: str, document_id: str, chunk_input: ChunkInput):
         text=chunk_input.text,
         document_id=document_id,
         embedding=embedding,
-        metadata=metadata
+        metadata=metadata,
+        duplicate_of=duplicate.id if duplicate and policy == DedupePolicy.LINK else None
     )
 
     library.chunk_map[new_chunk.id] = new_chunk
     document.chunk_ids.append(new_chunk.id)  
 
-    indexing_service = db.get_indexing_service(library_id)
-    if not indexing_service:
-        raise HTTPException(status_code=500, detail="Indexing service not initialized for this library")
-    indexing_service.add_chunk(new_chunk)
+    db.index_chunk(library_id, new_chunk)
 
-    db.update_library(library)
+    db.update_library(library, [Mutation(ChangeEntity.CHUNK, ChangeOp.INSERT, new_chunk.id, document_id)])
 
     return new_chunk
 
 @router.get("/")
-def list_chunks(library_id: str, document_id: str):
+def list_chunks(
+    library_id: str,
+    document_id: str,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(default=None, ge=1, le=MAX_PAGE_SIZE),
+    fields: Optional[str] = None,
+    include_embedding: bool = False,
+    output_format: OutputFormat = Query(default="json", alias="format"),
+):
     library = db.get_library(library_id)
     if not library:
         raise HTTPException(status_code=404, detail="Library not found")
@@ -58,7 +94,16 @@ def list_chunks(library_id: str, document_id: str):
     if not document:
         raise HTTPException(status_code=404, detail="Document not found")
 
-    return [library.chunk_map[chunk_id] for chunk_id in document.chunk_ids]
+    # Embeddings are only returned on request: they dominate the payload size
+    include = resolve_fields(Chunk, fields, default_exclude={"embedding"})
+    if include_embedding:
+        include.add("embedding")
+
+    def serialize(chunk_id: str):
+        chunk = library.chunk_map.get(chunk_id)
+        return chunk.model_dump(include=include) if chunk else None
+
+    return list_response(list(document.chunk_ids), serialize, cursor, limit, output_format)
 
 @router.get("/{chunk_id}")
 def get_chunk(library_id: str, document_id: str, chunk_id: str):
@@ -94,7 +139,9 @@ def update_chunk(library_id: str, document_id: str, chunk_id: str, chunk_input:
         raise HTTPException(status_code=404, detail="Chunk not found in document")
 
     # Update metadata
-    embedding = get_embedding(chunk_input.text)
+    indexing_service = db.get_indexing_service(library_id)
+    embedding = _embed(indexing_service, chunk_input.text) if indexing_service else get_embedding(chunk_input.text)
+
     metadata = ChunkMetadata(**chunk_input.metadata.model_dump()) if chunk_input.metadata else ChunkMetadata()
     metadata.created_at = now_iso()
 
@@ -107,14 +154,16 @@ def update_chunk(library_id: str, document_id: str, chunk_id: str, chunk_input:
     )
 
     # Replace chunk in chunk_map
+    previous = library.chunk_map.get(chunk_id)
     library.chunk_map[chunk_id] = updated_chunk
     
-    # Rebuild with updated chunk
-    indexing_service = db.get_indexing_service(library_id)
+    # Re-index the updated chunk
     if indexing_service:
-        indexing_service.rebuild_index(library.chunk_map)
+        if previous:
+            db.unindex_chunk(library_id, previous)
+        db.index_chunk(library_id, updated_chunk)
 
-    db.update_library(library)
+    db.update_library(library, [Mutation(ChangeEntity.CHUNK, ChangeOp.UPDATE, chunk_id, document_id)])
     return updated_chunk
 
 @router.delete("/{chunk_id}")
@@ -135,14 +184,13 @@ def delete_chunk(library_id: str, document_id: str, chunk_id: str):
     document.chunk_ids.remove(chunk_id)
 
     # Remove from chunk_map
-    library.chunk_map.pop(chunk_id, None)
+    chunk = library.chunk_map.pop(chunk_id, None)
 
-    # Rebuild without deleted chunk
-    indexing_service = db.get_indexing_service(library_id)
-    if indexing_service:
-        indexing_service.rebuild_index(library.chunk_map)
+    # Drop the deleted chunk from the index
+    if chunk and db.get_indexing_service(library_id):
+        db.unindex_chunk(library_id, chunk)
 
     # Update the library
-    db.update_library(library)
+    db.update_library(library, [Mutation(ChangeEntity.CHUNK, ChangeOp.DELETE, chunk_id, document_id)])
 
     return {"detail": "Chunk deleted"}
\ No newline at end of file
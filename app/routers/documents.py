@@ -1,9 +1,15 @@
-from fastapi import APIRouter, HTTPException
+import codecs
+from fastapi import APIRouter, HTTPException, Query, Request
+from starlette.concurrency import run_in_threadpool
 from uuid import uuid4
-from typing import List
+from typing import List, Optional
 from datetime import datetime, timezone
+from app.core.changes import Mutation
 from app.core.db import db
-from app.models import Document, DocumentMetadata, DocumentInput
+from app.core.jobs import INGEST_BATCH_SIZE, build_chunks
+from app.models import ChangeEntity, ChangeOp, ChunkInput, ChunkMetadata, Document, DocumentMetadata, DocumentInput
+from app.utils.chunking import ChunkingStrategy, TextChunker
+from app.utils.pagination import MAX_PAGE_SIZE, OutputFormat, list_response, resolve_fields
 
 router = APIRouter(prefix="/libraries/{library_id}/documents", tags=["documents"])
 
@@ -31,16 +37,106 @@ def create_document(library_id: str, document_input: DocumentInput):
     )
 
     library.documents[document.id] = document
-    db.update_library(library)
+    db.update_library(library, [Mutation(ChangeEntity.DOCUMENT, ChangeOp.INSERT, document.id)])
 
     return document
 
+MAX_UPLOAD_CHUNK_SIZE = 2000
+
+@router.post("/upload", response_model=Document, openapi_extra={
+    "requestBody": {"required": True, "content": {"text/plain": {"schema": {"type": "string"}}}}
+})
+async def upload_document(
+    library_id: str,
+    request: Request,
+    title: str,
+    strategy: ChunkingStrategy = ChunkingStrategy.TOKENS,
+    chunk_size: int = Query(default=200, ge=1, le=MAX_UPLOAD_CHUNK_SIZE),
+    overlap: int = Query(default=0, ge=0),
+    category: str = "upload",
+    source_type: str = "upload",
+    tags: List[str] = Query(default=[]),
+    source: Optional[str] = None,
+    author: str = "unknown",
+    language: str = "en",
+):
+    """
+    Create a document from raw UTF-8 text streamed in the request body. The text is chunked
+    as it arrives and every INGEST_BATCH_SIZE chunks are embedded and indexed together, so
+    only one batch is held in memory however long the document is.
+    """
+    library = await run_in_threadpool(db.get_library, library_id)
+    if not library:
+        raise HTTPException(status_code=404, detail="Library not found")
+    if overlap >= chunk_size:
+        raise HTTPException(status_code=400, detail="overlap must be smaller than chunk_size")
+
+    created_at = now_iso()
+    document = Document(
+        id=str(uuid4()),
+        title=title,
+        library_id=library_id,
+        metadata=DocumentMetadata(category=category, created_at=created_at, source_type=source_type, tags=tags),
+    )
+    library.documents[document.id] = document
+    await run_in_threadpool(db.update_library, library, [Mutation(ChangeEntity.DOCUMENT, ChangeOp.INSERT, document.id)])
+
+    chunk_metadata = ChunkMetadata(source=source or title, created_at=created_at, author=author, language=language)
+    chunker = TextChunker(strategy, chunk_size, overlap)
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    batch: List[ChunkInput] = []
+
+    def store(inputs: List[ChunkInput]):
+        chunks, _ = build_chunks(library_id, document.id, inputs, [str(uuid4()) for _ in inputs])
+        db.add_chunks(library_id, document.id, chunks)
+
+    try:
+        async for data in request.stream():
+            for text in chunker.feed(decoder.decode(data)):
+                batch.append(ChunkInput(text=text, metadata=chunk_metadata))
+                if len(batch) == INGEST_BATCH_SIZE:
+                    # The body is not read further until the batch is stored
+                    await run_in_threadpool(store, batch)
+                    batch = []
+        for text in chunker.feed(decoder.decode(b"", final=True)) + chunker.finish():
+            batch.append(ChunkInput(text=text, metadata=chunk_metadata))
+        for start in range(0, len(batch), INGEST_BATCH_SIZE):
+            await run_in_threadpool(store, batch[start:start + INGEST_BATCH_SIZE])
+    except (ValueError, KeyError, RuntimeError) as e:
+        # Do not leave a partially ingested document behind
+        try:
+            await run_in_threadpool(delete_document, library_id, document.id)
+        except HTTPException:
+            pass  # the library or document is already gone
+        if isinstance(e, KeyError):
+            raise HTTPException(status_code=404, detail=str(e))
+        if isinstance(e, RuntimeError):
+            raise HTTPException(status_code=502, detail=f"Embedding failed: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # Looked up again: a library evicted meanwhile comes back with its own copy of the document
+    library = await run_in_threadpool(db.get_library, library_id)
+    return library.documents.get(document.id, document) if library else document
+
 @router.get("/")
-def list_documents(library_id: str) -> List[Document]:
+def list_documents(
+    library_id: str,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(default=None, ge=1, le=MAX_PAGE_SIZE),
+    fields: Optional[str] = None,
+    output_format: OutputFormat = Query(default="json", alias="format"),
+):
     library = db.get_library(library_id)
     if not library:
         raise HTTPException(status_code=404, detail="Library not found")
-    return list(library.documents.values())
+
+    include = resolve_fields(Document, fields)
+
+    def serialize(document_id: str):
+        document = library.documents.get(document_id)
+        return document.model_dump(include=include) if document else None
+
+    return list_response(list(library.documents), serialize, cursor, limit, output_format)
 
 @router.get("/{document_id}", response_model=Document)
 def get_document(library_id: str, document_id: str):
@@ -82,7 +178,7 @@ def update_document(library_id: str, document_id: str, updated_doc_input: Docume
     )
 
     library.documents[document_id] = updated_doc
-    db.update_library(library)
+    db.update_library(library, [Mutation(ChangeEntity.DOCUMENT, ChangeOp.UPDATE, document_id)])
 
     return updated_doc
 
@@ -96,14 +192,14 @@ def delete_document(library_id: str, document_id: str):
     if not document:
         raise HTTPException(status_code=404, detail="Document not found")
 
-    # Remove associated chunks
-    for chunk_id in document.chunk_ids:
-        library.chunk_map.pop(chunk_id, None)
-
-    # Rebuild index
-    indexing_service = db.get_indexing_service(library_id)
-    if indexing_service:
-        indexing_service.rebuild_index(library.chunk_map)
+    # Remove associated chunks from storage first, so none of them is promoted to replace another
+    removed = [chunk for chunk_id in document.chunk_ids if (chunk := library.chunk_map.pop(chunk_id, None))]
+    if db.get_indexing_service(library_id):
+        for chunk in removed:
+            db.unindex_chunk(library_id, chunk)
 
-    db.update_library(library)
+    db.update_library(library, [
+        *(Mutation(ChangeEntity.CHUNK, ChangeOp.DELETE, chunk.id, document_id) for chunk in removed),
+        Mutation(ChangeEntity.DOCUMENT, ChangeOp.DELETE, document_id),
+    ])
     return {"detail": f"Document {document_id} and its chunks deleted"}
\ No newline at end of file
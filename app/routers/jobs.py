@@ -0,0 +1,42 @@
+from fastapi import APIRouter, HTTPException
+from typing import List
+from app.core.db import db
+from app.core.jobs import job_manager, JobQueueFullError
+from app.models.job_models import IngestionJob, IngestionRequest
+from app.utils.embeddings import get_embedding_provider
+
+router = APIRouter(tags=["jobs"])
+
+@router.post("/libraries/{library_id}/documents/{document_id}/ingest", response_model=IngestionJob, status_code=202)
+def ingest_chunks(library_id: str, document_id: str, request: IngestionRequest):
+    library = db.get_library(library_id)
+    if not library:
+        raise HTTPException(status_code=404, detail="Library not found")
+
+    if document_id not in library.documents:
+        raise HTTPException(status_code=404, detail="Document not found")
+
+    # Rejected up front rather than failing the job once its first batch is embedded
+    indexing_service = db.get_indexing_service(library_id)
+    provider = get_embedding_provider()
+    if indexing_service:
+        try:
+            indexing_service.validate_provider(provider)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        return job_manager.submit(library_id, document_id, request.chunks)
+    except JobQueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "5"})
+
+@router.get("/jobs/", response_model=List[IngestionJob])
+def list_jobs():
+    return job_manager.list()
+
+@router.get("/jobs/{job_id}", response_model=IngestionJob)
+def get_job(job_id: str):
+    job = job_manager.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
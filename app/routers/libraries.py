@@ -1,9 +1,13 @@
 from fastapi import APIRouter, HTTPException, Query
+from typing import Optional
 from datetime import datetime, timezone
+from app.core.changes import entity_state
 from app.core.db import db
+from app.models.change_models import ChangeEvent, ChangeFeedResponse
 from app.models.library_models import Library, LibraryCreate, LibraryResponse
 from app.models.metadata_models import LibraryMetadata
 from app.utils.indexing.index_type import IndexType
+from app.utils.pagination import MAX_PAGE_SIZE, OutputFormat, list_response, resolve_fields
 
 
 router = APIRouter(prefix="/libraries", tags=["libraries"])
@@ -28,17 +32,29 @@ def create_library(library_data: LibraryCreate):
         metadata=library.metadata
     )
 
-@router.get("/", response_model=list[LibraryResponse])
-def list_libraries():
-    libraries = db.list_libraries()
-    return [
-        LibraryResponse(
-            id=lib.id,
-            name=lib.name,
-            documents=lib.documents,
-            metadata=lib.metadata
-        ) for lib in libraries
-    ]
+@router.get("/")
+def list_libraries(
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(default=None, ge=1, le=MAX_PAGE_SIZE),
+    fields: Optional[str] = None,
+    output_format: OutputFormat = Query(default="json", alias="format"),
+):
+    # Full documents (with every chunk id) are opt-in via `fields=documents`
+    include = resolve_fields(
+        LibraryResponse, fields, default_exclude={"documents"}, extra_fields={"document_count"}
+    )
+    libraries = {lib.id: lib for lib in db.list_libraries()}
+
+    def serialize(library_id: str):
+        library = libraries.get(library_id)
+        if not library:
+            return None
+        item = library.model_dump(include=include & {"id", "name", "metadata", "documents"})
+        if "document_count" in include:
+            item["document_count"] = len(library.documents)
+        return item
+
+    return list_response(list(libraries), serialize, cursor, limit, output_format)
 
 @router.get("/{library_id}", response_model=LibraryResponse)
 def get_library(library_id: str):
@@ -59,14 +75,18 @@ def update_library(library_id: str, updated_data: LibraryCreate):
     if not library:
         raise HTTPException(status_code=404, detail="Library not found")
 
-    library.name = updated_data.name
-
+    metadata = library.metadata
     if updated_data.metadata:
         new_meta = updated_data.metadata.model_dump()
         new_meta["created_at"] = library.metadata.created_at if library.metadata and library.metadata.created_at else now_iso()
-        library.metadata = LibraryMetadata(**new_meta)
+        metadata = LibraryMetadata(**new_meta)
 
-    db.update_library(library)
+    # A new index type or new index settings are built in the background; queries keep using
+    # the current index until the swap. A conflicting migration is rejected before anything is saved.
+    try:
+        library = db.reconfigure_library(library_id, updated_data.name, metadata)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
 
     return LibraryResponse(
         id=library.id,
@@ -75,6 +95,52 @@ def update_library(library_id: str, updated_data: LibraryCreate):
         metadata=library.metadata
     )
 
+@router.get("/{library_id}/index")
+def get_library_index(library_id: str):
+    indexing_service = db.get_indexing_service(library_id)
+    if not indexing_service:
+        raise HTTPException(status_code=404, detail="Library not found")
+
+    return {
+        "index_type": indexing_service.index_type,
+        "migrating_to": indexing_service.migrating_to,
+        "dimension": indexing_service.dimension,
+    }
+
+# Long-polls hold a worker thread, so they are capped
+MAX_CHANGES_WAIT_MS = 30000
+
+@router.get("/{library_id}/changes", response_model=ChangeFeedResponse)
+def get_library_changes(
+    library_id: str,
+    since: Optional[int] = Query(default=None, ge=0),
+    limit: int = Query(default=100, ge=1, le=MAX_PAGE_SIZE),
+    wait_ms: int = Query(default=0, ge=0, le=MAX_CHANGES_WAIT_MS),
+    include_embedding: bool = False,
+):
+    """
+    Inserts, updates and deletes of the library, its documents and its chunks with
+    seq > since, oldest first. Without `since` nothing is returned and `next_since` is the
+    current head, the point to follow from after a full sync. `wait_ms` long-polls until a
+    change arrives. Events carry the entity's current state, not the state at that seq.
+    """
+    if since is None:
+        return ChangeFeedResponse(changes=[], next_since=db.changes.last_seq, has_more=False)
+    try:
+        changes, next_since, has_more = db.changes.read(library_id, since, limit)
+        if not changes and wait_ms and db.changes.wait(library_id, since, wait_ms / 1000):
+            changes, next_since, has_more = db.changes.read(library_id, since, limit)
+    except ValueError as e:
+        # The gap can no longer be replayed; the client has to resync the whole library
+        raise HTTPException(status_code=410, detail=str(e))
+
+    library = db.get_library(library_id)
+    events = [
+        ChangeEvent(**change.model_dump(), data=entity_state(library, change, include_embedding))
+        for change in changes
+    ]
+    return ChangeFeedResponse(changes=events, next_since=next_since, has_more=has_more)
+
 @router.delete("/{library_id}")
 def delete_library(library_id: str):
     if not db.get_library(library_id):
@@ -1,43 +1,262 @@
+import os
+import heapq
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor, wait
 from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
-from typing import List, Literal
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
 from app.core.db import db
-from app.utils.embeddings import get_embedding
-from app.utils.similarity import cosine_similarity, euclidean_distance
-from app.models import QueryRequest, QueryResult
+from app.core.cache import query_cache
+from app.models.chunk_models import Chunk
+from app.models.library_models import Library
+from app.utils.embeddings import get_embedding, get_embedding_provider
+from app.utils.indexing.indexing_service import IndexingService
+from app.utils.indexing.search import DistanceFn, SearchBudget
+from app.utils.serialization import FastJSONResponse, dumps, encode_array, encode_hit
+from app.utils.similarity import cosine_distance, euclidean_distance
+from app.models import (
+    QueryRequest,
+    QueryResult,
+    SimilarChunksRequest,
+    DocumentQueryResult,
+    FederatedQueryRequest,
+    FederatedQueryResult,
+    FederatedQueryResponse
+)
 
 router = APIRouter()
 
-@router.post("/query", response_model=List[QueryResult])
-def search_library(req: QueryRequest):
-    library = db.get_library(req.library_id)
+FEDERATED_QUERY_WORKERS = int(os.getenv("FEDERATED_QUERY_WORKERS", "8"))
+federated_executor = ThreadPoolExecutor(max_workers=FEDERATED_QUERY_WORKERS, thread_name_prefix="federated-query")
+
+def _get_library_and_index(library_id: str):
+    library = db.get_library(library_id)
     if not library:
         raise HTTPException(status_code=404, detail="Library not found")
 
-    indexing_service = db.get_indexing_service(req.library_id)
+    indexing_service = db.get_indexing_service(library_id)
     if not indexing_service:
         raise HTTPException(status_code=404, detail="Index not initialized for this library")
+    return library, indexing_service
+
+def _distance_fn(distance_metric: str) -> DistanceFn:
+    # Passed per query: the index is shared by concurrent requests, which may ask for different metrics
+    return cosine_distance if distance_metric == "cosine" else euclidean_distance
+
+def _stored_embedding(library: Library, chunk_id: str) -> List[float]:
+    chunk = library.chunk_map.get(chunk_id)
+    if not chunk:
+        raise HTTPException(status_code=404, detail=f"Chunk {chunk_id} not found")
+    return chunk.embedding
 
-    if hasattr(indexing_service.strategy, "distance_fn"):
-        if req.distance_metric == "cosine":
-            indexing_service.strategy.distance_fn = cosine_similarity
-        else:
-            indexing_service.strategy.distance_fn = euclidean_distance
+def _query_fingerprint(req: QueryRequest) -> Any:
+    if req.query_text is not None:
+        query = req.query_text
+    elif req.query_vector is not None:
+        query = {"vector": req.query_vector}
+    else:
+        query = {"chunk_id": req.chunk_id}
+    if req.range_distance() is None and req.group_by is None:
+        return query
+    return {
+        "query": query,
+        "max_distance": req.range_distance(),
+        "group_by": req.group_by,
+        "chunks_per_group": req.chunks_per_group,
+    }
 
+def _resolve_query_vector(req: QueryRequest, library: Library, indexing_service: IndexingService) -> List[float]:
+    # Only text queries need the embedding provider
+    if req.query_vector is not None:
+        return req.query_vector
+    if req.chunk_id is not None:
+        return _stored_embedding(library, req.chunk_id)
+    provider = get_embedding_provider()
     try:
-        query_vector = get_embedding(req.query_text)
+        indexing_service.validate_provider(provider)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    try:
+        return get_embedding(req.query_text)
     except RuntimeError as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-    results = indexing_service.search_chunks(query_vector, k=req.k)
+def _to_score(distance: float, distance_metric: str) -> float:
+    # Indexes rank by distance; cosine results are reported as similarity
+    return 1.0 - float(distance) if distance_metric == "cosine" else float(distance)
+
+def _document_of(library: Library) -> Callable[[str], str]:
+    def group_fn(chunk_id: str) -> str:
+        chunk = library.chunk_map.get(chunk_id)
+        return chunk.document_id if chunk else chunk_id
+    return group_fn
 
+def _search_hits(library: Library, indexing_service: IndexingService, query_vector: List[float], k: Optional[int],
+                 distance_metric: str, exclude_chunk_id: str = None, budget: SearchBudget = None,
+                 max_distance: Optional[float] = None, group_limit: Optional[int] = None) -> List[Tuple[Chunk, float]]:
+    """(chunk, score) hits best-first; with group_limit, k counts documents and hits come grouped per document."""
+    grouped = group_limit is not None
+    # Fetch one extra hit when the source chunk itself has to be dropped from the results
+    limit = k + 1 if exclude_chunk_id and k is not None and not grouped else k
+    try:
+        results = indexing_service.search_chunks(
+            query_vector, k=limit, budget=budget, max_distance=max_distance,
+            group_fn=_document_of(library) if grouped else None, group_limit=group_limit or 1,
+            distance_fn=_distance_fn(distance_metric),
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    hits = [
+        (chunk, _to_score(distance, distance_metric))
+        for cid, distance in results
+        if cid != exclude_chunk_id and (chunk := library.chunk_map.get(cid)) is not None
+    ]
+    return hits if grouped else hits[:k]
+
+def _search(library: Library, indexing_service: IndexingService, query_vector: List[float], k: Optional[int],
+            distance_metric: str, exclude_chunk_id: str = None, budget: SearchBudget = None) -> List[QueryResult]:
+    # Built from stored chunks without validation; the endpoint's response_model validates them once
     return [
-        QueryResult(
-            chunk_id=cid,
-            score=score,
-            text=chunk.text,
-            metadata=chunk.metadata
+        QueryResult.model_construct(chunk_id=chunk.id, score=score, text=chunk.text, metadata=chunk.metadata)
+        for chunk, score in _search_hits(
+            library, indexing_service, query_vector, k, distance_metric, exclude_chunk_id=exclude_chunk_id, budget=budget
         )
-        for cid, score in results
-        if (chunk := library.chunk_map.get(cid)) is not None
-    ]
\ No newline at end of file
+    ]
+
+def _encode_groups(library: Library, hits: List[Tuple[Chunk, float]]) -> bytes:
+    """DocumentQueryResult list for grouped hits, which arrive best document first."""
+    groups: Dict[str, List[Tuple[Chunk, float]]] = {}
+    for chunk, score in hits:
+        groups.setdefault(chunk.document_id, []).append((chunk, score))
+    return encode_array(
+        b'{"document_id":' + dumps(document_id)
+        + b',"title":' + dumps(document.title if (document := library.documents.get(document_id)) else None)
+        + b',"score":' + dumps(chunks[0][1])
+        + b',"chunks":' + encode_array(encode_hit(chunk, score) for chunk, score in chunks) + b"}"
+        for document_id, chunks in groups.items()
+    )
+
+@router.post("/query", response_model=Union[List[QueryResult], List[DocumentQueryResult]])
+def search_library(req: QueryRequest):
+    """
+    Hits are encoded straight from the stored chunks (reusing their cached JSON fragments)
+    instead of going through response_model validation, and cached already encoded.
+    """
+    library, indexing_service = _get_library_and_index(req.library_id)
+
+    # Read the version before searching so results computed against older data are never served as current
+    version = db.get_library_version(req.library_id)
+    cache_key = query_cache.make_key(req.library_id, version, _query_fingerprint(req), req.k, req.distance_metric)
+    cached = query_cache.get(cache_key)
+    if cached is not None:
+        return FastJSONResponse(cached)
+
+    query_vector = _resolve_query_vector(req, library, indexing_service)
+
+    # The deadline covers the index search only; embedding time is not charged against it
+    budget = None
+    if req.deadline_ms is not None or req.max_candidates is not None:
+        budget = SearchBudget(deadline_ms=req.deadline_ms, max_candidates=req.max_candidates)
+    group_limit = req.chunks_per_group if req.group_by == "document" else None
+    hits = _search_hits(
+        library, indexing_service, query_vector, req.k, req.distance_metric,
+        exclude_chunk_id=req.chunk_id, budget=budget, max_distance=req.range_distance(), group_limit=group_limit
+    )
+    if group_limit is not None:
+        body = _encode_groups(library, hits)
+    else:
+        body = encode_array(encode_hit(chunk, score) for chunk, score in hits)
+
+    if budget and budget.exhausted:
+        # Approximate results depend on timing, so they are flagged and never cached
+        return FastJSONResponse(body, headers={"X-Search-Approximate": "true"})
+    query_cache.put(cache_key, body)
+    return FastJSONResponse(body)
+
+@router.post("/query/similar", response_model=Dict[str, List[QueryResult]])
+def search_similar_chunks(req: SimilarChunksRequest):
+    """Batch "more like this": neighbours of each given chunk, using stored vectors only."""
+    library, indexing_service = _get_library_and_index(req.library_id)
+
+    return {
+        chunk_id: _search(
+            library, indexing_service, _stored_embedding(library, chunk_id), req.k, req.distance_metric,
+            exclude_chunk_id=chunk_id
+        )
+        for chunk_id in dict.fromkeys(req.chunk_ids)
+    }
+
+def _matches_filter(library: Library, library_filter: Dict[str, Any]) -> bool:
+    fields = library.metadata.model_dump() if library.metadata else {}
+    fields["name"] = library.name
+    return all(fields.get(key) == value for key, value in library_filter.items())
+
+def _federated_targets(req: FederatedQueryRequest) -> List[str]:
+    if req.library_ids is not None:
+        return list(dict.fromkeys(req.library_ids))
+    return [lib.id for lib in db.list_libraries() if _matches_filter(lib, req.library_filter)]
+
+def _search_one_library(library_id: str, query_vector: List[float], req: FederatedQueryRequest):
+    library, indexing_service = _get_library_and_index(library_id)
+    # Searches stop at the library deadline with what they have instead of being abandoned
+    budget = SearchBudget(deadline_ms=req.timeout_ms, max_candidates=req.max_candidates)
+    results = [
+        FederatedQueryResult.model_construct(
+            library_id=library_id, chunk_id=chunk.id, score=score, text=chunk.text, metadata=chunk.metadata
+        )
+        for chunk, score in _search_hits(library, indexing_service, query_vector, req.k, req.distance_metric, budget=budget)
+    ]
+    return results, budget.exhausted
+
+@router.post("/query/federated", response_model=FederatedQueryResponse)
+def search_federated(req: FederatedQueryRequest):
+    """
+    Embed the query once, search every target library in parallel and merge the per-library
+    top-k lists into a global top-k. Libraries that miss the deadline are reported instead
+    of holding back the response.
+    """
+    library_ids = _federated_targets(req)
+    if req.query_vector is not None:
+        query_vector = req.query_vector
+    else:
+        try:
+            query_vector = get_embedding(req.query_text)
+        except RuntimeError as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
+    futures = {
+        federated_executor.submit(_search_one_library, library_id, query_vector, req): library_id
+        for library_id in library_ids
+    }
+    done, not_done = wait(futures, timeout=req.timeout_ms / 1000)
+
+    per_library: List[List[FederatedQueryResult]] = []
+    failed: Dict[str, str] = {}
+    approximate = False
+    for future in done:
+        try:
+            results, exhausted = future.result()
+        except HTTPException as e:
+            failed[futures[future]] = str(e.detail)
+            continue
+        per_library.append(results)
+        approximate = approximate or exhausted
+    for future in not_done:
+        future.cancel()
+    timed_out = [futures[future] for future in not_done]
+
+    # Each list is already sorted best-first, so a bounded k-way merge yields the global top-k
+    rank_key = (lambda r: -r.score) if req.distance_metric == "cosine" else (lambda r: r.score)
+    merged = list(islice(heapq.merge(*per_library, key=rank_key), req.k))
+    return FederatedQueryResponse(
+        results=merged,
+        searched_libraries=library_ids,
+        timed_out_libraries=timed_out,
+        failed_libraries=failed,
+        partial=bool(timed_out or failed),
+        approximate=approximate,
+    )
+
+@router.get("/query/cache/stats")
+def query_cache_stats():
+    return query_cache.stats()
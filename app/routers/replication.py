@@ -0,0 +1,79 @@
+import json
+from typing import Dict, Optional
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from app.core.changes import entity_state
+from app.core.db import DB_ROLE, db
+from app.core.replication import followers, replica
+from app.models.change_models import ChangeEvent, ReplicationBatch
+from app.models.library_models import Library
+
+router = APIRouter(prefix="/replication", tags=["replication"])
+
+MAX_LOG_BATCH = 5000
+MAX_LOG_WAIT_MS = 30000
+
+def _require_primary():
+    if DB_ROLE in ("follower", "reader"):
+        raise HTTPException(status_code=409, detail="Only the primary ships its change log")
+
+@router.get("/log", response_model=ReplicationBatch)
+def get_replication_log(
+    since: int = Query(ge=0),
+    limit: int = Query(default=500, ge=1, le=MAX_LOG_BATCH),
+    wait_ms: int = Query(default=0, ge=0, le=MAX_LOG_WAIT_MS),
+    replica_id: Optional[str] = None,
+):
+    """Changes of every library after `since`, each with the entity's full current state (embeddings included)."""
+    _require_primary()
+    if replica_id is not None:
+        followers.seen(replica_id, since)
+    try:
+        changes, next_since, has_more = db.changes.read(None, since, limit)
+        if not changes and wait_ms and db.changes.wait(None, since, wait_ms / 1000):
+            changes, next_since, has_more = db.changes.read(None, since, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=410, detail=str(e))
+
+    libraries: Dict[str, Optional[Library]] = {}
+    events = []
+    for change in changes:
+        if change.library_id not in libraries:
+            libraries[change.library_id] = db.get_library(change.library_id)
+        events.append(ChangeEvent(
+            **change.model_dump(), data=entity_state(libraries[change.library_id], change, include_embedding=True)
+        ))
+    return ReplicationBatch(changes=events, next_since=next_since, has_more=has_more, head=db.changes.last_seq)
+
+@router.get("/snapshot")
+def get_replication_snapshot():
+    """
+    Every library with its chunks as NDJSON, one library per line after a `{"seq": n}` header.
+    Changes after `seq` may already be included; replaying them is harmless because
+    followers apply current state idempotently.
+    """
+    _require_primary()
+    # Taken before any library is read, so nothing changed during the dump is skipped on replay
+    seq = db.changes.last_seq
+    library_ids = [library.id for library in db.list_libraries()]
+
+    def lines():
+        yield json.dumps({"seq": seq}) + "\n"
+        for library_id in library_ids:
+            snapshot = db.snapshot_library(library_id)
+            if snapshot is None:
+                continue  # deleted meanwhile; its delete event is in the log after seq
+            yield json.dumps({
+                "library": snapshot.header,
+                "index_type": snapshot.index_type.value,
+                "chunks": [chunk.model_dump() for chunk in snapshot.chunks],
+            }) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@router.get("/status")
+def get_replication_status():
+    if replica is not None:
+        return replica.status()
+    head = db.changes.last_seq
+    return {"role": "primary", "head_seq": head, "followers": followers.status(head)}
@@ -0,0 +1,19 @@
+from fastapi import APIRouter
+from app.core.db import db
+from app.core.scheduler import scheduler
+from app.utils.embeddings import get_embedding_dispatcher
+
+# Process-wide stats; per-feature ones stay with their feature (e.g. /query/cache/stats)
+router = APIRouter(prefix="/stats", tags=["stats"])
+
+@router.get("/memory")
+def memory_stats():
+    return db.memory_stats()
+
+@router.get("/scheduler")
+def scheduler_stats():
+    return scheduler.stats()
+
+@router.get("/embeddings")
+def embedding_stats():
+    return get_embedding_dispatcher().stats()
@@ -0,0 +1,79 @@
+"""
+Multi-process entry point: one writer process plus N reader workers.
+
+    python -m app.serve --workers 4 --port 8000
+
+The writer (DB_ROLE=writer) listens on 127.0.0.1:--writer-port, owns every mutation,
+persistence and ingestion job, and publishes library snapshots to SNAPSHOT_DIR.
+The readers (DB_ROLE=reader) share --port through uvicorn's worker pool, answer /query*
+from memory-mapped snapshots and forward every other request to the writer.
+With --workers 1 the plain single-process server is started instead.
+"""
+import os
+import sys
+import time
+import signal
+import argparse
+import subprocess
+from typing import List
+
+import httpx
+
+
+def _uvicorn(host: str, port: int, workers: int = 1) -> List[str]:
+    return [sys.executable, "-m", "uvicorn", "app.main:app", "--host", host, "--port", str(port), "--workers", str(workers)]
+
+
+def _wait_until_ready(url: str, process: subprocess.Popen, timeout: float):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Writer process exited with code {process.returncode}")
+        try:
+            httpx.get(f"{url}/openapi.json", timeout=1.0)
+            return
+        except httpx.TransportError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Writer process not ready after {timeout}s")
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1)),
+                        help="reader worker processes (default: WEB_CONCURRENCY or the CPU count)")
+    parser.add_argument("--writer-port", type=int, default=8001)
+    parser.add_argument("--startup-timeout", type=float, default=120.0)
+    args = parser.parse_args(argv)
+
+    if args.workers <= 1:
+        command = _uvicorn(args.host, args.port)
+        os.execve(command[0], command, {**os.environ, "DB_ROLE": "standalone"})
+
+    writer_url = f"http://127.0.0.1:{args.writer_port}"
+    # Turn SIGTERM into SystemExit so the finally block below stops the child processes
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    writer = subprocess.Popen(_uvicorn("127.0.0.1", args.writer_port), env={**os.environ, "DB_ROLE": "writer"})
+    processes = [writer]
+    try:
+        # Readers start once the writer has loaded the database and published its first snapshot
+        _wait_until_ready(writer_url, writer, args.startup_timeout)
+        readers = subprocess.Popen(
+            _uvicorn(args.host, args.port, args.workers),
+            env={**os.environ, "DB_ROLE": "reader", "WRITER_URL": writer_url},
+        )
+        processes.append(readers)
+        while all(p.poll() is None for p in processes):
+            time.sleep(0.5)
+        return next(p.returncode for p in processes if p.returncode is not None)
+    finally:
+        # Readers go first so no request is forwarded to a writer that is shutting down
+        for process in reversed(processes):
+            if process.poll() is None:
+                process.terminate()
+                process.wait()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,99 @@
+import re
+from enum import Enum
+from typing import Iterable, Iterator, List
+
+# Bounds the unfinished tail a chunker holds when the text never reaches a unit boundary
+MAX_CHARS_PER_TOKEN = 32
+
+
+class ChunkingStrategy(str, Enum):
+    TOKENS = "tokens"  # fixed windows of chunk_size tokens, consecutive windows sharing `overlap` tokens
+    SENTENCES = "sentences"  # whole sentences packed up to chunk_size tokens
+    PARAGRAPHS = "paragraphs"  # whole paragraphs packed up to chunk_size tokens
+
+
+_BOUNDARIES = {
+    ChunkingStrategy.TOKENS: re.compile(r"\s+"),
+    ChunkingStrategy.SENTENCES: re.compile(r"(?<=[.!?])\s+"),
+    ChunkingStrategy.PARAGRAPHS: re.compile(r"\n\s*\n"),
+}
+_LAST_WORD = re.compile(r"\s+(\S*)$")
+
+
+class TextChunker:
+    """
+    Incremental chunker: `feed` takes the text as it arrives and returns the chunks it
+    completes, `finish` flushes the rest. Tokens are whitespace-separated words and chunk
+    text is rejoined with single spaces. Only the unfinished unit and the current chunk are
+    buffered, so memory does not grow with the size of the document. A unit longer than
+    chunk_size tokens is split into fixed windows; each new window after a split, or after
+    a full chunk, starts with the last `overlap` tokens of the previous one.
+    """
+    def __init__(self, strategy: ChunkingStrategy = ChunkingStrategy.TOKENS, chunk_size: int = 200, overlap: int = 0):
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be positive")
+        if not 0 <= overlap < chunk_size:
+            raise ValueError("overlap must be smaller than chunk_size")
+        self.strategy = strategy
+        self.chunk_size = chunk_size
+        self.overlap = overlap
+        self._boundary = _BOUNDARIES[strategy]
+        self._tail = ""
+        self._words: List[str] = []
+        self._carried = 0  # leading words of _words repeated from the previous chunk
+        self._unit_started = False  # _tail continues a unit whose beginning was already added
+
+    def feed(self, text: str) -> List[str]:
+        self._tail += text
+        last_boundary = None
+        for last_boundary in self._boundary.finditer(self._tail):
+            pass
+        chunks: List[str] = []
+        if last_boundary is not None:
+            for unit in self._boundary.split(self._tail[:last_boundary.start()]):
+                chunks.extend(self._add(unit.split(), whole_unit=not self._unit_started))
+                self._unit_started = False
+            self._tail = self._tail[last_boundary.end():]
+        elif len(self._tail) > self.chunk_size * MAX_CHARS_PER_TOKEN:
+            # No boundary in sight: take the words before the last, possibly partial, one
+            last_word = _LAST_WORD.search(self._tail)
+            if last_word is not None:
+                chunks.extend(self._add(self._tail[:last_word.start()].split(), whole_unit=not self._unit_started))
+                self._tail = last_word.group(1)
+                self._unit_started = True
+        return chunks
+
+    def finish(self) -> List[str]:
+        chunks = self._add(self._tail.split(), whole_unit=not self._unit_started)
+        self._tail, self._unit_started = "", False
+        if len(self._words) > self._carried:
+            chunks.append(" ".join(self._words))
+        self._words, self._carried = [], 0
+        return chunks
+
+    def _add(self, words: List[str], whole_unit: bool = True) -> List[str]:
+        chunks = []
+        if (whole_unit and self.strategy != ChunkingStrategy.TOKENS and len(self._words) > self._carried
+                and len(self._words) + len(words) > self.chunk_size):
+            # Keep the unit whole: close the current chunk before it
+            chunks.append(self._emit(len(self._words)))
+        self._words.extend(words)
+        while len(self._words) > self.chunk_size:
+            chunks.append(self._emit(self.chunk_size))
+        return chunks
+
+    def _emit(self, size: int) -> str:
+        text = " ".join(self._words[:size])
+        keep = min(self.overlap, size)
+        self._words = self._words[size - keep:]
+        self._carried = keep
+        return text
+
+
+def chunk_text(pieces: Iterable[str], strategy: ChunkingStrategy = ChunkingStrategy.TOKENS,
+               chunk_size: int = 200, overlap: int = 0) -> Iterator[str]:
+    """Chunks of text arriving in pieces, yielded as soon as each is complete."""
+    chunker = TextChunker(strategy, chunk_size, overlap)
+    for piece in pieces:
+        yield from chunker.feed(piece)
+    yield from chunker.finish()
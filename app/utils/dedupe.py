@@ -0,0 +1,127 @@
+import hashlib
+import re
+import zlib
+from enum import Enum
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_WHITESPACE = re.compile(r"\s+")
+
+
+class DedupePolicy(str, Enum):
+    SKIP = "skip"  # drop the duplicate; the stored chunk is returned instead
+    LINK = "link"  # store the duplicate, sharing the stored chunk's embedding and vector slot
+    KEEP = "keep"  # store and index the duplicate separately
+
+    def reuses_embedding(self, exact: bool) -> bool:
+        # A near duplicate kept as its own vector deserves its own embedding
+        return self != DedupePolicy.KEEP or exact
+
+
+def normalize_text(text: str) -> str:
+    return _WHITESPACE.sub(" ", text).strip().lower()
+
+
+def text_fingerprint(text: str) -> str:
+    return hashlib.sha1(normalize_text(text).encode()).hexdigest()
+
+
+class MinHasher:
+    """MinHash signatures over word 3-gram shingles; equal slots estimate Jaccard similarity."""
+    def __init__(self, num_perm: int = 64, shingle_size: int = 3, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        self.shingle_size = shingle_size
+        self.a = rng.integers(1, 1 << 31, num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, 1 << 31, num_perm, dtype=np.uint64)
+
+    def shingles(self, text: str) -> Set[str]:
+        words = normalize_text(text).split(" ")
+        if len(words) <= self.shingle_size:
+            return {" ".join(words)}
+        return {" ".join(words[i:i + self.shingle_size]) for i in range(len(words) - self.shingle_size + 1)}
+
+    def signature(self, text: str) -> np.ndarray:
+        hashes = np.fromiter((zlib.crc32(s.encode()) for s in self.shingles(text)), dtype=np.uint64)
+        # (a * x + b) mod p stays below 2**64: a, b < 2**31 and x < 2**32
+        permuted = (np.outer(hashes, self.a) + self.b) % _MERSENNE_PRIME
+        return permuted.min(axis=0)
+
+    @staticmethod
+    def similarity(a: np.ndarray, b: np.ndarray) -> float:
+        return float(np.mean(a == b))
+
+
+class DuplicateIndex:
+    """
+    Per-library lookup of chunks by exact (normalized) text and by MinHash near-duplicate
+    similarity. Signatures are banded into LSH buckets so lookups only compare against
+    chunks sharing a band; candidates are accepted at `threshold` estimated Jaccard.
+    Also tracks which stored chunks are linked to each canonical one.
+    """
+    def __init__(self, threshold: Optional[float] = 0.8, num_perm: int = 64, bands: int = 16):
+        self.threshold = threshold
+        self.hasher = MinHasher(num_perm)
+        self.rows_per_band = num_perm // bands
+        self.exact: Dict[str, str] = {}  # fingerprint -> chunk_id
+        self.fingerprints: Dict[str, str] = {}  # chunk_id -> fingerprint
+        self.signatures: Dict[str, np.ndarray] = {}
+        self.buckets: List[Dict[bytes, Set[str]]] = [{} for _ in range(bands)]
+        self.links: Dict[str, Set[str]] = {}  # canonical chunk_id -> linked duplicate ids
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        r = self.rows_per_band
+        return [signature[i * r:(i + 1) * r].tobytes() for i in range(len(self.buckets))]
+
+    def add(self, chunk_id: str, text: str):
+        fingerprint = text_fingerprint(text)
+        self.fingerprints[chunk_id] = fingerprint
+        self.exact.setdefault(fingerprint, chunk_id)
+        if self.threshold is None:
+            return
+        signature = self.hasher.signature(text)
+        self.signatures[chunk_id] = signature
+        for band, key in zip(self.buckets, self._band_keys(signature)):
+            band.setdefault(key, set()).add(chunk_id)
+
+    def remove(self, chunk_id: str) -> Set[str]:
+        """Forget a canonical chunk; returns the ids that were linked to it."""
+        fingerprint = self.fingerprints.pop(chunk_id, None)
+        if fingerprint is not None and self.exact.get(fingerprint) == chunk_id:
+            del self.exact[fingerprint]
+        signature = self.signatures.pop(chunk_id, None)
+        if signature is not None:
+            for band, key in zip(self.buckets, self._band_keys(signature)):
+                members = band.get(key)
+                if members is not None:
+                    members.discard(chunk_id)
+                    if not members:
+                        del band[key]
+        return self.links.pop(chunk_id, set())
+
+    def link(self, duplicate_id: str, canonical_id: str):
+        self.links.setdefault(canonical_id, set()).add(duplicate_id)
+
+    def unlink(self, duplicate_id: str, canonical_id: str):
+        linked = self.links.get(canonical_id)
+        if linked is not None:
+            linked.discard(duplicate_id)
+
+    def find(self, text: str) -> Optional[Tuple[str, bool]]:
+        """(chunk_id, exact) of a stored chunk duplicating `text`, or None."""
+        chunk_id = self.exact.get(text_fingerprint(text))
+        if chunk_id is not None:
+            return chunk_id, True
+        if self.threshold is None:
+            return None
+        signature = self.hasher.signature(text)
+        candidates: Set[str] = set()
+        for band, key in zip(self.buckets, self._band_keys(signature)):
+            candidates |= band.get(key, set())
+        best, best_similarity = None, self.threshold
+        for candidate in candidates:
+            similarity = MinHasher.similarity(signature, self.signatures[candidate])
+            if similarity >= best_similarity:
+                best, best_similarity = candidate, similarity
+        return (best, False) if best is not None else None
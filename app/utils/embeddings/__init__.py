@@ -0,0 +1,77 @@
+import os
+from threading import Lock
+from typing import List, Optional
+from dotenv import load_dotenv
+from .base import EmbeddingProvider
+from .batching import DynamicBatcher
+from .provider_type import ProviderType
+from .factory import create_provider_by_type
+
+load_dotenv()
+
+EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", ProviderType.COHERE.value)
+# Embeddings from concurrent requests are sent to the provider in shared batches
+EMBEDDING_BATCH_MAX_SIZE = int(os.getenv("EMBEDDING_BATCH_MAX_SIZE", "32"))
+EMBEDDING_BATCH_MAX_WAIT_MS = float(os.getenv("EMBEDDING_BATCH_MAX_WAIT_MS", "5"))
+# Batches sent to the provider at once; kept above the 40 threads sync endpoints run on, so batching never lowers parallelism
+EMBEDDING_BATCH_MAX_IN_FLIGHT = int(os.getenv("EMBEDDING_BATCH_MAX_IN_FLIGHT", "64"))
+
+_provider: Optional[EmbeddingProvider] = None
+_provider_lock = Lock()
+_dispatcher: Optional[DynamicBatcher] = None
+
+def get_embedding_provider() -> EmbeddingProvider:
+    # Created on first use so importing the app never loads a model or requires credentials
+    global _provider
+    if _provider is None:
+        with _provider_lock:
+            if _provider is None:
+                _provider = create_provider_by_type(ProviderType(EMBEDDING_PROVIDER))
+    return _provider
+
+def set_embedding_provider(provider: Optional[EmbeddingProvider]):
+    global _provider
+    with _provider_lock:
+        _provider = provider
+
+def _embed(provider: EmbeddingProvider, texts: List[str]) -> List[List[float]]:
+    vectors = provider.embed(texts)
+    for vector in vectors:
+        if len(vector) != provider.dimension:
+            raise RuntimeError(
+                f"Embedding provider '{provider.name}' returned a {len(vector)}-dimensional vector, "
+                f"expected {provider.dimension}"
+            )
+    return vectors
+
+def _embed_batch(texts: List[str]) -> List[List[float]]:
+    # Resolved per batch, so a provider swapped in with set_embedding_provider takes effect right away
+    return _embed(get_embedding_provider(), texts)
+
+def get_embedding_dispatcher() -> DynamicBatcher:
+    global _dispatcher
+    if _dispatcher is None:
+        with _provider_lock:
+            if _dispatcher is None:
+                _dispatcher = DynamicBatcher(
+                    _embed_batch, max_batch_size=EMBEDDING_BATCH_MAX_SIZE, max_wait_ms=EMBEDDING_BATCH_MAX_WAIT_MS,
+                    name="embedding-dispatcher", max_in_flight=EMBEDDING_BATCH_MAX_IN_FLIGHT,
+                )
+    return _dispatcher
+
+def get_embeddings(texts: List[str]) -> List[List[float]]:
+    # Same path as single texts, so bulk calls share provider calls with in-flight requests too
+    return get_embedding_dispatcher().submit(texts)
+
+def get_embedding(text: str) -> List[float]:
+    return get_embedding_dispatcher().submit([text])[0]
+
+__all__ = [
+    "EmbeddingProvider",
+    "ProviderType",
+    "get_embedding_provider",
+    "set_embedding_provider",
+    "get_embedding_dispatcher",
+    "get_embeddings",
+    "get_embedding",
+]
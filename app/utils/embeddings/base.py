@@ -0,0 +1,17 @@
+from abc import ABC, abstractmethod
+from typing import List
+
+class EmbeddingProvider(ABC):
+    name: str = "base"
+
+    @property
+    @abstractmethod
+    def dimension(self) -> int:
+        pass
+
+    @abstractmethod
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        pass
+
+    def embed_one(self, text: str) -> List[float]:
+        return self.embed([text])[0]
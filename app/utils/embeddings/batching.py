@@ -0,0 +1,165 @@
+import itertools
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+EncodeFn = Callable[[List[str]], List[List[float]]]
+
+# Weight of the newest gap in the moving average of time between requests
+_ARRIVAL_SMOOTHING = 0.2
+
+
+class _Flight:
+    """One distinct text being embedded; every request for it while it is in flight shares the result."""
+    def __init__(self, text: str):
+        self.text = text
+        self.enqueued_at = time.monotonic()
+        self.done = threading.Event()
+        self.result: Optional[List[float]] = None
+        self.error: Optional[BaseException] = None
+
+
+class DynamicBatcher:
+    """
+    Collects concurrent embed requests on a background thread and runs them through `encode_fn`
+    as one batch. A batch is flushed once it holds `max_batch_size` distinct texts or
+    `max_wait_ms` after its first text arrived, whichever comes first.
+
+    Up to `max_in_flight` batches are encoded at once, each on its own thread, and the next
+    batch is collected while they run. Below that cap a request never queues behind another
+    request's encode call, so batching does not lower throughput compared with one call per
+    request. Texts queued while the cap is reached join the next batch.
+
+    The wait adapts to load: when requests arrive further apart than `max_wait_ms`, nothing is
+    likely to join the batch and it is flushed with whatever is already queued. Identical
+    texts requested while one is queued or being encoded are encoded once (singleflight).
+    """
+    def __init__(self, encode_fn: EncodeFn, max_batch_size: int = 32, max_wait_ms: float = 2.0,
+                 name: str = "embedding-batcher", max_in_flight: int = 1):
+        self.encode_fn = encode_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_in_flight = max_in_flight
+        self.name = name
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._queue: "queue.Queue[_Flight]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._in_flight: Dict[str, _Flight] = {}
+        self._last_arrival: Optional[float] = None
+        self._interarrival: Optional[float] = None
+        self._requested = 0
+        self._deduplicated = 0
+        self._batches = 0
+        self._batched = 0
+        self._largest_batch = 0
+        self._waited = 0.0
+        self._running = 0
+        self._collector = threading.Thread(target=self._run, name=name, daemon=True)
+        self._collector.start()
+
+    def submit(self, texts: List[str]) -> List[List[float]]:
+        flights = []
+        with self._lock:
+            self._note_arrival(time.monotonic())
+            self._requested += len(texts)
+            for text in texts:
+                flight = self._in_flight.get(text)
+                if flight is None:
+                    flight = self._in_flight[text] = _Flight(text)
+                    self._queue.put(flight)
+                else:
+                    self._deduplicated += 1
+                flights.append(flight)
+        for flight in flights:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+        return [flight.result for flight in flights]
+
+    def _note_arrival(self, now: float):
+        if self._last_arrival is not None:
+            gap = now - self._last_arrival
+            if self._interarrival is None:
+                self._interarrival = gap
+            else:
+                self._interarrival += _ARRIVAL_SMOOTHING * (gap - self._interarrival)
+        self._last_arrival = now
+
+    def window(self) -> float:
+        """Seconds a batch waits for more texts after its first one arrived."""
+        # Waiting only pays off when another request is expected within the window
+        if self._interarrival is None or self._interarrival >= self.max_wait:
+            return 0.0
+        return self.max_wait
+
+    def _collect(self) -> List[_Flight]:
+        batch = [self._queue.get()]
+        # Measured from arrival: a text that already queued behind a busy worker waits no longer
+        deadline = batch[0].enqueued_at + self.window()
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                flight = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            batch.append(flight)
+        return batch
+
+    def _run(self):
+        for number in itertools.count():
+            # Collected only once it can start, so texts arriving while every slot is busy join it
+            self._slots.acquire()
+            batch = self._collect()
+            started = time.monotonic()
+            with self._lock:
+                self._batches += 1
+                self._batched += len(batch)
+                self._largest_batch = max(self._largest_batch, len(batch))
+                self._waited += sum(started - flight.enqueued_at for flight in batch)
+                self._running += 1
+            if self.max_in_flight == 1:
+                self._encode(batch)
+            else:
+                threading.Thread(target=self._encode, args=(batch,), name=f"{self.name}-{number}", daemon=True).start()
+
+    def _encode(self, batch: List[_Flight]):
+        try:
+            vectors = self.encode_fn([flight.text for flight in batch])
+            if len(vectors) != len(batch):
+                raise RuntimeError(f"Expected {len(batch)} embeddings, got {len(vectors)}")
+        except BaseException as e:
+            self._finish(batch, error=e)
+        else:
+            self._finish(batch, vectors)
+        finally:
+            with self._lock:
+                self._running -= 1
+            self._slots.release()
+
+    def _finish(self, batch: List[_Flight], vectors: Optional[List[List[float]]] = None,
+                error: Optional[BaseException] = None):
+        with self._lock:
+            # Later requests for these texts start a new flight
+            for flight in batch:
+                if self._in_flight.get(flight.text) is flight:
+                    del self._in_flight[flight.text]
+        for i, flight in enumerate(batch):
+            flight.error = error
+            flight.result = vectors[i] if vectors is not None else None
+            flight.done.set()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "requested_texts": self._requested,
+                "deduplicated_texts": self._deduplicated,
+                "batches": self._batches,
+                "avg_batch_size": self._batched / self._batches if self._batches else 0.0,
+                "max_batch_size": self._largest_batch,
+                "avg_wait_ms": self._waited / self._batched * 1000 if self._batched else 0.0,
+                "window_ms": self.window() * 1000,
+                "queued": self._queue.qsize(),
+                "in_flight": len(self._in_flight),
+                "running_batches": self._running,
+            }
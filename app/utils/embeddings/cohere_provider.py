@@ -0,0 +1,61 @@
+import os
+import requests
+from typing import List
+from .base import EmbeddingProvider
+
+COHERE_EMBEDDING_URL = "https://api.cohere.ai/v1/embed"
+COHERE_MAX_TEXTS_PER_CALL = 96
+
+# Output dimensionality of the Cohere v3 embedding models
+COHERE_MODEL_DIMENSIONS = {
+    "embed-english-v3.0": 1024,
+    "embed-multilingual-v3.0": 1024,
+    "embed-english-light-v3.0": 384,
+    "embed-multilingual-light-v3.0": 384,
+}
+
+class CohereEmbeddingProvider(EmbeddingProvider):
+    name = "cohere"
+
+    def __init__(self, api_key: str = None, model: str = "embed-english-v3.0", input_type: str = "search_document"):
+        self.api_key = api_key if api_key is not None else os.getenv("COHERE_API_KEY")
+        self.model = model
+        self.input_type = input_type
+
+    @property
+    def dimension(self) -> int:
+        return COHERE_MODEL_DIMENSIONS.get(self.model, 1024)
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        if not self.api_key:
+            raise ValueError("Cohere API key is not set. Please set COHERE_API_KEY in your environment.")
+
+        embeddings: List[List[float]] = []
+        for start in range(0, len(texts), COHERE_MAX_TEXTS_PER_CALL):
+            embeddings.extend(self._embed_batch(texts[start:start + COHERE_MAX_TEXTS_PER_CALL]))
+        return embeddings
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+        payload = {
+            "model": self.model,
+            "texts": texts,
+            "input_type": self.input_type
+        }
+
+        try:
+            response = requests.post(COHERE_EMBEDDING_URL, headers=headers, json=payload)
+            response.raise_for_status()
+
+            embeddings = response.json()["embeddings"]
+            if len(embeddings) != len(texts):
+                raise IndexError(f"expected {len(texts)} embeddings, got {len(embeddings)}")
+            return embeddings
+
+        except requests.RequestException as e:
+            raise RuntimeError(f"Failed to get embedding: {e}")
+        except (IndexError, KeyError) as e:
+            raise RuntimeError(f"Unexpected response structure: {e}")
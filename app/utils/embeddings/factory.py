@@ -0,0 +1,14 @@
+# app/utils/embeddings/factory.py
+import os
+from app.utils.embeddings.base import EmbeddingProvider
+from app.utils.embeddings.provider_type import ProviderType
+from app.utils.embeddings.cohere_provider import CohereEmbeddingProvider
+from app.utils.embeddings.local_provider import LocalEmbeddingProvider
+
+def create_provider_by_type(provider_type: ProviderType) -> EmbeddingProvider:
+    if provider_type == ProviderType.COHERE:
+        return CohereEmbeddingProvider(model=os.getenv("COHERE_EMBEDDING_MODEL", "embed-english-v3.0"))
+    elif provider_type == ProviderType.LOCAL:
+        return LocalEmbeddingProvider(model_path=os.getenv("LOCAL_EMBEDDING_MODEL_PATH"))
+    else:
+        raise ValueError(f"Unsupported embedding provider: {provider_type}")
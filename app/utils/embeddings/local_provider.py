@@ -0,0 +1,37 @@
+import os
+from typing import List
+from .base import EmbeddingProvider
+
+class LocalEmbeddingProvider(EmbeddingProvider):
+    """
+    In-process CPU embedding model loaded from disk (any sentence-transformers
+    compatible model directory, including ONNX exports).
+    Every call is one forward pass; concurrent requests are merged into shared calls by the
+    embedding dispatcher in front of the provider.
+    """
+    name = "local"
+
+    def __init__(self, model_path: str = None, normalize: bool = True):
+        self.model_path = model_path or os.getenv("LOCAL_EMBEDDING_MODEL_PATH")
+        if not self.model_path:
+            raise ValueError("Local embedding model path is not set. Please set LOCAL_EMBEDDING_MODEL_PATH in your environment.")
+        self.normalize = normalize
+        self._model = self._load_model(self.model_path)
+        self._dimension = self._model.get_sentence_embedding_dimension()
+
+    @staticmethod
+    def _load_model(model_path: str):
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise RuntimeError("The local embedding provider requires the `sentence-transformers` package.") from e
+        backend = "onnx" if model_path.endswith(".onnx") or os.path.exists(os.path.join(model_path, "onnx")) else "torch"
+        return SentenceTransformer(model_path, device="cpu", backend=backend)
+
+    @property
+    def dimension(self) -> int:
+        return self._dimension
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        vectors = self._model.encode(texts, batch_size=len(texts), normalize_embeddings=self.normalize, convert_to_numpy=True)
+        return vectors.tolist()
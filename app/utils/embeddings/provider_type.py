@@ -0,0 +1,5 @@
+from enum import Enum
+
+class ProviderType(str, Enum):
+    COHERE = "cohere"
+    LOCAL = "local"
@@ -1,6 +1,7 @@
 from abc import ABC, abstractmethod
-from typing import List, Tuple, Dict
+from typing import Any, Callable, List, Tuple, Dict, Optional
 from app.models.chunk_models import Chunk
+from .search import Collector, DistanceFn, SearchBudget, make_collector
 
 class Indexer(ABC):
     @abstractmethod
@@ -15,6 +16,31 @@ class Indexer(ABC):
     def rebuild(self, chunk_map: Dict[str, Chunk]):
         pass
 
+    def export_layout(self) -> Optional[Dict[str, Any]]:
+        """JSON-serializable structure derived from the vectors that is worth saving with them; None when rebuilding is as cheap."""
+        return None
+
+    def load_layout(self, layout: Dict[str, Any], chunk_map: Dict[str, Chunk]) -> bool:
+        """Restore from an export_layout() result instead of rebuilding; False when it does not match chunk_map."""
+        return False
+
+    def quantized_bytes(self) -> int:
+        """Bytes held by quantized copies of the vectors; 0 for indexes that keep none."""
+        return 0
+
     @abstractmethod
-    def search(self, query: List[float], k: int) -> List[Tuple[str, float]]:
+    def collect(self, query: List[float], collector: Collector, budget: Optional[SearchBudget] = None,
+                distance_fn: Optional[DistanceFn] = None):
+        """
+        Feed candidates to the collector, using collector.bound() to prune and stopping when the budget runs out.
+        `distance_fn` ranks this query only and defaults to the index's own metric, so concurrent queries with
+        different metrics never change the shared index.
+        """
         pass
+
+    def search(self, query: List[float], k: Optional[int], budget: Optional[SearchBudget] = None,
+               max_distance: Optional[float] = None, group_fn: Optional[Callable[[str], str]] = None,
+               group_limit: int = 1, distance_fn: Optional[DistanceFn] = None) -> List[Tuple[str, float]]:
+        collector = make_collector(k, max_distance=max_distance, group_fn=group_fn, group_limit=group_limit)
+        self.collect(query, collector, budget, distance_fn)
+        return collector.results()
@@ -1,15 +1,49 @@
 import math
-from typing import List, Tuple, Callable, Dict
+from typing import Any, Iterable, List, Tuple, Callable, Dict, Optional
 
 from app.models import Chunk
 from app.utils.similarity import euclidean_distance
+from app.utils.indexing.base import Indexer
+from app.utils.indexing.quantization import Quantization, QuantizedVectors
+from app.utils.indexing.reduction import ReducedVectors, VectorReducer
+from app.utils.indexing.search import Collector, DistanceFn, SearchBudget, VectorLookup, rerank, scan_vectors
 
-class ClusteredIndex:
-    def __init__(self, num_clusters: int = 8, distance_fn: Callable[[List[float], List[float]], float] = euclidean_distance):
+class ClusteredIndex(Indexer):
+    def __init__(self, num_clusters: int = 8, distance_fn: Callable[[List[float], List[float]], float] = euclidean_distance,
+                 probe_clusters: int = 2, reducer: Optional[VectorReducer] = None, candidate_multiplier: int = 4,
+                 quantization: Optional[Quantization] = None, vector_lookup: Optional[VectorLookup] = None):
         self.num_clusters = num_clusters
+        self.probe_clusters = probe_clusters
         self.distance_fn = distance_fn
         self.centroids: List[List[float]] = []
-        self.clusters: List[Dict[str, List[float]]] = []
+        # Member ids per cluster, with their vectors unless a quantized index reads them through `vector_lookup`
+        self.clusters: List[Dict[str, Optional[List[float]]]] = []
+        self.radii: List[float] = []  # euclidean upper bound on member-to-centroid distance
+        # Cluster assignment stays in full space; only the member scans use reduced vectors
+        self.reduced = ReducedVectors(reducer, self._items, candidate_multiplier) if reducer else None
+        # Quantized copy of each cluster's members, sharing one codec; centroids stay full precision
+        self.quantization = quantization
+        self.quantized: List[QuantizedVectors] = []
+        self.vector_lookup = vector_lookup if quantization else None
+
+    def _member_vector(self, idx: int, chunk_id: str) -> Optional[List[float]]:
+        return self.clusters[idx][chunk_id] if self.vector_lookup is None else self.vector_lookup(chunk_id)
+
+    def _members(self, idx: int) -> Iterable[Tuple[str, List[float]]]:
+        if self.vector_lookup is None:
+            return self.clusters[idx].items()
+        return ((cid, vector) for cid in list(self.clusters[idx]) if (vector := self.vector_lookup(cid)) is not None)
+
+    def _items(self) -> Iterable[Tuple[str, List[float]]]:
+        return (item for idx in range(len(self.clusters)) for item in self._members(idx))
+
+    def _full_vector(self, chunk_id: str) -> Optional[List[float]]:
+        if self.vector_lookup is not None:
+            return self.vector_lookup(chunk_id)
+        for cluster in self.clusters:
+            if chunk_id in cluster:
+                return cluster[chunk_id]
+        return None
 
     def _closest_centroid_idx(self, vector: List[float]) -> int:
         if not self.centroids:
@@ -20,47 +54,133 @@ class ClusteredIndex:
     def _init_cluster(self, vector: List[float]):
         self.centroids.append(vector)
         self.clusters.append({})
+        self.radii.append(0.0)
+        if self.quantization:
+            self.quantized.append(self.quantization.store())
 
-    def add_vector(self, vector: List[float], chunk_id: str):
+    def _assign(self, vector: List[float], chunk_id: str) -> int:
+        kept = vector if self.vector_lookup is None else None
         if len(self.centroids) < self.num_clusters:
             self._init_cluster(vector)
-            self.clusters[-1][chunk_id] = vector
-            return
+            self.clusters[-1][chunk_id] = kept
+            return len(self.clusters) - 1
 
         idx = self._closest_centroid_idx(vector)
-        self.clusters[idx][chunk_id] = vector
+        self.clusters[idx][chunk_id] = kept
+        # Radii only grow (removals keep them as upper bounds), which keeps pruning safe
+        self.radii[idx] = max(self.radii[idx], euclidean_distance(vector, self.centroids[idx]))
+        return idx
+
+    def add_vector(self, vector: List[float], chunk_id: str):
+        idx = self._assign(vector, chunk_id)
+        size = sum(len(cluster) for cluster in self.clusters)
+        if self.reduced:
+            self.reduced.add(chunk_id, vector, size)
+        if self.quantization:
+            if self.quantization.needs_fit(size):
+                self._requantize({chunk_id: vector})
+            else:
+                self.quantized[idx].add(chunk_id, vector)
 
     def remove_vector(self, chunk_id: str):
-        for cluster in self.clusters:
+        if self.reduced:
+            self.reduced.remove(chunk_id)
+        for idx, cluster in enumerate(self.clusters):
             if chunk_id in cluster:
                 del cluster[chunk_id]
+                if self.quantization:
+                    self.quantized[idx].remove(chunk_id)
                 return
 
+    def _requantize(self, vectors: Optional[Dict[str, List[float]]] = None):
+        """Refit the codec and re-encode every cluster; `vectors` are used for the members they cover."""
+        vectors = vectors or {}
+        members = [
+            [(cid, vector) for cid in list(cluster)
+             if (vector := vectors[cid] if cid in vectors else self._member_vector(idx, cid)) is not None]
+            for idx, cluster in enumerate(self.clusters)
+        ]
+        self.quantization.fit(vector for items in members for _, vector in items)
+        self.quantized = [self.quantization.store(items) for items in members]
+
+    def quantized_bytes(self) -> int:
+        return sum(store.nbytes for store in self.quantized)
+
     def rebuild(self, chunk_map: Dict[str, Chunk]):
         self.centroids.clear()
         self.clusters.clear()
+        self.radii.clear()
+        self.quantized.clear()
         for chunk_id, chunk in chunk_map.items():
-            self.add_vector(chunk.embedding, chunk_id)
+            self._assign(chunk.embedding, chunk_id)
+        if self.reduced:
+            self.reduced.refit()
+        if self.quantization:
+            self._requantize({chunk_id: chunk.embedding for chunk_id, chunk in chunk_map.items()})
+
+    def export_layout(self) -> Dict[str, Any]:
+        return {
+            "centroids": [list(centroid) for centroid in self.centroids],
+            "radii": list(self.radii),
+            "clusters": [list(cluster) for cluster in self.clusters],
+        }
+
+    def load_layout(self, layout: Dict[str, Any], chunk_map: Dict[str, Chunk]) -> bool:
+        # Skips re-assigning every vector to its closest centroid
+        members = layout["clusters"]
+        if sum(len(ids) for ids in members) != len(chunk_map) or not all(cid in chunk_map for ids in members for cid in ids):
+            return False
+        self.centroids = [list(centroid) for centroid in layout["centroids"]]
+        self.radii = list(layout["radii"])
+        self.clusters = [
+            {cid: chunk_map[cid].embedding if self.vector_lookup is None else None for cid in ids} for ids in members
+        ]
+        if self.reduced:
+            self.reduced.refit()
+        if self.quantization:
+            self._requantize({chunk_id: chunk.embedding for chunk_id, chunk in chunk_map.items()})
+        return True
 
-    def search(self, query: List[float], k: int, probe_clusters: int = 2) -> List[Tuple[str, float]]:
-        cluster_dists = [(i, self.distance_fn(query, c)) for i, c in enumerate(self.centroids)]
+    def _reduced_members(self, idx: int) -> Iterable[Tuple[str, List[float]]]:
+        reduced = self.reduced.vectors
+        return ((cid, reduced[cid]) for cid in self.clusters[idx] if cid in reduced)
+
+    def collect(self, query: List[float], collector: Collector, budget: Optional[SearchBudget] = None,
+                distance_fn: Optional[DistanceFn] = None):
+        distance_fn = distance_fn or self.distance_fn
+        cluster_dists = [(i, distance_fn(query, c)) for i, c in enumerate(self.centroids)]
         cluster_dists.sort(key=lambda x: x[1])
-        top_clusters = [i for i, _ in cluster_dists[:probe_clusters]]
-
-        candidates = []
-        for idx in top_clusters:
-            for cid, vec in self.clusters[idx].items():
-                dist = self.distance_fn(query, vec)
-                candidates.append((cid, dist))
-
-        if len(candidates) < k:
-            # fallback: brute force across all clusters
-            for idx in range(len(self.clusters)):
-                if idx in top_clusters:
-                    continue
-                for cid, vec in self.clusters[idx].items():
-                    dist = self.distance_fn(query, vec)
-                    candidates.append((cid, dist))
-
-        candidates.sort(key=lambda x: x[1])
-        return candidates[:k]
+        # Range queries consider every cluster; top-k queries probe a few unless they come up short
+        exhaustive = collector.max_distance != math.inf
+
+        # Radii are full-space bounds and say nothing about reduced or quantized distances,
+        # so a first stage over either does not prune
+        candidates = self.quantization.shortlist(collector) if self.quantization else None
+        if candidates is not None:
+            self._probe(cluster_dists, lambda idx: self.quantized[idx].scan(query, candidates, distance_fn, budget),
+                        candidates, exhaustive, metric_pruning=False)
+            if candidates is not collector:
+                rerank(query, candidates, self._full_vector, collector, distance_fn)
+            return
+        candidates = self.reduced.shortlist(collector, distance_fn) if self.reduced else None
+        if candidates is None:
+            scan = lambda idx: scan_vectors(query, self._members(idx), collector, distance_fn, budget)
+            self._probe(cluster_dists, scan, collector, exhaustive, metric_pruning=distance_fn is euclidean_distance)
+            return
+        reduced_query = self.reduced.reducer.transform(query)
+        scan = lambda idx: scan_vectors(reduced_query, self._reduced_members(idx), candidates, distance_fn, budget)
+        self._probe(cluster_dists, scan, candidates, exhaustive, metric_pruning=False)
+        self.reduced.rerank(query, candidates, self._full_vector, collector, distance_fn)
+
+    def _probe(self, cluster_dists: List[Tuple[int, float]], scan: Callable[[int], bool], collector: Collector,
+               exhaustive: bool, metric_pruning: bool):
+        """Scan clusters nearest first with `scan(idx)`, which returns False once the budget ran out."""
+        for rank, (idx, dist) in enumerate(cluster_dists):
+            if rank >= self.probe_clusters and not exhaustive and collector.full():
+                # Enough hits (or, when grouping, enough distinct groups) were found
+                break
+            # Triangle inequality: no member of a cluster is closer than d(query, centroid) - radius
+            if metric_pruning and dist - self.radii[idx] > collector.bound():
+                continue
+            if not scan(idx):
+                break
@@ -2,15 +2,30 @@
 from app.utils.indexing.linear_index import LinearIndex
 from app.utils.indexing.kdtree_index import KDTreeIndex
 from app.utils.indexing.clustered_index import ClusteredIndex
+from app.utils.indexing.lsh_index import LSHIndex
 from app.utils.indexing.index_type import IndexType
 from app.utils.indexing.base import Indexer
+from app.utils.indexing.quantization import Quantization
+from app.utils.indexing.reduction import VectorReducer
+from app.utils.indexing.search import VectorLookup
+from typing import Optional
 
-def create_index_by_type(index_type: IndexType) -> Indexer:
+def create_index_by_type(index_type: IndexType, reducer: Optional[VectorReducer] = None,
+                         candidate_multiplier: int = 4, quantization: Optional[Quantization] = None,
+                         vector_lookup: Optional[VectorLookup] = None) -> Indexer:
     if index_type == IndexType.LINEAR:
-        return LinearIndex()
+        return LinearIndex(reducer=reducer, candidate_multiplier=candidate_multiplier, quantization=quantization,
+                           vector_lookup=vector_lookup)
+    elif index_type == IndexType.CLUSTERED:
+        return ClusteredIndex(reducer=reducer, candidate_multiplier=candidate_multiplier, quantization=quantization,
+                              vector_lookup=vector_lookup)
+    elif reducer is not None:
+        raise ValueError(f"Reduced-vector search is not supported by the {index_type.value} index")
+    elif quantization is not None:
+        raise ValueError(f"Quantized vector storage is not supported by the {index_type.value} index")
     elif index_type == IndexType.KDTREE:
         return KDTreeIndex()
-    elif index_type == IndexType.CLUSTERED:
-        return ClusteredIndex()
+    elif index_type == IndexType.LSH:
+        return LSHIndex()
     else:
         raise ValueError(f"Unsupported index type: {index_type}")
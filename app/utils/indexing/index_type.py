@@ -4,3 +4,4 @@ class IndexType(str, Enum):
     LINEAR = "linear"
     KDTREE = "kdtree"
     CLUSTERED = "clustered"
+    LSH = "lsh"
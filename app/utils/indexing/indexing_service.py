@@ -1,19 +1,95 @@
-from typing import List, Tuple
+import logging
+from threading import Lock
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from app.models.chunk_models import Chunk
+from app.utils.embeddings.base import EmbeddingProvider
 from .base import Indexer
+from .index_type import IndexType
+from .search import DistanceFn, SearchBudget
+
+logger = logging.getLogger(__name__)
 
 class IndexingService:
-    def __init__(self, strategy: Indexer):
+    def __init__(self, strategy: Indexer, dimension: Optional[int] = None, index_type: Optional[IndexType] = None):
         self.strategy = strategy
+        self.dimension = dimension  # inferred from the first indexed vector when not given
+        self.index_type = index_type
+        self.migrating_to: Optional[IndexType] = None
+        self._pending_ops: Optional[List[Tuple[str, Optional[List[float]], str]]] = None
+        self._lock = Lock()
+
+    def validate_vector(self, vector: List[float]):
+        self.validate_dimension(len(vector))
+
+    def validate_dimension(self, dimension: int, source: str = "Vector"):
+        if self.dimension is not None and dimension != self.dimension:
+            raise ValueError(f"{source} dimension {dimension} does not match library dimension {self.dimension}")
+
+    def validate_provider(self, provider: EmbeddingProvider):
+        """Reject a provider whose vectors this index cannot hold, before any text is sent to it."""
+        self.validate_dimension(provider.dimension, f"Embedding provider '{provider.name}'")
 
     def add_chunk(self, chunk: Chunk):
-        self.strategy.add_vector(chunk.embedding, chunk.id)
+        self.validate_vector(chunk.embedding)
+        with self._lock:
+            if self.dimension is None:
+                self.dimension = len(chunk.embedding)
+            self.strategy.add_vector(chunk.embedding, chunk.id)
+            if self._pending_ops is not None:
+                self._pending_ops.append(("add", chunk.embedding, chunk.id))
+
+    def remove_chunk(self, chunk_id: str):
+        with self._lock:
+            self.strategy.remove_vector(chunk_id)
+            if self._pending_ops is not None:
+                self._pending_ops.append(("remove", None, chunk_id))
+
+    def rebuild_index(self, chunk_map: dict, layout: Optional[Dict[str, Any]] = None):
+        """Index chunk_map from scratch, or from a saved layout of the same chunks when one is given and fits."""
+        with self._lock:
+            if self.dimension is None and chunk_map:
+                self.dimension = len(next(iter(chunk_map.values())).embedding)
+            if layout is None or not self.strategy.load_layout(layout, chunk_map):
+                self.strategy.rebuild(chunk_map)
+            if self._pending_ops is not None:
+                self._pending_ops.append(("rebuild", None, ""))
+
+    def search_chunks(self, query_embedding: List[float], k: Optional[int], budget: Optional[SearchBudget] = None,
+                      max_distance: Optional[float] = None, group_fn: Optional[Callable[[str], str]] = None,
+                      group_limit: int = 1, distance_fn: Optional[DistanceFn] = None) -> List[Tuple[str, float]]:
+        self.validate_vector(query_embedding)
+        return self.strategy.search(
+            query_embedding, k, budget=budget, max_distance=max_distance, group_fn=group_fn, group_limit=group_limit,
+            distance_fn=distance_fn,
+        )
 
-    # def remove_chunk(self, chunk_id: str):
-    #     self.strategy.remove_vector(chunk_id)
+    def begin_migration(self, index_type: IndexType):
+        """Start recording writes so they can be replayed onto an index built in the background."""
+        with self._lock:
+            if self.migrating_to is not None:
+                raise RuntimeError(f"Index migration to {self.migrating_to.value} already in progress")
+            self.migrating_to = index_type
+            self._pending_ops = []
 
-    def rebuild_index(self, chunk_map: dict):
-        self.strategy.rebuild(chunk_map)
+    def complete_migration(self, new_strategy: Indexer, chunk_map: dict):
+        """Replay writes recorded during the build, then atomically swap in the new index."""
+        with self._lock:
+            for op, vector, chunk_id in self._pending_ops:
+                if op == "add":
+                    # Adds may already be part of the snapshot, so replay them idempotently
+                    new_strategy.remove_vector(chunk_id)
+                    new_strategy.add_vector(vector, chunk_id)
+                elif op == "remove":
+                    new_strategy.remove_vector(chunk_id)
+                else:
+                    new_strategy.rebuild(chunk_map)
+            self.strategy = new_strategy
+            self.index_type = self.migrating_to
+            logger.info(f"Swapped in {self.index_type.value} index after replaying {len(self._pending_ops)} writes")
+            self.migrating_to = None
+            self._pending_ops = None
 
-    def search_chunks(self, query_embedding: List[float], k: int) -> List[Tuple[str, float]]:
-        return self.strategy.search(query_embedding, k)
+    def abort_migration(self):
+        with self._lock:
+            self.migrating_to = None
+            self._pending_ops = None
@@ -1,6 +1,8 @@
 from typing import List, Tuple, Optional, Callable, Dict
 from app.models import Chunk
-from app.utils.similarity import euclidean_distance, cosine_similarity
+from app.utils.similarity import euclidean_distance
+from app.utils.indexing.base import Indexer
+from app.utils.indexing.search import Collector, DistanceFn, SearchBudget, bounded_distance
 
 class KDNode:
     def __init__(self, point: List[float], chunk_id: str, depth: int = 0,
@@ -10,13 +12,15 @@ class KDNode:
         self.left = left
         self.right = right
         self.depth = depth
+        self.deleted = False
 
-class KDTreeIndex:
+class KDTreeIndex(Indexer):
     def __init__(self, distance_fn: Callable[[List[float], List[float]], float] = euclidean_distance):
         self.root = None
         self.k = None  # dimensionality
         self.distance_fn = distance_fn
         self.chunk_ids = set()  # Track existing IDs to prevent duplicates
+        self.nodes: Dict[str, KDNode] = {}  # chunk_id -> live node, for tombstone deletes
 
     def add_vector(self, vector: List[float], chunk_id: str):
         if chunk_id in self.chunk_ids:
@@ -26,9 +30,18 @@ class KDTreeIndex:
         self.root = self._insert(self.root, vector, chunk_id, depth=0)
         self.chunk_ids.add(chunk_id)
 
+    def remove_vector(self, chunk_id: str):
+        # Tombstone the node: it keeps routing the search but is never returned
+        node = self.nodes.pop(chunk_id, None)
+        if node:
+            node.deleted = True
+            self.chunk_ids.discard(chunk_id)
+
     def _insert(self, node: Optional[KDNode], point: List[float], chunk_id: str, depth: int) -> KDNode:
         if node is None:
-            return KDNode(point, chunk_id, depth)
+            node = KDNode(point, chunk_id, depth)
+            self.nodes[chunk_id] = node
+            return node
 
         axis = depth % self.k
         if point[axis] < node.point[axis]:
@@ -41,24 +54,25 @@ class KDTreeIndex:
         self.root = None
         self.k = None
         self.chunk_ids.clear()
+        self.nodes.clear()
 
         for chunk_id, chunk in chunk_map.items():
             self.add_vector(chunk.embedding, chunk_id)
 
-    def search(self, query: List[float], k: int) -> List[Tuple[str, float]]:
-        best = []  # list of (distance, chunk_id)
+    def collect(self, query: List[float], best: Collector, budget: Optional[SearchBudget] = None,
+                distance_fn: Optional[DistanceFn] = None):
+        distance_fn = distance_fn or self.distance_fn
+        # The distance to a split plane only bounds euclidean distances; other metrics visit every branch
+        metric_pruning = distance_fn is euclidean_distance
 
         def _search(node: Optional[KDNode], depth: int):
-            if node is None:
+            if node is None or (budget and budget.exhausted):
                 return
 
-            dist = self.distance_fn(query, node.point)
-            if len(best) < k:
-                best.append((dist, node.chunk_id))
-                best.sort()
-            elif dist < best[-1][0]:
-                best[-1] = (dist, node.chunk_id)
-                best.sort()
+            if not node.deleted:
+                if budget and not budget.charge():
+                    return
+                best.offer(node.chunk_id, bounded_distance(distance_fn, query, node.point, best.bound()))
 
             axis = depth % self.k
             next_branch = None
@@ -73,8 +87,8 @@ class KDTreeIndex:
 
             _search(next_branch, depth + 1)
 
-            if len(best) < k or abs(query[axis] - node.point[axis]) < best[-1][0]:
+            # The far side can only hold closer points if the split plane lies within the current bound
+            if not metric_pruning or abs(query[axis] - node.point[axis]) <= best.bound():
                 _search(opposite_branch, depth + 1)
 
-        _search(self.root, 0)
-        return [(cid, dist) for dist, cid in best]
\ No newline at end of file
+        _search(self.root, 0)
\ No newline at end of file
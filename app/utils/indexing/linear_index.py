@@ -1,32 +1,88 @@
-from typing import List, Tuple, Optional, Callable, Dict
+from typing import Iterable, List, Tuple, Optional, Callable, Dict
 from app.models import Chunk
-from app.utils.similarity import euclidean_distance, cosine_similarity
+from app.utils.similarity import euclidean_distance
+from app.utils.indexing.base import Indexer
+from app.utils.indexing.quantization import Quantization
+from app.utils.indexing.reduction import ReducedVectors, VectorReducer
+from app.utils.indexing.search import Collector, DistanceFn, SearchBudget, VectorLookup, rerank, scan_vectors
 
-class LinearIndex:
+class LinearIndex(Indexer):
     """
     Linear indexing method with:
     - Time complexity: O(n) per query where n is the number of chunks
     - Space complexity: O(n*d) where n is the number of chunks and d is the dimensionality of embeddings
+    With a reducer, queries first scan the reduced vectors and re-rank the shortlist with full ones;
+    with quantization they scan a quantized copy of every vector instead. A quantized index given a
+    `vector_lookup` into the stored chunks keeps only the quantized rows and reads full vectors from there.
     """
-    def __init__(self, distance_fn: Callable[[List[float], List[float]], float] = euclidean_distance):
+    def __init__(self, distance_fn: Callable[[List[float], List[float]], float] = euclidean_distance,
+                 reducer: Optional[VectorReducer] = None, candidate_multiplier: int = 4,
+                 quantization: Optional[Quantization] = None, vector_lookup: Optional[VectorLookup] = None):
         self.vectors: Dict[str, List[float]] = {}  # chunk_id -> vector
         self.distance_fn = distance_fn
+        self.reduced = ReducedVectors(reducer, self.vectors.items, candidate_multiplier) if reducer else None
+        self.quantization = quantization
+        self.quantized = quantization.store() if quantization else None
+        self.vector_lookup = vector_lookup if quantization else None
+
+    def _full_vector(self, chunk_id: str) -> Optional[List[float]]:
+        return self.vector_lookup(chunk_id) if self.vector_lookup else self.vectors.get(chunk_id)
+
+    def _items(self) -> Iterable[Tuple[str, List[float]]]:
+        if self.vector_lookup is None:
+            return self.vectors.items()
+        return ((cid, vector) for cid in list(self.quantized.ids) if (vector := self.vector_lookup(cid)) is not None)
 
     def add_vector(self, vector: List[float], chunk_id: str):
-        self.vectors[chunk_id] = vector  # Overwrite if chunk_id exists
+        if self.vector_lookup is None:
+            self.vectors[chunk_id] = vector  # Overwrite if chunk_id exists
+        if self.reduced:
+            self.reduced.add(chunk_id, vector, len(self.vectors))
+        if self.quantization:
+            if self.quantization.needs_fit(len(self.quantized) + (chunk_id not in self.quantized.rows)):
+                # Refitting re-encodes every row, this one included
+                self._requantize({**dict(self._items()), chunk_id: vector}.items())
+            else:
+                self.quantized.add(chunk_id, vector)
 
     def remove_vector(self, chunk_id: str):
         self.vectors.pop(chunk_id, None)
+        if self.reduced:
+            self.reduced.remove(chunk_id)
+        if self.quantization:
+            self.quantized.remove(chunk_id)
 
     def rebuild(self, chunk_map: Dict[str, Chunk]):
         self.vectors.clear()
-        for chunk_id, chunk in chunk_map.items():
-            self.add_vector(chunk.embedding, chunk_id)
-
-    def search(self, query: List[float], k: int) -> List[Tuple[str, float]]:
-        distances = []
-        for cid, vec in self.vectors.items():
-            dist = self.distance_fn(query, vec)
-            distances.append((cid, dist))
-        distances.sort(key=lambda x: x[1])
-        return distances[:k]
\ No newline at end of file
+        if self.vector_lookup is None:
+            for chunk_id, chunk in chunk_map.items():
+                self.vectors[chunk_id] = chunk.embedding
+        if self.reduced:
+            self.reduced.refit()
+        if self.quantization:
+            self._requantize((chunk_id, chunk.embedding) for chunk_id, chunk in chunk_map.items())
+
+    def _requantize(self, items: Iterable[Tuple[str, List[float]]]):
+        items = list(items)
+        self.quantization.fit(vector for _, vector in items)
+        self.quantized = self.quantization.store(items)
+
+    def quantized_bytes(self) -> int:
+        return self.quantized.nbytes if self.quantized else 0
+
+    def collect(self, query: List[float], collector: Collector, budget: Optional[SearchBudget] = None,
+                distance_fn: Optional[DistanceFn] = None):
+        distance_fn = distance_fn or self.distance_fn
+        candidates = self.quantization.shortlist(collector) if self.quantization else None
+        if candidates is not None:
+            self.quantized.scan(query, candidates, distance_fn, budget)
+            if candidates is not collector:
+                rerank(query, candidates, self._full_vector, collector, distance_fn)
+            return
+        candidates = self.reduced.shortlist(collector, distance_fn) if self.reduced else None
+        if candidates is None:
+            scan_vectors(query, self._items(), collector, distance_fn, budget)
+            return
+        reduced_query = self.reduced.reducer.transform(query)
+        scan_vectors(reduced_query, self.reduced.vectors.items(), candidates, distance_fn, budget)
+        self.reduced.rerank(query, candidates, self.vectors.get, collector, distance_fn)
\ No newline at end of file
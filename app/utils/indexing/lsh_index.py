@@ -0,0 +1,234 @@
+from abc import ABC, abstractmethod
+from threading import Lock
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from app.models import Chunk
+from app.utils.similarity import euclidean_distance
+from app.utils.indexing.base import Indexer
+from app.utils.indexing.search import Collector, DistanceFn, SearchBudget, bounded_distance
+
+
+def _unpacked_popcount(values: np.ndarray) -> np.ndarray:
+    """Set bits per uint8 element, for numpy < 2.0 which has no bitwise_count."""
+    return np.unpackbits(values[..., np.newaxis], axis=-1).sum(axis=-1)
+
+
+popcount = getattr(np, "bitwise_count", _unpacked_popcount)
+
+
+class HashFamily(ABC):
+    """
+    `num_tables` independent hash functions, each made of `num_bits` projections.
+    `project` returns per-projection codes plus, for multi-probe, how close the vector is
+    to each projection's bucket boundary and which way the neighbouring bucket lies.
+    """
+    def __init__(self, dim: int, num_tables: int, num_bits: int, rng: np.random.Generator):
+        self.num_tables = num_tables
+        self.num_bits = num_bits
+        self.projections = rng.standard_normal((num_tables * num_bits, dim))
+
+    @abstractmethod
+    def project(self, vector: List[float]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        pass
+
+    def pack(self, codes: np.ndarray) -> np.ndarray:
+        return codes
+
+    def mismatches(self, packed_query: np.ndarray, packed: np.ndarray) -> np.ndarray:
+        """Number of differing hash components between the query and each row of `packed`."""
+        return (packed != packed_query).sum(axis=(1, 2))
+
+
+class SignedRandomProjections(HashFamily):
+    """Cosine LSH: one bit per hyperplane, packed into bytes and compared by popcount."""
+    def project(self, vector: List[float]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        raw = (self.projections @ np.asarray(vector, dtype=np.float64)).reshape(self.num_tables, self.num_bits)
+        codes = (raw > 0).astype(np.int32)
+        return codes, np.abs(raw), 1 - 2 * codes  # the neighbouring bucket flips the bit
+
+    def pack(self, codes: np.ndarray) -> np.ndarray:
+        return np.packbits(codes.astype(np.uint8), axis=-1)
+
+    def mismatches(self, packed_query: np.ndarray, packed: np.ndarray) -> np.ndarray:
+        return popcount(packed ^ packed_query).sum(axis=(1, 2))
+
+
+class PStableProjections(HashFamily):
+    """Euclidean LSH: floor((a.v + b) / w) with gaussian (2-stable) a and b uniform in [0, w)."""
+    def __init__(self, dim: int, num_tables: int, num_bits: int, rng: np.random.Generator, bucket_width: float):
+        super().__init__(dim, num_tables, num_bits, rng)
+        self.bucket_width = bucket_width
+        self.offsets = rng.uniform(0, bucket_width, num_tables * num_bits)
+
+    def project(self, vector: List[float]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        raw = (self.projections @ np.asarray(vector, dtype=np.float64) + self.offsets) / self.bucket_width
+        raw = raw.reshape(self.num_tables, self.num_bits)
+        codes = np.floor(raw).astype(np.int32)
+        frac = raw - codes
+        return codes, np.minimum(frac, 1 - frac), np.where(frac < 0.5, -1, 1)
+
+
+class HashTables:
+    """
+    Buckets of one hash family plus a dense matrix of every vector's packed signature.
+    Rows are swap-removed, so inserts and deletes are O(1) (amortized for the matrix growth).
+    """
+    def __init__(self, family: HashFamily):
+        self.family = family
+        self.buckets: List[Dict[bytes, Set[str]]] = [{} for _ in range(family.num_tables)]
+        self.ids: List[str] = []
+        self.rows: Dict[str, int] = {}
+        self.signatures: Optional[np.ndarray] = None
+
+    def _key(self, packed_row: np.ndarray) -> bytes:
+        return packed_row.tobytes()
+
+    def add(self, chunk_id: str, vector: List[float]):
+        packed = self.family.pack(self.family.project(vector)[0])
+        if self.signatures is None:
+            self.signatures = np.empty((16,) + packed.shape, dtype=packed.dtype)
+        elif len(self.ids) == len(self.signatures):
+            self.signatures = np.concatenate([self.signatures, np.empty_like(self.signatures)])
+        self.rows[chunk_id] = len(self.ids)
+        self.signatures[len(self.ids)] = packed
+        self.ids.append(chunk_id)
+        for table, row in enumerate(packed):
+            self.buckets[table].setdefault(self._key(row), set()).add(chunk_id)
+
+    def remove(self, chunk_id: str):
+        row = self.rows.pop(chunk_id, None)
+        if row is None:
+            return
+        for table, packed_row in enumerate(self.signatures[row]):
+            key = self._key(packed_row)
+            bucket = self.buckets[table].get(key)
+            if bucket is not None:
+                bucket.discard(chunk_id)
+                if not bucket:
+                    del self.buckets[table][key]
+        last = len(self.ids) - 1
+        if row != last:
+            self.signatures[row] = self.signatures[last]
+            self.ids[row] = self.ids[last]
+            self.rows[self.ids[row]] = row
+        self.ids.pop()
+
+    def _probe_keys(self, codes: np.ndarray, margins: np.ndarray, directions: np.ndarray,
+                    table: int, probes: int) -> Iterable[bytes]:
+        yield self._key(self.family.pack(codes[table]))
+        # Multi-probe: also visit the buckets across the boundaries the query lies closest to
+        for component in np.argsort(margins[table])[:probes]:
+            perturbed = codes[table].copy()
+            perturbed[component] += directions[table][component]
+            yield self._key(self.family.pack(perturbed))
+
+    def candidates(self, query: List[float], probes: int, limit: Optional[int]) -> List[str]:
+        """
+        Chunk ids from the query's buckets (and probed neighbours), ordered by how many hash
+        components they share with the query. When the buckets yield fewer than `limit`
+        ids, every signature is ranked instead; that is a vectorized popcount over the
+        signature matrix, and only `limit` ids go on to exact distance computation.
+        """
+        if not self.ids:
+            return []
+        codes, margins, directions = self.family.project(query)
+        found: Set[str] = set()
+        for table in range(self.family.num_tables):
+            for key in self._probe_keys(codes, margins, directions, table, probes):
+                found |= self.buckets[table].get(key, set())
+
+        if limit is not None and len(found) < limit:
+            rows = np.arange(len(self.ids))
+        else:
+            rows = np.fromiter((self.rows[cid] for cid in found), dtype=np.int64, count=len(found))
+        mismatches = self.family.mismatches(self.family.pack(codes), self.signatures[rows])
+        ranked = rows[np.argsort(mismatches, kind="stable")]
+        if limit is not None:
+            ranked = ranked[:limit]
+        return [self.ids[row] for row in ranked]
+
+
+class LSHIndex(Indexer):
+    """
+    Locality-sensitive hashing over `num_tables` tables of `num_bits` projections each:
+    signed random projections when ranking by cosine, p-stable hashing for euclidean.
+    Hash tables for a metric are built on its first query and maintained incrementally after.
+    Candidates are ranked by signature agreement and `candidate_multiplier * k` of them are
+    scored exactly, so results are approximate; `probes` extra buckets per table trade
+    query time for recall.
+    """
+    def __init__(self, distance_fn: Callable[[List[float], List[float]], float] = euclidean_distance,
+                 num_tables: int = 8, num_bits: int = 12, probes: int = 2, candidate_multiplier: int = 8,
+                 bucket_width: float = 4.0, seed: int = 0):
+        self.distance_fn = distance_fn
+        self.num_tables = num_tables
+        self.num_bits = num_bits
+        self.probes = probes
+        self.candidate_multiplier = candidate_multiplier
+        self.bucket_width = bucket_width
+        self.seed = seed
+        self.vectors: Dict[str, List[float]] = {}
+        self.tables: Dict[str, HashTables] = {}  # family name -> tables
+        self._tables_lock = Lock()
+
+    @staticmethod
+    def _family_name(distance_fn: DistanceFn) -> str:
+        return "l2" if distance_fn is euclidean_distance else "cosine"
+
+    def _create_family(self, name: str, dim: int) -> HashFamily:
+        rng = np.random.default_rng(self.seed)
+        if name == "l2":
+            return PStableProjections(dim, self.num_tables, self.num_bits, rng, self.bucket_width)
+        return SignedRandomProjections(dim, self.num_tables, self.num_bits, rng)
+
+    def _current_tables(self, distance_fn: DistanceFn) -> Optional[HashTables]:
+        name = self._family_name(distance_fn)
+        with self._tables_lock:
+            tables = self.tables.get(name)
+            if tables is None and self.vectors:
+                items = list(self.vectors.items())
+                tables = HashTables(self._create_family(name, len(items[0][1])))
+                for chunk_id, vector in items:
+                    tables.add(chunk_id, vector)
+                self.tables[name] = tables
+            return tables
+
+    def add_vector(self, vector: List[float], chunk_id: str):
+        with self._tables_lock:
+            if chunk_id in self.vectors:
+                for tables in self.tables.values():
+                    tables.remove(chunk_id)
+            self.vectors[chunk_id] = vector
+            for tables in self.tables.values():
+                tables.add(chunk_id, vector)
+
+    def remove_vector(self, chunk_id: str):
+        with self._tables_lock:
+            if self.vectors.pop(chunk_id, None) is not None:
+                for tables in self.tables.values():
+                    tables.remove(chunk_id)
+
+    def rebuild(self, chunk_map: Dict[str, Chunk]):
+        with self._tables_lock:
+            self.vectors = {chunk_id: chunk.embedding for chunk_id, chunk in chunk_map.items()}
+            self.tables = {}
+
+    def collect(self, query: List[float], collector: Collector, budget: Optional[SearchBudget] = None,
+                distance_fn: Optional[DistanceFn] = None):
+        distance_fn = distance_fn or self.distance_fn
+        tables = self._current_tables(distance_fn)
+        if tables is None:
+            return
+        limit = None
+        if collector.k is not None:
+            limit = collector.k * getattr(collector, "group_limit", 1) * self.candidate_multiplier
+        with self._tables_lock:
+            candidates = tables.candidates(query, self.probes, limit)
+        for cid in candidates:
+            if budget and not budget.charge():
+                break
+            vector = self.vectors.get(cid)
+            if vector is not None:
+                collector.offer(cid, bounded_distance(distance_fn, query, vector, collector.bound()))
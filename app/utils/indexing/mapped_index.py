@@ -0,0 +1,58 @@
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from app.models import Chunk
+from app.utils.similarity import cosine_distance, euclidean_distance
+from app.utils.indexing.base import Indexer
+from app.utils.indexing.search import Collector, DistanceFn, SearchBudget, offer_block
+
+
+class MappedIndex(Indexer):
+    """
+    Read-only exact index over a vector matrix that may be memory-mapped from a snapshot
+    file, so every process mapping the same file shares one copy in the page cache.
+    Distances are computed `block_size` rows at a time with numpy, which is also the
+    granularity at which the search budget is charged.
+    """
+    def __init__(self, matrix: np.ndarray, ids: List[str],
+                 distance_fn: Callable[[List[float], List[float]], float] = euclidean_distance,
+                 block_size: int = 4096):
+        if len(ids) != len(matrix):
+            raise ValueError(f"{len(ids)} ids for {len(matrix)} vectors")
+        self.matrix = matrix
+        self.ids = ids
+        self.distance_fn = distance_fn
+        self.block_size = block_size
+        self._norms: Optional[np.ndarray] = None  # computed on the first cosine query
+
+    def add_vector(self, vector: List[float], chunk_id: str):
+        raise RuntimeError("Mapped indexes are read-only; writes go through the writer process")
+
+    def remove_vector(self, chunk_id: str):
+        raise RuntimeError("Mapped indexes are read-only; writes go through the writer process")
+
+    def rebuild(self, chunk_map: Dict[str, Chunk]):
+        raise RuntimeError("Mapped indexes are read-only; writes go through the writer process")
+
+    def _distances(self, query: np.ndarray, start: int, stop: int, distance_fn: DistanceFn) -> np.ndarray:
+        block = self.matrix[start:stop]
+        if distance_fn is cosine_distance:
+            if self._norms is None:
+                self._norms = np.linalg.norm(self.matrix, axis=1)
+            denominator = self._norms[start:stop] * np.linalg.norm(query)
+            dots = block @ query
+            # Zero vectors have similarity 0, as in cosine_similarity
+            similarity = np.divide(dots, denominator, out=np.zeros_like(dots), where=denominator != 0)
+            return 1.0 - similarity
+        return np.linalg.norm(block - query, axis=1)
+
+    def collect(self, query: List[float], collector: Collector, budget: Optional[SearchBudget] = None,
+                distance_fn: Optional[DistanceFn] = None):
+        distance_fn = distance_fn or self.distance_fn
+        q = np.asarray(query, dtype=np.float64)
+        for start in range(0, len(self.ids), self.block_size):
+            stop = min(start + self.block_size, len(self.ids))
+            if budget and not budget.charge(stop - start):
+                break
+            offer_block(self.ids, start, self._distances(q, start, stop, distance_fn), collector)
@@ -0,0 +1,7 @@
+from enum import Enum
+
+class Precision(str, Enum):
+    FLOAT64 = "float64"  # full precision, the vectors as stored on the chunks
+    FLOAT32 = "float32"
+    FLOAT16 = "float16"
+    INT8 = "int8"  # scalar quantization with per-dimension scale and offset
@@ -0,0 +1,174 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from app.utils.similarity import cosine_distance
+from .precision_type import Precision
+from .search import Collector, DistanceFn, SearchBudget, offer_block, shortlist_collector
+
+_DTYPES = {Precision.FLOAT32: np.float32, Precision.FLOAT16: np.float16, Precision.INT8: np.int8}
+
+
+class ScalarQuantizer:
+    """
+    Encodes vectors as rows of the precision's dtype. int8 maps each dimension's observed
+    [min, max] onto the 256 code values; it is fitted on the first vectors and refitted
+    whenever the index has doubled since, and values outside the fitted range saturate.
+    """
+    def __init__(self, precision: Precision):
+        if precision not in _DTYPES:
+            raise ValueError(f"Unsupported storage precision: {precision}")
+        self.precision = precision
+        self.dtype = _DTYPES[precision]
+        self.scale: Optional[np.ndarray] = None
+        self.offset: Optional[np.ndarray] = None
+        self.fitted_size = 0
+
+    def needs_fit(self, size: int) -> bool:
+        return self.precision == Precision.INT8 and size >= 2 * self.fitted_size
+
+    def fit(self, vectors: Iterable[List[float]]):
+        if self.precision != Precision.INT8:
+            return
+        data = np.asarray(list(vectors), dtype=np.float64)
+        self.fitted_size = len(data)
+        if not len(data):
+            return
+        low, high = data.min(axis=0), data.max(axis=0)
+        # Code -128 decodes to the minimum and 127 to the maximum; constant dimensions decode exactly
+        scale = np.where(high > low, (high - low) / 255, 1.0)
+        self.scale = scale.astype(np.float32)
+        self.offset = (low + 128 * scale).astype(np.float32)
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        if self.precision != Precision.INT8:
+            return vectors.astype(self.dtype)
+        codes = np.rint((vectors - self.offset) / self.scale)
+        return np.clip(codes, -128, 127).astype(np.int8)
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        """Approximate float32 vectors for a block of rows."""
+        if self.precision != Precision.INT8:
+            return codes.astype(np.float32)
+        return codes.astype(np.float32) * self.scale + self.offset
+
+
+class QuantizedVectors:
+    """
+    Quantized rows of one set of vectors (a linear index, or one cluster), scored a block at
+    a time with numpy. Rows are swap-removed, so inserts and deletes are O(1) (amortized for
+    the matrix growth). Norms of the original vectors are kept for cosine queries.
+    """
+    def __init__(self, quantizer: ScalarQuantizer, block_size: int = 4096):
+        self.quantizer = quantizer
+        self.block_size = block_size
+        self.ids: List[str] = []
+        self.rows: Dict[str, int] = {}
+        self.codes: Optional[np.ndarray] = None
+        self.norms: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes allocated for codes and norms, spare rows included."""
+        return sum(array.nbytes for array in (self.codes, self.norms) if array is not None)
+
+    def load(self, items: Iterable[Tuple[str, List[float]]]):
+        items = list(items)
+        self.ids = [cid for cid, _ in items]
+        self.rows = {cid: row for row, cid in enumerate(self.ids)}
+        if not items:
+            self.codes = self.norms = None
+            return
+        vectors = np.asarray([vector for _, vector in items], dtype=np.float64)
+        self.codes = self.quantizer.encode(vectors)
+        self.norms = np.linalg.norm(vectors, axis=1).astype(np.float32)
+
+    def add(self, chunk_id: str, vector: List[float]):
+        self.remove(chunk_id)  # overwrite if chunk_id exists
+        row = np.asarray(vector, dtype=np.float64)
+        if self.codes is None:
+            self.codes = np.empty((16, len(row)), dtype=self.quantizer.dtype)
+            self.norms = np.empty(16, dtype=np.float32)
+        elif len(self.ids) == len(self.codes):
+            self.codes = np.concatenate([self.codes, np.empty_like(self.codes)])
+            self.norms = np.concatenate([self.norms, np.empty_like(self.norms)])
+        self.rows[chunk_id] = len(self.ids)
+        self.codes[len(self.ids)] = self.quantizer.encode(row[np.newaxis])[0]
+        self.norms[len(self.ids)] = np.linalg.norm(row)
+        self.ids.append(chunk_id)
+
+    def remove(self, chunk_id: str):
+        row = self.rows.pop(chunk_id, None)
+        if row is None:
+            return
+        last = len(self.ids) - 1
+        if row != last:
+            self.codes[row] = self.codes[last]
+            self.norms[row] = self.norms[last]
+            self.ids[row] = self.ids[last]
+            self.rows[self.ids[row]] = row
+        self.ids.pop()
+
+    def _distances(self, query: np.ndarray, query_norm: float, start: int, stop: int,
+                   distance_fn: DistanceFn) -> np.ndarray:
+        block = self.quantizer.decode(self.codes[start:stop])
+        if distance_fn is cosine_distance:
+            denominator = self.norms[start:stop] * query_norm
+            dots = block @ query
+            # Zero vectors have similarity 0, as in cosine_similarity
+            similarity = np.divide(dots, denominator, out=np.zeros_like(dots), where=denominator != 0)
+            return 1.0 - similarity
+        diff = block - query
+        return np.sqrt(np.einsum("ij,ij->i", diff, diff))
+
+    def scan(self, query: List[float], collector: Collector, distance_fn: DistanceFn,
+             budget: Optional[SearchBudget] = None) -> bool:
+        """Offer every row with its approximate distance; returns False once the budget ran out."""
+        q = np.asarray(query, dtype=np.float32)
+        query_norm = float(np.linalg.norm(q))
+        for start in range(0, len(self.ids), self.block_size):
+            stop = min(start + self.block_size, len(self.ids))
+            if budget and not budget.charge(stop - start):
+                return False
+            offer_block(self.ids, start, self._distances(q, query_norm, start, stop, distance_fn), collector)
+        return True
+
+
+class Quantization:
+    """
+    Quantized scan copies for an index, configured per library. Top-k queries scan the
+    quantized rows for `candidate_multiplier * k` candidates and, with `rescore`, re-rank
+    them with the full vectors so reported distances and the final order are exact.
+    """
+    def __init__(self, precision: Precision, candidate_multiplier: int = 4, rescore: bool = True):
+        self.quantizer = ScalarQuantizer(precision)
+        self.candidate_multiplier = candidate_multiplier
+        self.rescore = rescore
+
+    def store(self, items: Iterable[Tuple[str, List[float]]] = ()) -> QuantizedVectors:
+        vectors = QuantizedVectors(self.quantizer)
+        vectors.load(items)
+        return vectors
+
+    def needs_fit(self, size: int) -> bool:
+        return self.quantizer.needs_fit(size)
+
+    def fit(self, vectors: Iterable[List[float]]):
+        """Refit the codec; every store sharing it has to be reloaded afterwards."""
+        self.quantizer.fit(vectors)
+
+    def shortlist(self, collector: Collector) -> Optional[Collector]:
+        """
+        First-stage collector for a query: the collector itself when results are not rescored,
+        or None when the query must run on full vectors. Quantized distances bound the exact
+        ones in neither direction, so range queries without k stay on full vectors and a
+        radius is only applied while rescoring.
+        """
+        if not self.rescore:
+            return collector
+        if collector.k is None:
+            return None
+        return shortlist_collector(collector, self.candidate_multiplier)
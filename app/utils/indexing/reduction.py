@@ -0,0 +1,130 @@
+import math
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from app.utils.similarity import euclidean_distance
+from .reduction_type import ReductionType
+from .search import Collector, DistanceFn, TopKCollector, rerank, shortlist_collector
+
+
+class VectorReducer(ABC):
+    """Maps full vectors to `dimension`-long ones that are cheaper to scan."""
+    def __init__(self, dimension: int):
+        self.dimension = dimension
+
+    @property
+    def fitted(self) -> bool:
+        return True
+
+    def needs_fit(self, size: int, fitted_size: int) -> bool:
+        return False
+
+    def fit(self, vectors: List[List[float]]):
+        pass
+
+    @abstractmethod
+    def transform(self, vector: List[float]) -> List[float]:
+        pass
+
+
+class TruncationReducer(VectorReducer):
+    """Prefix truncation, for Matryoshka-style embeddings whose leading dimensions carry most of the signal."""
+    def transform(self, vector: List[float]) -> List[float]:
+        return vector[:self.dimension]
+
+
+class PCAReducer(VectorReducer):
+    """
+    Projection onto the top principal components of the library's vectors.
+    The projection is orthonormal, so reduced euclidean distances never exceed the full ones.
+    It is (re)fitted once enough vectors exist and again whenever the library has doubled
+    since the last fit, which keeps refitting amortized O(1) per added vector.
+    """
+    def __init__(self, dimension: int):
+        super().__init__(dimension)
+        self.mean: Optional[np.ndarray] = None
+        self.components: Optional[np.ndarray] = None
+
+    @property
+    def fitted(self) -> bool:
+        return self.components is not None
+
+    def needs_fit(self, size: int, fitted_size: int) -> bool:
+        if size < self.dimension:
+            return False
+        return not self.fitted or size >= 2 * fitted_size
+
+    def fit(self, vectors: List[List[float]]):
+        if not vectors:
+            return
+        data = np.asarray(vectors, dtype=np.float64)
+        self.mean = data.mean(axis=0)
+        _, _, vt = np.linalg.svd(data - self.mean, full_matrices=False)
+        self.components = vt[:self.dimension]
+
+    def transform(self, vector: List[float]) -> List[float]:
+        return ((np.asarray(vector, dtype=np.float64) - self.mean) @ self.components.T).tolist()
+
+
+def create_reducer_by_type(reduction_type: ReductionType, dimension: int) -> VectorReducer:
+    if reduction_type == ReductionType.PCA:
+        return PCAReducer(dimension)
+    elif reduction_type == ReductionType.TRUNCATE:
+        return TruncationReducer(dimension)
+    else:
+        raise ValueError(f"Unsupported reduction type: {reduction_type}")
+
+
+class ReducedVectors:
+    """
+    Reduced copies of an index's vectors, used for two-stage search: the first stage
+    scans the reduced vectors for `candidate_multiplier * k` candidates and the second
+    re-ranks only those with the full vectors.
+    `source` yields the index's full (chunk_id, vector) pairs and is read when (re)fitting.
+    """
+    def __init__(self, reducer: VectorReducer, source: Callable[[], Iterable[Tuple[str, List[float]]]],
+                 candidate_multiplier: int = 4):
+        self.reducer = reducer
+        self.source = source
+        self.candidate_multiplier = candidate_multiplier
+        self.vectors: Dict[str, List[float]] = {}
+        self._fitted_size = 0
+
+    def add(self, chunk_id: str, vector: List[float], size: int):
+        """Reduce a newly indexed vector; `size` is the index's vector count including it."""
+        if self.reducer.needs_fit(size, self._fitted_size):
+            self.refit()
+        elif self.reducer.fitted:
+            self.vectors[chunk_id] = self.reducer.transform(vector)
+
+    def remove(self, chunk_id: str):
+        self.vectors.pop(chunk_id, None)
+
+    def refit(self):
+        items = list(self.source())
+        self.reducer.fit([vector for _, vector in items])
+        self._fitted_size = len(items)
+        if not self.reducer.fitted:
+            self.vectors = {}
+            return
+        self.vectors = {cid: self.reducer.transform(vector) for cid, vector in items}
+
+    def shortlist(self, collector: Collector, distance_fn: DistanceFn) -> Optional[Collector]:
+        """
+        First-stage collector for a query, or None when the query must run on full vectors.
+        Reduced euclidean distances are lower bounds, so a euclidean radius carries over
+        losslessly; other metrics only get a top-k shortlist.
+        """
+        if not self.reducer.fitted:
+            return None
+        radius = collector.max_distance if distance_fn is euclidean_distance else math.inf
+        if collector.k is None:
+            return TopKCollector(None, radius) if radius != math.inf else None
+        return shortlist_collector(collector, self.candidate_multiplier, radius)
+
+    def rerank(self, query: List[float], candidates: Collector, full_vector: Callable[[str], Optional[List[float]]],
+               collector: Collector, distance_fn: DistanceFn):
+        rerank(query, candidates, full_vector, collector, distance_fn)
+
@@ -0,0 +1,5 @@
+from enum import Enum
+
+class ReductionType(str, Enum):
+    PCA = "pca"
+    TRUNCATE = "truncate"
@@ -0,0 +1,177 @@
+import heapq
+import itertools
+import math
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from app.utils.similarity import euclidean_distance, euclidean_distance_bounded
+
+DistanceFn = Callable[[List[float], List[float]], float]
+# Full vector of a chunk id, or None when it is no longer stored
+VectorLookup = Callable[[str], Optional[List[float]]]
+
+
+def bounded_distance(distance_fn: DistanceFn, a: List[float], b: List[float], bound: float) -> float:
+    """Distance between a and b, or math.inf once it is known to exceed `bound` (euclidean only)."""
+    if distance_fn is euclidean_distance:
+        return euclidean_distance_bounded(a, b, bound)
+    return distance_fn(a, b)
+
+
+class SearchBudget:
+    """
+    Limits how much work a single search may do. Strategies call `charge()` before
+    scoring each candidate vector and stop as soon as it returns False; the results
+    gathered so far are then returned and `exhausted` marks them as approximate.
+    """
+    def __init__(self, deadline_ms: Optional[float] = None, max_candidates: Optional[int] = None):
+        self.deadline = time.monotonic() + deadline_ms / 1000 if deadline_ms is not None else None
+        self.max_candidates = max_candidates
+        self.candidates = 0
+        self.exhausted = False
+
+    def charge(self, n: int = 1) -> bool:
+        if self.exhausted:
+            return False
+        if self.max_candidates is not None and self.candidates + n > self.max_candidates:
+            self.exhausted = True
+        elif self.deadline is not None and time.monotonic() > self.deadline:
+            self.exhausted = True
+        else:
+            self.candidates += n
+        return not self.exhausted
+
+
+class TopKCollector:
+    """
+    Bounded max-heap keeping the k smallest distances seen so far.
+    With `max_distance` it becomes a range query: farther candidates are rejected,
+    and `k=None` removes the cap so every candidate within range is kept.
+    """
+    def __init__(self, k: Optional[int], max_distance: float = math.inf):
+        self.k = k
+        self.max_distance = max_distance
+        self._heap: List[Tuple[float, int, str]] = []  # (-distance, tiebreak, chunk_id)
+        self._counter = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def full(self) -> bool:
+        return self.k is not None and len(self._heap) >= self.k
+
+    def bound(self) -> float:
+        """Largest distance a candidate may have and still enter the result set."""
+        return min(-self._heap[0][0], self.max_distance) if self.full() else self.max_distance
+
+    def offer(self, chunk_id: str, distance: float):
+        if distance > self.max_distance:
+            return
+        # Ties keep the earlier candidate, matching a stable sort
+        entry = (-distance, -next(self._counter), chunk_id)
+        if not self.full():
+            heapq.heappush(self._heap, entry)
+        elif distance < -self._heap[0][0]:
+            heapq.heapreplace(self._heap, entry)
+
+    def results(self) -> List[Tuple[str, float]]:
+        return [(cid, -neg_dist) for neg_dist, _, cid in sorted(self._heap, reverse=True)]
+
+
+class GroupedCollector:
+    """
+    Keeps the best `group_limit` chunks per group (e.g. per document) in bounded heaps and
+    ranks groups by their best chunk. `full()` turns true once k distinct groups were seen,
+    which is what lets strategies stop probing early. Every group keeps its own heap, since
+    a group outside the current top k may still overtake one inside it.
+    """
+    def __init__(self, k: Optional[int], group_fn: Callable[[str], str], group_limit: int = 1,
+                 max_distance: float = math.inf):
+        self.k = k
+        self.group_fn = group_fn
+        self.group_limit = group_limit
+        self.max_distance = max_distance
+        self._groups: Dict[str, TopKCollector] = {}
+
+    def __len__(self) -> int:
+        return len(self._groups)
+
+    def full(self) -> bool:
+        return self.k is not None and len(self._groups) >= self.k
+
+    def bound(self) -> float:
+        # A chunk of a group that has not filled its heap can matter at any distance
+        return self.max_distance
+
+    def offer(self, chunk_id: str, distance: float):
+        if distance > self.max_distance:
+            return
+        group = self.group_fn(chunk_id)
+        collector = self._groups.get(group)
+        if collector is None:
+            collector = self._groups[group] = TopKCollector(self.group_limit)
+        collector.offer(chunk_id, distance)
+
+    def grouped_results(self) -> List[Tuple[str, List[Tuple[str, float]]]]:
+        ranked = [(group, collector.results()) for group, collector in self._groups.items()]
+        ranked.sort(key=lambda item: item[1][0][1])
+        return ranked[:self.k] if self.k is not None else ranked
+
+    def results(self) -> List[Tuple[str, float]]:
+        """Flattened hits, ordered by group rank and then by distance within each group."""
+        return [hit for _, hits in self.grouped_results() for hit in hits]
+
+
+Collector = Union[TopKCollector, GroupedCollector]
+
+
+def make_collector(k: Optional[int], max_distance: Optional[float] = None,
+                   group_fn: Optional[Callable[[str], str]] = None, group_limit: int = 1) -> Collector:
+    radius = max_distance if max_distance is not None else math.inf
+    if group_fn is not None:
+        return GroupedCollector(k, group_fn, group_limit=group_limit, max_distance=radius)
+    return TopKCollector(k, radius)
+
+
+def shortlist_collector(collector: Collector, multiplier: int, max_distance: float = math.inf) -> Collector:
+    """
+    First-stage collector of a two-stage search, keeping `multiplier` times as many candidates
+    as `collector`. Grouped queries get a grouped shortlist, so one group with many close
+    chunks cannot crowd the other groups out before the second stage sees them.
+    """
+    if isinstance(collector, GroupedCollector):
+        return GroupedCollector(collector.k * multiplier, collector.group_fn,
+                                group_limit=collector.group_limit * multiplier, max_distance=max_distance)
+    return TopKCollector(collector.k * multiplier, max_distance)
+
+
+def scan_vectors(query: List[float], vectors: Iterable[Tuple[str, List[float]]], collector: Collector,
+                 distance_fn: DistanceFn, budget: Optional[SearchBudget] = None) -> bool:
+    """Offer every vector to the collector; returns False once the budget ran out."""
+    for cid, vec in vectors:
+        if budget and not budget.charge():
+            return False
+        # Vectors already farther than the current k-th hit (or the radius) are abandoned early
+        collector.offer(cid, bounded_distance(distance_fn, query, vec, collector.bound()))
+    return True
+
+
+def offer_block(ids: Sequence[str], start: int, distances: np.ndarray, collector: Collector):
+    """Offer a block of rows scored at once (rows start..start+len(distances) of `ids`), best first."""
+    rows = np.flatnonzero(distances <= collector.bound())
+    if collector.k is not None and not hasattr(collector, "group_fn") and len(rows) > collector.k:
+        # Only the block's k best can enter an ungrouped top-k
+        rows = rows[np.argpartition(distances[rows], collector.k - 1)[:collector.k]]
+    for row in rows[np.argsort(distances[rows], kind="stable")]:
+        collector.offer(ids[start + row], float(distances[row]))
+
+
+def rerank(query: List[float], candidates: Collector, full_vector: VectorLookup,
+           collector: Collector, distance_fn: DistanceFn):
+    """Second stage of a two-stage search: score the first stage's candidates with their full vectors."""
+    for cid, _ in candidates.results():
+        vector = full_vector(cid)
+        if vector is not None:
+            collector.offer(cid, bounded_distance(distance_fn, query, vector, collector.bound()))
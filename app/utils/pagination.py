@@ -0,0 +1,89 @@
+import json
+import base64
+from typing import Any, Callable, Iterable, Iterator, List, Literal, Optional, Sequence, Set, Tuple, Type
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from app.utils.serialization import FastJSONResponse, dumps
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+OutputFormat = Literal["json", "ndjson"]
+
+
+def encode_cursor(position: int, last_id: str) -> str:
+    raw = json.dumps({"pos": position, "after": last_id}).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[int, str]:
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return int(data["pos"]), str(data["after"])
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _start_index(ids: Sequence[str], cursor: Optional[str]) -> int:
+    if not cursor:
+        return 0
+    position, last_id = decode_cursor(cursor)
+    # Fast path: nothing before the cursor changed since it was issued
+    if 0 < position <= len(ids) and ids[position - 1] == last_id:
+        return position
+    try:
+        return ids.index(last_id) + 1
+    except ValueError:
+        # The last returned item was deleted; resume at its former position
+        return min(position, len(ids))
+
+
+def paginate(ids: Sequence[str], cursor: Optional[str], limit: Optional[int]) -> Tuple[Sequence[str], Optional[str]]:
+    start = _start_index(ids, cursor)
+    end = len(ids) if limit is None else min(start + limit, len(ids))
+    page = ids[start:end]
+    next_cursor = encode_cursor(end, ids[end - 1]) if end < len(ids) and page else None
+    return page, next_cursor
+
+
+def resolve_fields(model_cls: Type[BaseModel], fields: Optional[str], default_exclude: Iterable[str] = (),
+                   extra_fields: Iterable[str] = ()) -> Set[str]:
+    allowed = set(model_cls.model_fields) | set(extra_fields)
+    if fields is None:
+        return allowed - set(default_exclude)
+    requested = {f.strip() for f in fields.split(",") if f.strip()}
+    unknown = requested - allowed
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    return requested | {"id"}
+
+
+def _ndjson_lines(ids: Sequence[str], serialize: Callable[[str], Optional[dict]]) -> Iterator[bytes]:
+    for item_id in ids:
+        item = serialize(item_id)
+        if item is not None:
+            yield dumps(item) + b"\n"
+
+
+def list_response(ids: List[str], serialize: Callable[[str], Optional[dict]],
+                  cursor: Optional[str], limit: Optional[int], output_format: OutputFormat) -> Any:
+    """
+    Shared tail of the list endpoints: ids is a snapshot of the ordered keys, serialize
+    turns one id into a projected dict (or None if it vanished in the meantime).
+    JSON output without `limit` or `cursor` is the whole list, as before pagination existed;
+    otherwise it is one page (DEFAULT_PAGE_SIZE if only a cursor is given) with the
+    continuation in the X-Next-Cursor header. NDJSON output streams every remaining item
+    (or `limit` of them) one line at a time.
+    Items are plain dicts built from stored models, so they are encoded directly.
+    """
+    if output_format == "ndjson":
+        page, next_cursor = paginate(ids, cursor, limit)
+        headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+        return StreamingResponse(_ndjson_lines(page, serialize), media_type="application/x-ndjson", headers=headers)
+
+    if limit is None and cursor:
+        limit = DEFAULT_PAGE_SIZE
+    page, next_cursor = paginate(ids, cursor, limit)
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    return FastJSONResponse([item for item_id in page if (item := serialize(item_id)) is not None], headers=headers)
@@ -0,0 +1,87 @@
+import os
+import json
+import weakref
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Iterable, Tuple
+from fastapi import Response
+from app.models.chunk_models import Chunk
+
+try:
+    import orjson
+except ImportError:  # optional speedup; the standard library encoder produces the same JSON
+    orjson = None
+
+# Encoded text/metadata fragments kept for the most recently returned chunks
+FRAGMENT_CACHE_MAX_ENTRIES = int(os.getenv("FRAGMENT_CACHE_MAX_ENTRIES", "65536"))
+
+
+def _default(value: Any) -> Any:
+    # numpy arrays and scalars (memory-mapped embeddings, scores) and anything else list-like
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(value: Any) -> bytes:
+    """Compact UTF-8 JSON, matching what FastAPI's JSONResponse would send for plain data."""
+    if orjson is not None:
+        return orjson.dumps(value, default=_default)
+    return json.dumps(value, default=_default, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(Response):
+    """
+    JSON response for trusted internal data: skips response_model validation and the generic
+    jsonable_encoder pass. Content may also be an already encoded body.
+    """
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return content if isinstance(content, bytes) else dumps(content)
+
+
+class FragmentCache:
+    """
+    Bounded LRU of the encoded `"text":...,"metadata":...` members of chunks, the bulk of a
+    search hit. Chunks are replaced rather than modified on update, so an entry stays valid
+    for as long as it belongs to the same chunk object; it is only weakly referenced, so
+    cached fragments never keep evicted or deleted chunks alive.
+    """
+    def __init__(self, max_entries: int = FRAGMENT_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[weakref.ref, bytes]]" = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, chunk: Chunk) -> bytes:
+        with self._lock:
+            entry = self._entries.get(chunk.id)
+            if entry is not None and entry[0]() is chunk:
+                self._entries.move_to_end(chunk.id)
+                return entry[1]
+        fragment = dumps({
+            "text": chunk.text,
+            "metadata": chunk.metadata.model_dump() if chunk.metadata else None,
+        })[1:-1]
+        if self.max_entries > 0:
+            with self._lock:
+                self._entries[chunk.id] = (weakref.ref(chunk), fragment)
+                self._entries.move_to_end(chunk.id)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return fragment
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+fragments = FragmentCache()
+
+
+def encode_hit(chunk: Chunk, score: float) -> bytes:
+    """One QueryResult object, built around the chunk's cached fragment."""
+    return b'{"chunk_id":' + dumps(chunk.id) + b',"score":' + dumps(score) + b"," + fragments.get(chunk) + b"}"
+
+
+def encode_array(items: Iterable[bytes]) -> bytes:
+    return b"[" + b",".join(items) + b"]"
@@ -11,3 +11,21 @@ def cosine_similarity(a: List[float], b: List[float]) -> float:
     if norm_a == 0 or norm_b == 0:
         return 0.0  # avoid division by zero
     return dot / (norm_a * norm_b)
+
+def cosine_distance(a: List[float], b: List[float]) -> float:
+    return 1.0 - cosine_similarity(a, b)
+
+def euclidean_distance_bounded(a: List[float], b: List[float], bound: float, block: int = 64) -> float:
+    """
+    Euclidean distance with early abandoning: returns math.inf as soon as the partial
+    sum over the dimensions seen so far already exceeds `bound`.
+    """
+    if bound == math.inf:
+        return euclidean_distance(a, b)
+    limit = bound * bound
+    total = 0.0
+    for start in range(0, len(a), block):
+        total += sum((x - y) ** 2 for x, y in zip(a[start:start + block], b[start:start + block]))
+        if total > limit:
+            return math.inf
+    return math.sqrt(total)
@@ -0,0 +1,70 @@
+"""
+Compare per-request embedding latency of the configured providers.
+
+Usage:
+    python -m benchmarks.embedding_latency --providers cohere local --requests 50 --concurrency 8
+
+The Cohere provider needs COHERE_API_KEY; the local provider needs LOCAL_EMBEDDING_MODEL_PATH
+(and `sentence-transformers` installed). Providers that cannot be created are skipped.
+"""
+import argparse
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+from app.utils.embeddings.factory import create_provider_by_type
+from app.utils.embeddings.provider_type import ProviderType
+
+SAMPLE_TEXTS = [
+    "banana fruit salad",
+    "car repair manual",
+    "quantum physics introduction",
+    "how to bake sourdough bread at home",
+    "kubernetes deployment troubleshooting guide",
+]
+
+
+def _percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def _timed_embed(provider, text: str) -> float:
+    start = time.perf_counter()
+    provider.embed_one(text)
+    return (time.perf_counter() - start) * 1000
+
+
+def run(provider_type: ProviderType, requests: int, concurrency: int):
+    try:
+        provider = create_provider_by_type(provider_type)
+        provider.embed_one("warmup")
+    except (ValueError, RuntimeError) as e:
+        print(f"{provider_type.value:>8}: skipped ({e})")
+        return
+
+    texts = [SAMPLE_TEXTS[i % len(SAMPLE_TEXTS)] for i in range(requests)]
+    sequential = [_timed_embed(provider, text) for text in texts]
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        concurrent = list(pool.map(lambda t: _timed_embed(provider, t), texts))
+    wall = time.perf_counter() - start
+
+    print(
+        f"{provider_type.value:>8}: dim={provider.dimension} "
+        f"sequential p50={_percentile(sequential, 50):.1f}ms p95={_percentile(sequential, 95):.1f}ms | "
+        f"concurrency={concurrency} p50={_percentile(concurrent, 50):.1f}ms p95={_percentile(concurrent, 95):.1f}ms "
+        f"mean={statistics.mean(concurrent):.1f}ms throughput={requests / wall:.1f} req/s"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--providers", nargs="+", default=[p.value for p in ProviderType], choices=[p.value for p in ProviderType])
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+    for name in args.providers:
+        run(ProviderType(name), args.requests, args.concurrency)
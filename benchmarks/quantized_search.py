@@ -0,0 +1,77 @@
+"""
+Measure latency, recall and scan memory of quantized vector storage.
+
+Usage:
+    python -m benchmarks.quantized_search --vectors 5000 --dim 256 --multipliers 2 4
+
+Vectors are synthetic gaussians. Recall@k is measured against an exact linear scan over the
+full vectors; "scan MB" is the size of the vectors a query scans (Python float lists for
+float64, the quantized matrix otherwise).
+"""
+import argparse
+import random
+import sys
+from typing import List
+
+from app.models.chunk_models import Chunk
+from app.utils.indexing.linear_index import LinearIndex
+from app.utils.indexing.precision_type import Precision
+from app.utils.indexing.quantization import Quantization
+from benchmarks.two_stage_search import STRATEGIES, _measure
+
+
+def _list_bytes(vectors: List[List[float]]) -> int:
+    return sum(sys.getsizeof(vector) + sum(sys.getsizeof(x) for x in vector) for vector in vectors)
+
+
+def _scan_bytes(index) -> int:
+    stores = index.quantized if isinstance(index.quantized, list) else [index.quantized]
+    return sum(store.codes[:len(store)].nbytes for store in stores if store.codes is not None)
+
+
+def run(strategy: str, vectors: int, dim: int, multipliers: List[int], queries: int, k: int):
+    rng = random.Random(42)
+    chunk_map = {
+        f"c{i}": Chunk(id=f"c{i}", text="", document_id="d", embedding=[rng.gauss(0, 1) for _ in range(dim)])
+        for i in range(vectors)
+    }
+    query_vectors = [[rng.gauss(0, 1) for _ in range(dim)] for _ in range(queries)]
+
+    oracle = LinearIndex()
+    oracle.rebuild(chunk_map)
+    truth = [{cid for cid, _ in oracle.search(q, k)} for q in query_vectors]
+
+    baseline_index = STRATEGIES[strategy]()
+    baseline_index.rebuild(chunk_map)
+    baseline = _measure(baseline_index, query_vectors, k, truth)
+    full_mb = _list_bytes([chunk.embedding for chunk in chunk_map.values()]) / 2**20
+    print(f"{strategy:>9} float64          p50={baseline['p50']:.2f}ms recall@{k}={baseline['recall']:.3f} "
+          f"scan MB={full_mb:.1f}")
+
+    for precision in [Precision.FLOAT32, Precision.FLOAT16, Precision.INT8]:
+        for multiplier in multipliers + [None]:
+            rescore = multiplier is not None
+            # As in the database, full vectors are read from the chunks rather than held by the index
+            index = STRATEGIES[strategy](quantization=Quantization(precision, multiplier or 1, rescore=rescore),
+                                         vector_lookup=lambda cid: chunk_map[cid].embedding)
+            index.rebuild(chunk_map)
+            stats = _measure(index, query_vectors, k, truth)
+            label = f"x{multiplier}" if rescore else "raw"
+            print(
+                f"{strategy:>9} {precision.value:<8}{label:<8} p50={stats['p50']:.2f}ms "
+                f"recall@{k}={stats['recall']:.3f} speedup={baseline['p50'] / stats['p50']:.1f}x "
+                f"scan MB={_scan_bytes(index) / 2**20:.1f}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--strategies", nargs="+", default=list(STRATEGIES), choices=list(STRATEGIES))
+    parser.add_argument("--vectors", type=int, default=5000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--multipliers", nargs="+", type=int, default=[2, 4])
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+    for name in args.strategies:
+        run(name, args.vectors, args.dim, args.multipliers, args.queries, args.k)
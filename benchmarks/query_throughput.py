@@ -0,0 +1,58 @@
+"""
+Measure /query throughput of a running server, e.g. to compare worker counts.
+
+Usage:
+    python -m app.serve --workers 4 &
+    python -m benchmarks.query_throughput --url http://127.0.0.1:8000 --library-id <id> --requests 500 --concurrency 16
+
+Queries are random vectors of the library's dimension sent from `concurrency` client
+threads. Run it against `--workers 1` and `--workers N` with the same data to see how
+throughput scales with reader processes.
+"""
+import argparse
+import random
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def run(url: str, library_id: str, dim: int, requests: int, concurrency: int, k: int):
+    rng = random.Random(0)
+    queries = [[rng.gauss(0, 1) for _ in range(dim)] for _ in range(requests)]
+    client = httpx.Client(base_url=url, timeout=60)
+
+    def timed(query):
+        start = time.perf_counter()
+        response = client.post("/query", json={"library_id": library_id, "query_vector": query, "k": k})
+        response.raise_for_status()
+        return (time.perf_counter() - start) * 1000
+
+    timed(queries[0])  # warm up: readers map the snapshot on first use
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(timed, queries))
+    wall = time.perf_counter() - start
+    print(
+        f"requests={requests} concurrency={concurrency} throughput={requests / wall:.1f} req/s "
+        f"p50={_percentile(latencies, 50):.1f}ms p95={_percentile(latencies, 95):.1f}ms "
+        f"mean={statistics.mean(latencies):.1f}ms"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--library-id", required=True)
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+    run(args.url, args.library_id, args.dim, args.requests, args.concurrency, args.k)
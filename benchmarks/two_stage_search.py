@@ -0,0 +1,82 @@
+"""
+Measure the speedup/recall tradeoff of two-stage search over reduced vectors.
+
+Usage:
+    python -m benchmarks.two_stage_search --vectors 5000 --dim 256 --reduced-dim 32 --multipliers 2 4 8
+
+Vectors are synthetic with per-dimension variance decaying along the coordinates, so most of
+the signal sits in the leading dimensions as with Matryoshka-style embeddings. Recall@k is
+measured against an exact linear scan over the full vectors.
+"""
+import argparse
+import math
+import random
+import statistics
+import time
+from typing import Dict, List
+
+from app.models.chunk_models import Chunk
+from app.utils.indexing.clustered_index import ClusteredIndex
+from app.utils.indexing.linear_index import LinearIndex
+from app.utils.indexing.reduction import create_reducer_by_type
+from app.utils.indexing.reduction_type import ReductionType
+
+STRATEGIES = {"linear": LinearIndex, "clustered": ClusteredIndex}
+
+
+def _make_vectors(count: int, dim: int, rng: random.Random) -> List[List[float]]:
+    scales = [math.exp(-j / (dim / 8)) for j in range(dim)]
+    return [[rng.gauss(0, s) for s in scales] for _ in range(count)]
+
+
+def _measure(index, queries: List[List[float]], k: int, truth: List[set]) -> Dict[str, float]:
+    latencies, recalls = [], []
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        hits = index.search(query, k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        recalls.append(len({cid for cid, _ in hits} & expected) / k)
+    return {"p50": statistics.median(latencies), "recall": statistics.mean(recalls)}
+
+
+def run(strategy: str, vectors: int, dim: int, reduced_dim: int, multipliers: List[int], queries: int, k: int):
+    rng = random.Random(42)
+    chunk_map = {
+        f"c{i}": Chunk(id=f"c{i}", text="", document_id="d", embedding=vec)
+        for i, vec in enumerate(_make_vectors(vectors, dim, rng))
+    }
+    query_vectors = _make_vectors(queries, dim, rng)
+
+    oracle = LinearIndex()
+    oracle.rebuild(chunk_map)
+    truth = [{cid for cid, _ in oracle.search(q, k)} for q in query_vectors]
+
+    baseline_index = STRATEGIES[strategy]()
+    baseline_index.rebuild(chunk_map)
+    baseline = _measure(baseline_index, query_vectors, k, truth)
+    print(f"{strategy:>9} full         p50={baseline['p50']:.2f}ms recall@{k}={baseline['recall']:.3f}")
+
+    for reduction in ReductionType:
+        for multiplier in multipliers:
+            index = STRATEGIES[strategy](reducer=create_reducer_by_type(reduction, reduced_dim),
+                                         candidate_multiplier=multiplier)
+            index.rebuild(chunk_map)
+            stats = _measure(index, query_vectors, k, truth)
+            print(
+                f"{strategy:>9} {reduction.value:<9}x{multiplier:<2} p50={stats['p50']:.2f}ms "
+                f"recall@{k}={stats['recall']:.3f} speedup={baseline['p50'] / stats['p50']:.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--strategies", nargs="+", default=list(STRATEGIES), choices=list(STRATEGIES))
+    parser.add_argument("--vectors", type=int, default=5000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--reduced-dim", type=int, default=32)
+    parser.add_argument("--multipliers", nargs="+", type=int, default=[2, 4, 8])
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+    for name in args.strategies:
+        run(name, args.vectors, args.dim, args.reduced_dim, args.multipliers, args.queries, args.k)
@@ -2,4 +2,32 @@ import sys
 from pathlib import Path
 
 # Add project root to sys.path
-sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
\ No newline at end of file
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import pytest
+from app.utils.embeddings import EmbeddingProvider, set_embedding_provider
+
+
+class FakeEmbeddingProvider(EmbeddingProvider):
+    """Deterministic offline provider: vectors depend only on the text length."""
+    name = "fake"
+
+    def __init__(self, dim: int = 4):
+        self._dim = dim
+        self.calls = 0
+
+    @property
+    def dimension(self) -> int:
+        return self._dim
+
+    def embed(self, texts):
+        self.calls += 1
+        return [[float(len(text))] + [1.0] * (self._dim - 1) for text in texts]
+
+
+@pytest.fixture
+def fake_provider():
+    provider = FakeEmbeddingProvider()
+    set_embedding_provider(provider)
+    yield provider
+    set_embedding_provider(None)
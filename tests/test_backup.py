@@ -0,0 +1,87 @@
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.core.backup import BackupReader, BackupFormatError, encode_backup
+from app.core.db import db
+from app.utils.indexing.clustered_index import ClusteredIndex
+from tests.test_jobs import CHUNK_METADATA
+
+client = TestClient(app)
+
+
+def _create_library(index_type="clustered"):
+    library_id = client.post("/libraries/", json={
+        "name": "Backup Library",
+        "metadata": {"created_by": "tester", "created_at": "2023-04-01T12:00:00Z", "use_case": "backup",
+                     "index_type": index_type, "dedupe": "link"}
+    }).json()["id"]
+    document_id = client.post(f"/libraries/{library_id}/documents/", json={
+        "title": "Backup Doc",
+        "metadata": {"category": "backup", "created_at": "2023-04-01T12:30:00Z", "source_type": "manual", "tags": []}
+    }).json()["id"]
+    for i in range(12):
+        client.post(f"/libraries/{library_id}/documents/{document_id}/chunks/",
+                    json={"text": "x" * (i + 1), "metadata": CHUNK_METADATA})
+    # Stored as a linked duplicate of the first chunk
+    client.post(f"/libraries/{library_id}/documents/{document_id}/chunks/", json={"text": "X", "metadata": CHUNK_METADATA})
+    return library_id, document_id
+
+
+def _state(library_id):
+    library = db.get_library(library_id)
+    results = db.get_indexing_service(library_id).search_chunks([5.0, 1.0, 1.0, 1.0], k=4)
+    return library.documents, {cid: chunk.model_dump() for cid, chunk in library.chunk_map.items()}, results
+
+
+def test_backup_round_trip(fake_provider, monkeypatch):
+    library_id, _ = _create_library()
+    before = _state(library_id)
+    assert any(chunk["duplicate_of"] for chunk in before[1].values())
+
+    backup = client.get("/backup/", params={"library_id": library_id})
+    assert backup.status_code == 200 and backup.content.startswith(b"VDBK")
+    client.delete(f"/libraries/{library_id}")
+
+    # The clustered index comes back from its saved layout instead of being rebuilt
+    def no_rebuild(self, chunk_map):
+        raise AssertionError("index was rebuilt")
+    monkeypatch.setattr(ClusteredIndex, "rebuild", no_rebuild)
+    restored = client.post("/backup/restore", content=backup.content)
+    assert restored.status_code == 200
+    assert restored.json()["libraries"] == [library_id] and restored.json()["chunks"] == 13
+    assert _state(library_id) == before
+
+    # Restoring over the existing library replaces it
+    assert client.post("/backup/restore", content=backup.content).status_code == 200
+    assert _state(library_id) == before
+
+
+def test_corrupt_or_truncated_backups_restore_nothing(fake_provider):
+    library_id, _ = _create_library("linear")
+    content = client.get("/backup/", params={"library_id": library_id}).content
+    client.delete(f"/libraries/{library_id}")
+
+    corrupt = bytearray(content)
+    corrupt[len(corrupt) // 2] ^= 0xFF
+    for broken in (bytes(corrupt), content[:-10], b"nonsense"):
+        response = client.post("/backup/restore", content=broken)
+        assert response.status_code == 400
+    assert db.get_library(library_id) is None
+
+    assert client.get("/backup/", params={"library_id": "missing"}).status_code == 404
+
+
+def test_backup_is_a_point_in_time_snapshot(fake_provider):
+    library_id, document_id = _create_library("linear")
+    stream = encode_backup(db, [library_id])
+    head = [next(stream) for _ in range(3)]  # magic, begin record, library record (snapshot taken)
+    client.post(f"/libraries/{library_id}/documents/{document_id}/chunks/", json={"text": "late", "metadata": CHUNK_METADATA})
+
+    reader = BackupReader()
+    for part in head + list(stream):
+        reader.feed(part)
+    reader.finish()
+    assert len(reader.libraries[0].library.chunk_map) == 13
+
+    with pytest.raises(BackupFormatError):
+        BackupReader().finish()
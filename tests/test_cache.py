@@ -0,0 +1,67 @@
+import time
+from fastapi.testclient import TestClient
+from app.main import app
+from app.core.cache import QueryCache
+from app.core.db import db
+
+client = TestClient(app)
+
+
+def test_cache_hit_miss_and_lru_eviction():
+    cache = QueryCache(max_entries=2, ttl_seconds=60)
+    k1 = cache.make_key("lib", 1, "fruit", 3, "euclidean")
+    k2 = cache.make_key("lib", 1, "car", 3, "euclidean")
+    k3 = cache.make_key("lib", 1, "physics", 3, "euclidean")
+
+    assert cache.get(k1) is None
+    cache.put(k1, ["a"])
+    cache.put(k2, ["b"])
+    assert cache.get(k1) == ["a"]  # k1 becomes most recently used
+
+    cache.put(k3, ["c"])  # evicts k2
+    assert cache.get(k2) is None
+    assert cache.get(k3) == ["c"]
+
+    stats = cache.stats()
+    assert stats["hits"] == 2
+    assert stats["misses"] == 2
+    assert stats["evictions"] == 1
+    assert stats["hit_rate"] == 0.5
+
+
+def test_cache_ttl_expiry():
+    cache = QueryCache(max_entries=10, ttl_seconds=0.01)
+    key = cache.make_key("lib", 1, "fruit", 3, "cosine")
+    cache.put(key, ["a"])
+    time.sleep(0.02)
+    assert cache.get(key) is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_library_version_bumps_on_mutation():
+    lib_resp = client.post("/libraries/", json={
+        "name": "Versioned Library",
+        "metadata": {
+            "created_by": "tester",
+            "created_at": "2023-04-01T12:00:00Z",
+            "use_case": "cache-testing",
+        }
+    })
+    library_id = lib_resp.json()["id"]
+    version = db.get_library_version(library_id)
+
+    client.post(f"/libraries/{library_id}/documents/", json={
+        "title": "Doc",
+        "metadata": {
+            "category": "cache",
+            "created_at": "2023-04-01T12:30:00Z",
+            "source_type": "manual",
+            "tags": []
+        }
+    })
+    assert db.get_library_version(library_id) > version
+
+    stats_resp = client.get("/query/cache/stats")
+    assert stats_resp.status_code == 200
+    assert "hit_rate" in stats_resp.json()
+    client.delete(f"/libraries/{library_id}")
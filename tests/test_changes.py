@@ -0,0 +1,111 @@
+import threading
+import time
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.core.changes import ChangeLog, Mutation
+from app.models.change_models import ChangeEntity, ChangeOp
+from tests.test_jobs import CHUNK_METADATA, _create_library_and_document
+
+client = TestClient(app)
+
+
+def _insert(chunk_id):
+    return Mutation(ChangeEntity.CHUNK, ChangeOp.INSERT, chunk_id, "doc")
+
+
+def test_change_log_is_bounded_and_survives_restart(tmp_path):
+    path = tmp_path / "changes.jsonl"
+    log = ChangeLog(path, max_entries=4)
+    for i in range(6):
+        log.record("lib" if i % 2 == 0 else "other", [_insert(f"c{i}")])
+
+    changes, next_since, has_more = log.read("lib", since=2, limit=10)
+    assert [c.entity_id for c in changes] == ["c2", "c4"]
+    assert (next_since, has_more) == (6, False)
+    # Seqs 1 and 2 left the ring, so resuming before them is refused
+    with pytest.raises(ValueError):
+        log.read("lib", since=1, limit=10)
+    with pytest.raises(ValueError):
+        log.read("lib", since=7, limit=10)
+
+    for i in range(6, 9):
+        log.record("lib", [_insert(f"c{i}")])  # crosses 2 * max_entries lines: compacts
+    assert len(path.read_text().splitlines()) <= 8
+
+    restarted = ChangeLog(path, max_entries=4)
+    assert restarted.last_seq == 9
+    assert restarted.record("lib", [_insert("c9")])[0].seq == 10
+    changes, _, _ = restarted.read("lib", since=6, limit=10)
+    assert [c.entity_id for c in changes] == ["c6", "c7", "c8", "c9"]
+
+
+def test_changes_lost_on_load_force_a_resync(tmp_path):
+    path = tmp_path / "changes.jsonl"
+    log = ChangeLog(path)
+    for i in range(6):
+        log.record("lib" if i % 2 == 0 else "other", [_insert(f"c{i}")])
+    lines = path.read_text().splitlines(keepends=True)
+    lines[2] = "{not json\n"  # seq 3 is unreadable and skipped on load
+    path.write_text("".join(lines))
+
+    restarted = ChangeLog(path)
+    assert restarted.last_seq == 6
+    changes, _, _ = restarted.read("lib", since=3, limit=10)
+    assert [c.seq for c in changes] == [5]
+    # Resuming before the gap would silently skip seq 3, whichever library it belonged to
+    for since in (0, 2):
+        with pytest.raises(ValueError, match="seq 3 is missing"):
+            restarted.read("other", since=since, limit=10)
+    assert restarted.wait("lib", since=3, timeout=0) and not restarted.wait("lib", since=5, timeout=0)
+
+
+def test_changes_endpoint_reports_mutations_in_order(fake_provider):
+    head = client.get("/libraries/unknown/changes").json()["next_since"]
+    library_id, document_id = _create_library_and_document()
+    chunks_url = f"/libraries/{library_id}/documents/{document_id}/chunks"
+    first = client.post(f"{chunks_url}/", json={"text": "first", "metadata": CHUNK_METADATA}).json()
+    second = client.post(f"{chunks_url}/", json={"text": "second", "metadata": CHUNK_METADATA}).json()
+    client.put(f"{chunks_url}/{first['id']}", json={"text": "first, edited", "metadata": CHUNK_METADATA})
+    client.delete(f"{chunks_url}/{second['id']}")
+
+    feed = client.get(f"/libraries/{library_id}/changes", params={"since": head}).json()
+    assert [(c["entity"], c["op"]) for c in feed["changes"]] == [
+        ("library", "insert"), ("document", "insert"), ("chunk", "insert"),
+        ("chunk", "insert"), ("chunk", "update"), ("chunk", "delete"),
+    ]
+    seqs = [c["seq"] for c in feed["changes"]]
+    assert seqs == sorted(seqs) and not feed["has_more"]
+    # Events carry the current state, without embeddings unless asked for
+    assert feed["changes"][2]["data"]["text"] == "first, edited"
+    assert "embedding" not in feed["changes"][2]["data"]
+    assert feed["changes"][5]["data"] is None
+
+    page = client.get(f"/libraries/{library_id}/changes", params={"since": head, "limit": 4}).json()
+    assert page["has_more"] and page["next_since"] == seqs[3]
+    rest = client.get(f"/libraries/{library_id}/changes", params={"since": page["next_since"]}).json()
+    assert [c["seq"] for c in rest["changes"]] == seqs[4:]
+
+    with_embeddings = client.get(f"/libraries/{library_id}/changes",
+                                 params={"since": seqs[1], "limit": 1, "include_embedding": True}).json()
+    assert with_embeddings["changes"][0]["data"]["embedding"]
+
+    assert client.get(f"/libraries/{library_id}/changes", params={"since": 10 ** 9}).status_code == 410
+
+
+def test_changes_long_poll_returns_when_a_change_arrives(fake_provider):
+    library_id, document_id = _create_library_and_document()
+    since = client.get(f"/libraries/{library_id}/changes").json()["next_since"]
+
+    def add_later():
+        time.sleep(0.2)
+        client.post(f"/libraries/{library_id}/documents/{document_id}/chunks/",
+                    json={"text": "late", "metadata": CHUNK_METADATA})
+
+    writer = threading.Thread(target=add_later)
+    writer.start()
+    start = time.monotonic()
+    feed = client.get(f"/libraries/{library_id}/changes", params={"since": since, "wait_ms": 5000}).json()
+    writer.join()
+    assert time.monotonic() - start < 5
+    assert [(c["entity"], c["op"]) for c in feed["changes"]] == [("chunk", "insert")]
@@ -0,0 +1,93 @@
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.core.db import db
+from app.core.jobs import INGEST_BATCH_SIZE
+from app.utils.chunking import ChunkingStrategy, TextChunker, chunk_text
+from tests.test_jobs import _create_library_and_document
+
+client = TestClient(app)
+
+TEXT = ("One two three. Four five six seven! Eight nine.\n\n"
+        "Ten eleven twelve thirteen fourteen fifteen sixteen seventeen. End.")
+
+
+def _pieces(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+@pytest.mark.parametrize("strategy", list(ChunkingStrategy))
+def test_chunks_do_not_depend_on_how_the_text_arrives(strategy):
+    whole = list(chunk_text([TEXT], strategy, chunk_size=5, overlap=1))
+    for size in (1, 3, 7):
+        assert list(chunk_text(_pieces(TEXT, size), strategy, chunk_size=5, overlap=1)) == whole
+
+
+def test_chunking_strategies():
+    assert list(chunk_text([TEXT], ChunkingStrategy.TOKENS, chunk_size=6, overlap=2)) == [
+        "One two three. Four five six",
+        "five six seven! Eight nine. Ten",
+        "nine. Ten eleven twelve thirteen fourteen",
+        "thirteen fourteen fifteen sixteen seventeen. End.",
+    ]
+    assert list(chunk_text([TEXT], ChunkingStrategy.SENTENCES, chunk_size=8)) == [
+        "One two three. Four five six seven!",
+        "Eight nine.",
+        "Ten eleven twelve thirteen fourteen fifteen sixteen seventeen.",
+        "End.",
+    ]
+    assert list(chunk_text([TEXT], ChunkingStrategy.PARAGRAPHS, chunk_size=9)) == [
+        "One two three. Four five six seven! Eight nine.",
+        "Ten eleven twelve thirteen fourteen fifteen sixteen seventeen. End.",
+    ]
+    # A paragraph longer than chunk_size falls back to fixed windows
+    assert list(chunk_text([TEXT], ChunkingStrategy.PARAGRAPHS, chunk_size=8))[:2] == [
+        "One two three. Four five six seven! Eight",
+        "nine.",
+    ]
+
+
+def test_chunker_buffer_stays_bounded_without_boundaries():
+    chunker = TextChunker(ChunkingStrategy.PARAGRAPHS, chunk_size=10)
+    produced = 0
+    for _ in range(2000):
+        produced += len(chunker.feed("word " * 5))
+        assert len(chunker._tail) <= 10 * 32 + 25 and len(chunker._words) <= 10
+    produced += len(chunker.finish())
+    assert produced == 1000
+
+
+def test_upload_streams_a_document_into_chunks(fake_provider):
+    library_id, _ = _create_library_and_document()
+    sentences = [f"Sentence number {i} is here." for i in range(2 * INGEST_BATCH_SIZE + 5)]
+
+    def body():
+        for sentence in sentences:
+            yield (sentence + " ").encode()
+
+    response = client.post(f"/libraries/{library_id}/documents/upload",
+                           params={"title": "Streamed", "strategy": "sentences", "chunk_size": 5},
+                           content=body(), headers={"Content-Type": "text/plain"})
+    assert response.status_code == 200
+    document = response.json()
+    assert document["title"] == "Streamed"
+    assert len(document["chunk_ids"]) == len(sentences)
+    library = db.get_library(library_id)
+    assert [library.chunk_map[chunk_id].text for chunk_id in document["chunk_ids"]] == sentences
+    assert library.chunk_map[document["chunk_ids"][0]].metadata.source == "Streamed"
+    assert fake_provider.calls == 3  # one provider call per batch
+
+    query = client.post("/query", json={"library_id": library_id, "k": 1, "query_text": sentences[0]})
+    assert query.status_code == 200 and query.json()
+
+
+def test_upload_rejects_invalid_text_without_leaving_a_document(fake_provider):
+    library_id, _ = _create_library_and_document()
+    before = set(db.get_library(library_id).documents)
+
+    response = client.post(f"/libraries/{library_id}/documents/upload", params={"title": "Broken"},
+                           content=b"valid words \xff\xfe")
+    assert response.status_code == 400
+    assert set(db.get_library(library_id).documents) == before
+    assert client.post(f"/libraries/{library_id}/documents/upload",
+                       params={"title": "x", "chunk_size": 4, "overlap": 4}, content=b"a").status_code == 400
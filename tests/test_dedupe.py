@@ -0,0 +1,125 @@
+import json
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.core.db import db
+from app.core.jobs import JobManager, job_manager
+from app.models.job_models import IngestionJob, JobStatus
+from app.utils.dedupe import DuplicateIndex
+from tests.test_jobs import CHUNK_METADATA, _wait_for
+
+client = TestClient(app)
+
+FOOTER = (
+    "Copyright 2024 Example Corp. All rights reserved. This document contains confidential information "
+    "intended only for the named recipient. If you received it by mistake, notify the sender immediately "
+    "and delete every copy, including printed ones, without reading, forwarding or distributing it further."
+)
+
+
+def _create_library(policy, threshold=0.7):
+    library_id = client.post("/libraries/", json={
+        "name": "Dedupe Library",
+        "metadata": {"created_by": "tester", "created_at": "2023-04-01T12:00:00Z", "use_case": "dedupe",
+                     "dedupe": policy, "near_duplicate_threshold": threshold}
+    }).json()["id"]
+    document_id = client.post(f"/libraries/{library_id}/documents/", json={
+        "title": "Report",
+        "metadata": {"category": "report", "created_at": "2023-04-01T12:30:00Z", "source_type": "manual", "tags": []}
+    }).json()["id"]
+    return library_id, document_id
+
+
+def _add(library_id, document_id, text):
+    return client.post(f"/libraries/{library_id}/documents/{document_id}/chunks/",
+                       json={"text": text, "metadata": CHUNK_METADATA})
+
+
+def test_duplicate_index_matches_exact_and_near_duplicates():
+    index = DuplicateIndex(threshold=0.7)
+    index.add("footer", FOOTER)
+    index.add("other", "sourdough starters need feeding twice a day during the warm summer months")
+
+    assert index.find("  " + FOOTER.upper()) == ("footer", True)
+    assert index.find(FOOTER.replace("2024", "2025")) == ("footer", False)
+    assert index.find("a completely different paragraph about tax filing deadlines") is None
+
+    index.link("copy", "footer")
+    assert index.remove("footer") == {"copy"}
+    assert index.find(FOOTER) is None
+
+
+def test_link_policy_shares_the_vector_slot(fake_provider):
+    library_id, document_id = _create_library("link")
+    original = _add(library_id, document_id, FOOTER).json()
+    calls = fake_provider.calls
+
+    copy = _add(library_id, document_id, FOOTER.replace("2024", "2025")).json()
+    assert fake_provider.calls == calls  # the stored embedding was reused
+    assert copy["duplicate_of"] == original["id"]
+    assert copy["embedding"] == original["embedding"]
+
+    hits = client.post("/query", json={"library_id": library_id, "query_vector": original["embedding"], "k": 5}).json()
+    assert [h["chunk_id"] for h in hits] == [original["id"]]
+
+    # Deleting the canonical chunk hands its vector slot to the linked copy
+    client.delete(f"/libraries/{library_id}/documents/{document_id}/chunks/{original['id']}")
+    hits = client.post("/query", json={"library_id": library_id, "query_vector": original["embedding"], "k": 5}).json()
+    assert [h["chunk_id"] for h in hits] == [copy["id"]]
+    assert db.get_library(library_id).chunk_map[copy["id"]].duplicate_of is None
+    client.delete(f"/libraries/{library_id}")
+
+
+def test_skip_policy_returns_stored_chunk(fake_provider):
+    library_id, document_id = _create_library("skip", threshold=None)
+    original = _add(library_id, document_id, FOOTER).json()
+
+    resp = _add(library_id, document_id, FOOTER.lower())
+    assert resp.headers["X-Duplicate-Of"] == original["id"]
+    assert resp.json()["id"] == original["id"]
+    # Exact matching only: a near duplicate is stored
+    assert _add(library_id, document_id, FOOTER.replace("2024", "2025")).json()["id"] != original["id"]
+    assert len(db.get_library(library_id).chunk_map) == 2
+    client.delete(f"/libraries/{library_id}")
+
+
+def test_ingestion_job_skips_duplicates_within_and_across_batches(fake_provider):
+    library_id, document_id = _create_library("skip")
+    _add(library_id, document_id, FOOTER)
+    texts = [f"section {i} body text" for i in range(3)] + [FOOTER, "section 0 body text"]
+
+    resp = client.post(f"/libraries/{library_id}/documents/{document_id}/ingest",
+                       json={"chunks": [{"text": t, "metadata": CHUNK_METADATA} for t in texts]})
+    job = _wait_for(job_manager, resp.json()["id"])
+    assert job.status == "completed"
+    assert job.duplicates == 2
+    assert sorted(c.text for c in db.get_library(library_id).chunk_map.values()) == sorted(texts[:4])
+    client.delete(f"/libraries/{library_id}")
+
+
+@pytest.mark.parametrize("policy", ["skip", "link", "keep"])
+def test_replayed_batch_does_not_count_duplicates_again(fake_provider, tmp_path, policy):
+    library_id, document_id = _create_library(policy)
+    _add(library_id, document_id, FOOTER)
+    texts = ["section 0 body text", FOOTER, "section 1 body text", "section 0 body text"]
+    job = IngestionJob(library_id=library_id, document_id=document_id, status=JobStatus.RUNNING,
+                       total=len(texts), created_at="2023-04-01T12:45:00Z")
+    (tmp_path / "inputs").mkdir()
+
+    def run_from_start():
+        # The batch is committed but the process dies before its cursor is checkpointed
+        (tmp_path / f"{job.id}.json").write_text(json.dumps(job.model_dump(exclude={"progress"})))
+        (tmp_path / "inputs" / f"{job.id}.json").write_text(
+            json.dumps([{"text": t, "metadata": CHUNK_METADATA} for t in texts]))
+        manager = JobManager(jobs_dir=tmp_path, batch_size=len(texts))
+        manager.resume_pending()
+        return _wait_for(manager, job.id)
+
+    first = run_from_start()
+    stored, calls = len(db.get_library(library_id).chunk_map), fake_provider.calls
+    replayed = run_from_start()
+    assert first.status == replayed.status == JobStatus.COMPLETED
+    assert first.duplicates == replayed.duplicates == 2
+    assert len(db.get_library(library_id).chunk_map) == stored
+    assert fake_provider.calls == calls  # committed inputs are not embedded again
+    client.delete(f"/libraries/{library_id}")
@@ -0,0 +1,237 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.utils.embeddings import get_embedding, get_embeddings, set_embedding_provider
+from app.utils.embeddings.local_provider import LocalEmbeddingProvider
+from app.utils.embeddings.batching import DynamicBatcher
+from conftest import FakeEmbeddingProvider
+
+client = TestClient(app)
+
+
+def test_dynamic_batcher_merges_concurrent_requests():
+    batch_sizes = []
+    release = threading.Event()
+
+    def encode(texts):
+        release.wait(1)
+        batch_sizes.append(len(texts))
+        return [[float(len(t))] for t in texts]
+
+    batcher = DynamicBatcher(encode, max_batch_size=16, max_wait_ms=50)
+    results = {}
+
+    def worker(i):
+        results[i] = batcher.submit(["x" * i])
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(1, 6)]
+    for t in threads:
+        t.start()
+    release.set()
+    for t in threads:
+        t.join()
+
+    assert results == {i: [[float(i)]] for i in range(1, 6)}
+    assert sum(batch_sizes) == 5
+    assert len(batch_sizes) < 5
+
+
+def test_chunk_dimension_is_validated_against_library(fake_provider):
+    library_id = client.post("/libraries/", json={
+        "name": "Dim Library",
+        "metadata": {"created_by": "tester", "created_at": "2023-04-01T12:00:00Z", "use_case": "embeddings"}
+    }).json()["id"]
+    document_id = client.post(f"/libraries/{library_id}/documents/", json={
+        "title": "Doc",
+        "metadata": {"category": "c", "created_at": "2023-04-01T12:30:00Z", "source_type": "manual", "tags": []}
+    }).json()["id"]
+    chunk = {"text": "hello", "metadata": {"source": "s", "created_at": "now", "author": "a", "language": "en"}}
+
+    assert client.post(f"/libraries/{library_id}/documents/{document_id}/chunks/", json=chunk).status_code == 200
+
+    # A provider of another dimension is rejected before any text is sent to it, on add and on query
+    switched = FakeEmbeddingProvider(dim=8)
+    set_embedding_provider(switched)
+    resp = client.post(f"/libraries/{library_id}/documents/{document_id}/chunks/", json=chunk)
+    assert resp.status_code == 400
+    assert resp.json()["detail"] == "Embedding provider 'fake' dimension 8 does not match library dimension 4"
+    resp = client.post("/query", json={"library_id": library_id, "query_text": "hello", "k": 1})
+    assert resp.status_code == 400
+    resp = client.post(f"/libraries/{library_id}/documents/{document_id}/ingest", json={"chunks": [chunk]})
+    assert resp.status_code == 400
+    assert switched.calls == 0
+    client.delete(f"/libraries/{library_id}")
+
+
+def test_provider_vectors_are_checked_against_its_dimension():
+    class MisreportingProvider(FakeEmbeddingProvider):
+        @property
+        def dimension(self) -> int:
+            return 3
+
+    set_embedding_provider(MisreportingProvider(dim=4))
+    try:
+        with pytest.raises(RuntimeError, match="returned a 4-dimensional vector, expected 3"):
+            get_embeddings(["hello"])
+    finally:
+        set_embedding_provider(None)
+
+
+def test_dynamic_batcher_encodes_identical_in_flight_texts_once():
+    encoded = []
+    started, release = threading.Event(), threading.Event()
+
+    def encode(texts):
+        started.set()
+        release.wait(1)
+        encoded.extend(texts)
+        return [[float(len(t))] for t in texts]
+
+    batcher = DynamicBatcher(encode, max_batch_size=16, max_wait_ms=0)
+    results = []
+    threads = [threading.Thread(target=lambda texts: results.append(batcher.submit(texts)), args=(["same", "other" * (i % 2)],))
+               for i in range(6)]
+    threads[0].start()
+    started.wait(1)  # "same" is now being encoded; later requests for it join that call
+    for t in threads[1:]:
+        t.start()
+    time.sleep(0.05)
+    release.set()
+    for t in threads:
+        t.join()
+
+    assert sorted(results) == [[[4.0], [0.0]]] * 3 + [[[4.0], [5.0]]] * 3
+    assert encoded.count("same") == 1 and encoded.count("other") == 1
+    assert batcher.stats()["deduplicated_texts"] == 12 - len(encoded)
+
+
+def test_dynamic_batcher_only_waits_under_load():
+    batcher = DynamicBatcher(lambda texts: [[1.0] for _ in texts], max_batch_size=16, max_wait_ms=200)
+    start = time.monotonic()
+    batcher.submit(["a"])
+    time.sleep(0.25)
+    batcher.submit(["b"])
+    assert time.monotonic() - start < 0.4  # idle requests are flushed right away
+    assert batcher.window() == 0
+
+    threads = [threading.Thread(target=batcher.submit, args=([f"c{i}"],)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert batcher.window() == 0.2
+    assert batcher.stats()["batches"] < 10
+
+
+def test_concurrent_queries_share_provider_calls(fake_provider):
+    library_id = client.post("/libraries/", json={
+        "name": "Batched Library",
+        "metadata": {"created_by": "tester", "created_at": "2023-04-01T12:00:00Z", "use_case": "embeddings"}
+    }).json()["id"]
+    texts = []
+    embed = fake_provider.embed
+
+    def slow_embed(batch):
+        time.sleep(0.05)
+        texts.append(batch)
+        return embed(batch)
+
+    fake_provider.embed = slow_embed
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        responses = list(pool.map(
+            lambda i: client.post("/query", json={"library_id": library_id, "query_text": f"query {i}"}),
+            range(16)
+        ))
+    assert all(response.status_code == 200 for response in responses)
+    assert sum(len(batch) for batch in texts) == 16 and len(texts) < 16
+    stats = client.get("/stats/embeddings").json()
+    assert stats["requested_texts"] >= 16 and stats["batches"] >= len(texts)
+    client.delete(f"/libraries/{library_id}")
+
+
+def test_dynamic_batcher_does_not_lower_throughput():
+    # A provider whose calls take the same time whatever their size, e.g. a remote API
+    running, peak = [0], [0]
+    lock = threading.Lock()
+
+    def encode(texts):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.02)
+        with lock:
+            running[0] -= 1
+        return [[1.0] for _ in texts]
+
+    def elapsed(embed):
+        # Best of a few runs, so a stall caused by other threads in the test process does not count
+        timings = []
+        for run in range(3):
+            start = time.monotonic()
+            with ThreadPoolExecutor(max_workers=16) as pool:
+                list(pool.map(lambda i: [embed([f"text {run} {i} {n}"]) for n in range(5)], range(16)))
+            timings.append(time.monotonic() - start)
+        return min(timings)
+
+    direct = elapsed(encode)
+    # Small batches force several calls at once; they must not queue behind each other
+    batcher = DynamicBatcher(encode, max_batch_size=2, max_wait_ms=1, max_in_flight=64)
+    peak[0] = 0
+    batched = elapsed(batcher.submit)
+    assert peak[0] >= 8
+    assert batched < direct * 1.25
+    assert batcher.stats()["batches"] < 3 * 16 * 5
+
+
+def test_bulk_embeddings_share_in_flight_provider_calls(fake_provider):
+    batches = []
+    started, release = threading.Event(), threading.Event()
+    embed = fake_provider.embed
+
+    def slow_embed(texts):
+        batches.append(list(texts))
+        started.set()
+        release.wait(1)
+        return embed(texts)
+
+    fake_provider.embed = slow_embed
+    single = ThreadPoolExecutor(max_workers=1).submit(get_embedding, "shared")
+    assert started.wait(1)
+    bulk = ThreadPoolExecutor(max_workers=1).submit(get_embeddings, ["shared", "bulk", "bulk"])
+    time.sleep(0.05)
+    release.set()
+
+    assert single.result(1) == [6.0, 1.0, 1.0, 1.0]
+    assert bulk.result(1) == [[6.0, 1.0, 1.0, 1.0], [4.0, 1.0, 1.0, 1.0], [4.0, 1.0, 1.0, 1.0]]
+    # The bulk call joined the single text's flight and sent only its new text, once
+    assert sorted(text for batch in batches for text in batch) == ["bulk", "shared"]
+
+
+def test_local_provider_embeds_each_dispatcher_batch_in_one_pass(monkeypatch):
+    class Model:
+        def __init__(self):
+            self.passes = []
+
+        def get_sentence_embedding_dimension(self):
+            return 2
+
+        def encode(self, texts, batch_size, normalize_embeddings, convert_to_numpy):
+            self.passes.append((list(texts), batch_size, threading.current_thread()))
+            return np.array([[float(len(text)), 1.0] for text in texts])
+
+    model = Model()
+    monkeypatch.setattr(LocalEmbeddingProvider, "_load_model", staticmethod(lambda path: model))
+    provider = LocalEmbeddingProvider(model_path="model")
+    set_embedding_provider(provider)
+    try:
+        assert provider.embed(["a", "bb"]) == [[1.0, 1.0], [2.0, 1.0]]
+        # Called directly, the provider encodes on the caller's thread: there is no second queue
+        assert model.passes == [(["a", "bb"], 2, threading.current_thread())]
+        assert get_embeddings(["ccc", "dddd"]) == [[3.0, 1.0], [4.0, 1.0]]
+        assert model.passes[1][:2] == (["ccc", "dddd"], 2)
+    finally:
+        set_embedding_provider(None)
@@ -0,0 +1,100 @@
+import time
+from fastapi.testclient import TestClient
+from app.main import app
+from app.core.db import db
+from app.models.chunk_models import Chunk
+from app.utils.indexing.index_type import IndexType
+from app.utils.indexing.indexing_service import IndexingService
+from app.utils.indexing.linear_index import LinearIndex
+from app.utils.indexing.clustered_index import ClusteredIndex
+
+client = TestClient(app)
+
+
+def _chunk(chunk_id, vector):
+    return Chunk(id=chunk_id, text=chunk_id, document_id="doc", embedding=vector)
+
+
+def test_writes_during_build_are_replayed_before_swap():
+    chunk_map = {f"c{i}": _chunk(f"c{i}", [float(i), 0.0]) for i in range(5)}
+    service = IndexingService(LinearIndex(), index_type=IndexType.LINEAR)
+    service.rebuild_index(chunk_map)
+
+    service.begin_migration(IndexType.CLUSTERED)
+    snapshot = dict(chunk_map)
+    new_strategy = ClusteredIndex(num_clusters=2)
+    new_strategy.rebuild(snapshot)
+
+    # Writes that land while the new index is being built
+    chunk_map["c9"] = _chunk("c9", [9.0, 0.0])
+    service.add_chunk(chunk_map["c9"])
+    del chunk_map["c0"]
+    service.remove_chunk("c0")
+    assert isinstance(service.strategy, LinearIndex)
+
+    service.complete_migration(new_strategy, chunk_map)
+    assert service.strategy is new_strategy
+    assert service.index_type == IndexType.CLUSTERED
+    ids = [cid for cid, _ in service.search_chunks([9.0, 0.0], k=10)]
+    assert sorted(ids) == ["c1", "c2", "c3", "c4", "c9"]
+
+
+def test_update_library_index_type_migrates_online():
+    metadata = {"created_by": "tester", "created_at": "2023-04-01T12:00:00Z", "use_case": "migration", "index_type": "linear"}
+    library_id = client.post("/libraries/", json={"name": "Migrating", "metadata": metadata}).json()["id"]
+
+    resp = client.put(f"/libraries/{library_id}", json={"name": "Migrating", "metadata": {**metadata, "index_type": "kdtree"}})
+    assert resp.status_code == 200
+
+    deadline = time.monotonic() + 5
+    while client.get(f"/libraries/{library_id}/index").json()["index_type"] != "kdtree":
+        assert time.monotonic() < deadline, "migration did not complete"
+        time.sleep(0.01)
+    assert client.get(f"/libraries/{library_id}/index").json()["migrating_to"] is None
+    client.delete(f"/libraries/{library_id}")
+
+
+def test_changing_storage_precision_rebuilds_the_index(fake_provider):
+    metadata = {"created_by": "tester", "created_at": "2023-04-01T12:00:00Z", "use_case": "migration", "index_type": "clustered"}
+    assert client.post("/libraries/", json={
+        "name": "Quantized", "metadata": {**metadata, "index_type": "kdtree", "precision": "int8"}
+    }).status_code == 422
+    library_id = client.post("/libraries/", json={"name": "Quantized", "metadata": metadata}).json()["id"]
+    assert db.get_indexing_service(library_id).strategy.quantization is None
+
+    resp = client.put(f"/libraries/{library_id}", json={"name": "Quantized", "metadata": {**metadata, "precision": "float16"}})
+    assert resp.status_code == 200 and resp.json()["metadata"]["precision"] == "float16"
+    deadline = time.monotonic() + 5
+    while db.get_indexing_service(library_id).strategy.quantization is None:
+        assert time.monotonic() < deadline, "index was not rebuilt"
+        time.sleep(0.01)
+
+    # The quantized index reads full vectors from the stored chunks and reports its own rows
+    document_id = client.post(f"/libraries/{library_id}/documents/", json={
+        "title": "Doc", "metadata": {"category": "c", "created_at": "2023-04-01T12:30:00Z", "source_type": "manual", "tags": []}
+    }).json()["id"]
+    before = db.memory_stats()["quantized_bytes"]
+    chunk = {"text": "hello", "metadata": {"source": "s", "created_at": "now", "author": "a", "language": "en"}}
+    assert client.post(f"/libraries/{library_id}/documents/{document_id}/chunks/", json=chunk).status_code == 200
+    strategy = db.get_indexing_service(library_id).strategy
+    assert all(vector is None for cluster in strategy.clusters for vector in cluster.values())
+    assert db.memory_stats()["quantized_bytes"] == before + strategy.quantized_bytes() > before
+    resp = client.post("/query", json={"library_id": library_id, "query_text": "hello", "k": 1})
+    assert [hit["text"] for hit in resp.json()] == ["hello"]
+    client.delete(f"/libraries/{library_id}")
+
+
+def test_conflicting_migration_leaves_the_library_unchanged():
+    metadata = {"created_by": "tester", "created_at": "2023-04-01T12:00:00Z", "use_case": "migration", "index_type": "linear"}
+    library_id = client.post("/libraries/", json={"name": "Busy", "metadata": metadata}).json()["id"]
+    indexing_service = db.get_indexing_service(library_id)
+    indexing_service.begin_migration(IndexType.CLUSTERED)  # a migration still being built
+    try:
+        resp = client.put(f"/libraries/{library_id}", json={"name": "Renamed", "metadata": {**metadata, "index_type": "kdtree"}})
+        assert resp.status_code == 409
+        library = client.get(f"/libraries/{library_id}").json()
+        assert library["name"] == "Busy" and library["metadata"]["index_type"] == "linear"
+        assert indexing_service.migrating_to == IndexType.CLUSTERED
+    finally:
+        indexing_service.abort_migration()
+    client.delete(f"/libraries/{library_id}")
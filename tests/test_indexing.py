@@ -0,0 +1,348 @@
+import random
+import time
+import numpy as np
+import pytest
+from app.models.chunk_models import Chunk
+from app.utils.indexing.linear_index import LinearIndex
+from app.utils.indexing.kdtree_index import KDTreeIndex
+from app.utils.indexing.clustered_index import ClusteredIndex
+from app.utils.indexing.lsh_index import LSHIndex, _unpacked_popcount, popcount
+from app.utils.indexing.mapped_index import MappedIndex
+from app.utils.indexing.precision_type import Precision
+from app.utils.indexing.quantization import Quantization
+from app.utils.indexing.reduction import create_reducer_by_type
+from app.utils.indexing.reduction_type import ReductionType
+from app.utils.indexing.search import SearchBudget
+from app.utils.similarity import cosine_distance, euclidean_distance
+
+STRATEGIES = [LinearIndex, KDTreeIndex, ClusteredIndex]
+
+
+@pytest.fixture
+def chunk_map():
+    rng = random.Random(7)
+    return {
+        f"c{i}": Chunk(id=f"c{i}", text=f"t{i}", document_id=f"d{i % 5}", embedding=[rng.uniform(-1, 1) for _ in range(3)])
+        for i in range(200)
+    }
+
+
+def _brute_force(chunk_map, query, k):
+    dists = sorted((euclidean_distance(query, c.embedding), cid) for cid, c in chunk_map.items())
+    return [cid for _, cid in dists[:k]]
+
+
+@pytest.mark.parametrize("strategy_cls", [LinearIndex, KDTreeIndex])
+def test_exact_strategies_match_brute_force(strategy_cls, chunk_map):
+    index = strategy_cls()
+    index.rebuild(chunk_map)
+    query = [0.1, -0.2, 0.3]
+    assert [cid for cid, _ in index.search(query, 10)] == _brute_force(chunk_map, query, 10)
+
+
+@pytest.mark.parametrize("strategy_cls", STRATEGIES)
+def test_candidate_budget_returns_best_so_far(strategy_cls, chunk_map):
+    index = strategy_cls()
+    index.rebuild(chunk_map)
+
+    budget = SearchBudget(max_candidates=20)
+    results = index.search([0.0, 0.0, 0.0], 5, budget=budget)
+    assert budget.exhausted
+    assert budget.candidates == 20
+    assert len(results) == 5
+    assert [d for _, d in results] == sorted(d for _, d in results)
+
+    unlimited = SearchBudget(max_candidates=10_000)
+    index.search([0.0, 0.0, 0.0], 5, budget=unlimited)
+    assert not unlimited.exhausted
+
+
+@pytest.mark.parametrize("strategy_cls", STRATEGIES)
+def test_expired_deadline_stops_search(strategy_cls, chunk_map):
+    index = strategy_cls()
+    index.rebuild(chunk_map)
+    budget = SearchBudget(deadline_ms=1)
+    time.sleep(0.005)
+    assert index.search([0.0, 0.0, 0.0], 5, budget=budget) == []
+    assert budget.exhausted
+
+
+@pytest.mark.parametrize("strategy_cls", STRATEGIES)
+def test_range_search_is_exact_for_euclidean(strategy_cls, chunk_map):
+    index = strategy_cls()
+    index.rebuild(chunk_map)
+    query = [0.2, 0.1, -0.3]
+    radius = 0.5
+    expected = sorted(
+        (euclidean_distance(query, c.embedding), cid) for cid, c in chunk_map.items()
+        if euclidean_distance(query, c.embedding) <= radius
+    )
+
+    results = index.search(query, None, max_distance=radius)
+    assert [cid for cid, _ in results] == [cid for _, cid in expected]
+
+    capped = index.search(query, 3, max_distance=radius)
+    assert [cid for cid, _ in capped] == [cid for _, cid in expected[:3]]
+
+
+def test_cosine_range_uses_similarity_threshold(chunk_map):
+    from app.utils.similarity import cosine_distance, cosine_similarity
+    index = LinearIndex(distance_fn=cosine_distance)
+    index.rebuild(chunk_map)
+    query = [1.0, 0.0, 0.0]
+
+    results = index.search(query, None, max_distance=1 - 0.9)
+    assert results
+    assert all(cosine_similarity(query, chunk_map[cid].embedding) >= 0.9 - 1e-9 for cid, _ in results)
+    assert len(results) == sum(cosine_similarity(query, c.embedding) >= 0.9 for c in chunk_map.values())
+
+
+def test_kdtree_cosine_range_query_does_not_prune_on_split_planes():
+    # [10, 0.1] is beyond the root's split plane yet almost parallel to the query
+    index = KDTreeIndex(distance_fn=cosine_distance)
+    for cid, vector in [("root", [1.0, 0.0]), ("up", [0.0, 1.0]), ("far", [10.0, 0.1])]:
+        index.add_vector(vector, cid)
+
+    results = index.search([0.5, 0.0], None, max_distance=0.05)
+    assert sorted(cid for cid, _ in results) == ["far", "root"]
+
+
+@pytest.mark.parametrize("strategy_cls", [LinearIndex, KDTreeIndex])
+def test_grouped_search_returns_distinct_documents(strategy_cls, chunk_map):
+    index = strategy_cls()
+    index.rebuild(chunk_map)
+    query = [0.3, 0.3, -0.1]
+    by_document = {}
+    for _, cid in sorted((euclidean_distance(query, c.embedding), cid) for cid, c in chunk_map.items()):
+        by_document.setdefault(chunk_map[cid].document_id, []).append(cid)
+    expected = [cid for hits in list(by_document.values())[:3] for cid in hits[:2]]
+
+    results = index.search(query, 3, group_fn=lambda cid: chunk_map[cid].document_id, group_limit=2)
+    assert [cid for cid, _ in results] == expected
+
+
+@pytest.fixture
+def low_rank_vectors():
+    # 32-dim vectors that mostly vary along 4 directions, the case PCA reduction is meant for
+    rng = random.Random(11)
+    basis = [[rng.gauss(0, 1) for _ in range(32)] for _ in range(4)]
+    vectors = {}
+    for i in range(300):
+        weights = [rng.gauss(0, 1) for _ in basis]
+        vectors[f"c{i}"] = [sum(w * b[j] for w, b in zip(weights, basis)) + rng.gauss(0, 0.05) for j in range(32)]
+    return vectors
+
+
+@pytest.mark.parametrize("strategy_cls", [LinearIndex, ClusteredIndex])
+@pytest.mark.parametrize("reduction", [ReductionType.PCA, ReductionType.TRUNCATE])
+def test_two_stage_search_reranks_with_full_vectors(strategy_cls, reduction, low_rank_vectors):
+    exact = strategy_cls()
+    reduced = strategy_cls(reducer=create_reducer_by_type(reduction, 8), candidate_multiplier=4)
+    chunk_map = {cid: Chunk(id=cid, text=cid, document_id="d", embedding=vec) for cid, vec in low_rank_vectors.items()}
+    exact.rebuild(chunk_map)
+    reduced.rebuild(chunk_map)
+
+    query = low_rank_vectors["c0"]
+    results = reduced.search(query, 10)
+    expected = exact.search(query, 10)
+    # Distances are always exact; only the candidate set comes from the reduced scan
+    assert all(d == pytest.approx(euclidean_distance(query, low_rank_vectors[cid])) for cid, d in results)
+    assert results[0][0] == "c0"
+    if reduction == ReductionType.PCA:
+        assert len({cid for cid, _ in results} & {cid for cid, _ in expected}) >= 9
+
+
+@pytest.fixture
+def crowded_documents():
+    # Document A has 39 chunks next to the query; B and C one chunk each, farther away
+    rng = random.Random(5)
+    query = [1.0] * 16
+    vectors = {f"a{i}": [x + rng.gauss(0, 0.01) for x in query] for i in range(39)}
+    vectors["b0"] = [x + 1.0 for x in query]
+    vectors["c0"] = [x - 2.0 for x in query]
+    chunk_map = {cid: Chunk(id=cid, text=cid, document_id=cid[0], embedding=vec) for cid, vec in vectors.items()}
+    return chunk_map, query
+
+
+@pytest.mark.parametrize("strategy_cls", [LinearIndex, ClusteredIndex])
+@pytest.mark.parametrize("reduction", [ReductionType.PCA, ReductionType.TRUNCATE])
+def test_two_stage_grouped_search_keeps_every_document(strategy_cls, reduction, crowded_documents):
+    chunk_map, query = crowded_documents
+    index = strategy_cls(reducer=create_reducer_by_type(reduction, 4), candidate_multiplier=2)
+    index.rebuild(chunk_map)
+    assert index.reduced.reducer.fitted
+
+    results = index.search(query, 3, group_fn=lambda cid: chunk_map[cid].document_id, group_limit=2)
+    assert [cid[0] for cid, _ in results] == ["a", "a", "b", "c"]
+
+
+def test_pca_range_search_stays_exact(low_rank_vectors):
+    exact = LinearIndex()
+    reduced = LinearIndex(reducer=create_reducer_by_type(ReductionType.PCA, 4))
+    for cid, vec in low_rank_vectors.items():
+        exact.add_vector(vec, cid)
+        reduced.add_vector(vec, cid)
+
+    # Fitted incrementally once enough vectors arrived; every vector has a reduced copy
+    assert reduced.reduced.reducer.fitted
+    assert len(reduced.reduced.vectors) == len(low_rank_vectors)
+    query = low_rank_vectors["c5"]
+    radius = sorted(euclidean_distance(query, v) for v in low_rank_vectors.values())[20]
+    assert reduced.search(query, None, max_distance=radius) == exact.search(query, None, max_distance=radius)
+
+
+@pytest.mark.parametrize("metric", ["euclidean", "cosine"])
+def test_lsh_index_recall_and_incremental_updates(metric, low_rank_vectors):
+    from app.utils.similarity import cosine_distance
+    distance_fn = cosine_distance if metric == "cosine" else euclidean_distance
+    index = LSHIndex(distance_fn=distance_fn, num_tables=6, num_bits=8, bucket_width=8.0)
+    oracle = LinearIndex(distance_fn=distance_fn)
+    for cid, vec in low_rank_vectors.items():
+        index.add_vector(vec, cid)
+        oracle.add_vector(vec, cid)
+
+    query = [x + 0.01 for x in low_rank_vectors["c3"]]
+    expected = {cid for cid, _ in oracle.search(query, 10)}
+    results = index.search(query, 10)
+    assert results[0][0] == "c3"
+    assert len({cid for cid, _ in results} & expected) >= 8
+
+    # Tables exist now and are maintained in place
+    index.remove_vector("c3")
+    assert "c3" not in {cid for cid, _ in index.search(query, 10)}
+    index.add_vector(low_rank_vectors["c3"], "c3")
+    assert index.search(query, 1)[0][0] == "c3"
+    tables = next(iter(index.tables.values()))
+    assert len(tables.ids) == len(tables.rows) == len(low_rank_vectors)
+
+
+@pytest.mark.parametrize("metric", ["euclidean", "cosine"])
+def test_lsh_multi_probe_finds_more_candidates(metric, low_rank_vectors):
+    from app.utils.similarity import cosine_distance
+    distance_fn = cosine_distance if metric == "cosine" else euclidean_distance
+    found = []
+    for probes in (0, 4):
+        index = LSHIndex(distance_fn=distance_fn, num_tables=2, num_bits=8, probes=probes, bucket_width=20.0)
+        for cid, vec in low_rank_vectors.items():
+            index.add_vector(vec, cid)
+        # Range queries score every bucket hit, so the result size counts the candidates
+        found.append(len(index.search(low_rank_vectors["c7"], None)))
+    assert 0 < found[0] < found[1]
+
+
+def test_popcount_fallback_matches_bitwise_count():
+    values = np.random.default_rng(3).integers(0, 256, size=(5, 4, 2), dtype=np.uint8)
+    expected = [[[bin(int(v)).count("1") for v in row] for row in table] for table in values]
+    assert _unpacked_popcount(values).tolist() == expected
+    assert popcount(values).tolist() == expected
+
+
+@pytest.mark.parametrize("distance_fn", [euclidean_distance, cosine_distance])
+def test_mapped_index_matches_linear_index(distance_fn, chunk_map):
+    ids = list(chunk_map)
+    matrix = np.array([chunk_map[cid].embedding for cid in ids])
+    mapped = MappedIndex(matrix, ids, distance_fn=distance_fn, block_size=64)
+    linear = LinearIndex(distance_fn=distance_fn)
+    linear.rebuild(chunk_map)
+    query = [0.2, -0.4, 0.1]
+    group_fn = lambda cid: chunk_map[cid].document_id
+
+    for kwargs in [{"k": 10}, {"k": None, "max_distance": 0.5}, {"k": 3, "group_fn": group_fn, "group_limit": 2}]:
+        expected = linear.search(query, **kwargs)
+        results = mapped.search(query, **kwargs)
+        assert [cid for cid, _ in results] == [cid for cid, _ in expected]
+        assert [d for _, d in results] == pytest.approx([d for _, d in expected])
+
+    with pytest.raises(RuntimeError):
+        mapped.add_vector([0.0, 0.0, 0.0], "new")
+
+
+@pytest.mark.parametrize("strategy_cls", [LinearIndex, ClusteredIndex, LSHIndex])
+def test_query_distance_fn_does_not_change_the_shared_index(strategy_cls, chunk_map):
+    index = strategy_cls()
+    index.rebuild(chunk_map)
+    oracles = {}
+    for distance_fn in [cosine_distance, euclidean_distance]:
+        oracles[distance_fn] = LinearIndex(distance_fn=distance_fn)
+        oracles[distance_fn].rebuild(chunk_map)
+    query = [0.9, 0.1, -0.3]
+
+    # Range queries are exact for every strategy, so both metrics can be checked against an oracle
+    cosine = index.search(query, None, max_distance=0.05, distance_fn=cosine_distance)
+    assert sorted(cosine) == sorted(oracles[cosine_distance].search(query, None, max_distance=0.05))
+    assert index.distance_fn is euclidean_distance
+    euclidean = index.search(query, None, max_distance=0.5)
+    assert sorted(euclidean) == sorted(oracles[euclidean_distance].search(query, None, max_distance=0.5))
+
+
+@pytest.mark.parametrize("strategy_cls", [LinearIndex, ClusteredIndex])
+@pytest.mark.parametrize("precision", [Precision.FLOAT32, Precision.FLOAT16, Precision.INT8])
+@pytest.mark.parametrize("distance_fn", [euclidean_distance, cosine_distance])
+def test_quantized_search_rescores_to_exact_results(strategy_cls, precision, distance_fn, low_rank_vectors):
+    exact = strategy_cls(distance_fn=distance_fn)
+    quantized = strategy_cls(distance_fn=distance_fn, quantization=Quantization(precision))
+    for cid, vec in low_rank_vectors.items():
+        exact.add_vector(vec, cid)
+        quantized.add_vector(vec, cid)
+    for cid in ["c1", "c2", "c3"]:
+        exact.remove_vector(cid)
+        quantized.remove_vector(cid)
+
+    for query in [low_rank_vectors["c0"], low_rank_vectors["c50"]]:
+        assert quantized.search(query, 10) == exact.search(query, 10)
+    radius = sorted(distance_fn(query, v) for v in low_rank_vectors.values())[20]
+    assert quantized.search(query, None, max_distance=radius) == exact.search(query, None, max_distance=radius)
+
+
+@pytest.mark.parametrize("strategy_cls", [LinearIndex, ClusteredIndex])
+@pytest.mark.parametrize("precision", [Precision.FLOAT32, Precision.INT8])
+def test_quantized_grouped_search_keeps_every_document(strategy_cls, precision, crowded_documents):
+    chunk_map, query = crowded_documents
+    index = strategy_cls(quantization=Quantization(precision, candidate_multiplier=2))
+    index.rebuild(chunk_map)
+
+    results = index.search(query, 3, group_fn=lambda cid: chunk_map[cid].document_id, group_limit=2)
+    assert [cid[0] for cid, _ in results] == ["a", "a", "b", "c"]
+
+
+def test_int8_quantization_refits_as_the_index_grows(low_rank_vectors):
+    index = LinearIndex(quantization=Quantization(Precision.INT8, rescore=False))
+    for cid, vec in list(low_rank_vectors.items())[:100]:
+        index.add_vector(vec, cid)
+    assert index.quantization.quantizer.fitted_size == 64
+    assert index.quantized.codes.dtype == np.int8 and len(index.quantized) == 100
+
+    # Without rescoring distances are approximate, but close to the exact ones
+    query = low_rank_vectors["c7"]
+    results = index.search(query, 5)
+    assert results[0][0] == "c7"
+    assert all(d == pytest.approx(euclidean_distance(query, low_rank_vectors[cid]), abs=0.1) for cid, d in results)
+
+    index.rebuild({cid: Chunk(id=cid, text=cid, document_id="d", embedding=vec) for cid, vec in low_rank_vectors.items()})
+    assert index.quantization.quantizer.fitted_size == len(index.quantized) == len(low_rank_vectors)
+
+
+@pytest.mark.parametrize("strategy_cls", [LinearIndex, ClusteredIndex])
+@pytest.mark.parametrize("rescore", [True, False])
+def test_quantized_index_reads_full_vectors_from_the_stored_chunks(strategy_cls, rescore, low_rank_vectors):
+    stored = {}
+    held = strategy_cls(quantization=Quantization(Precision.INT8, rescore=rescore))
+    looked_up = strategy_cls(quantization=Quantization(Precision.INT8, rescore=rescore), vector_lookup=stored.get)
+    for cid, vec in low_rank_vectors.items():
+        stored[cid] = vec
+        held.add_vector(vec, cid)
+        looked_up.add_vector(vec, cid)
+    for cid in ["c1", "c2", "c3"]:
+        del stored[cid]
+        held.remove_vector(cid)
+        looked_up.remove_vector(cid)
+
+    # Only the quantized rows are kept; refits, rescoring and range queries use the lookup
+    if strategy_cls is LinearIndex:
+        assert looked_up.vectors == {}
+    else:
+        assert all(vector is None for cluster in looked_up.clusters for vector in cluster.values())
+    assert looked_up.quantized_bytes() == held.quantized_bytes() > 0
+    for query in [low_rank_vectors["c0"], low_rank_vectors["c50"]]:
+        assert looked_up.search(query, 10) == held.search(query, 10)
+        assert looked_up.search(query, None, max_distance=0.5) == held.search(query, None, max_distance=0.5)
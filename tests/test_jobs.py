@@ -0,0 +1,126 @@
+import json
+import time
+from fastapi.testclient import TestClient
+from app.main import app
+from app.core.db import db
+from app.core.jobs import JobManager
+from app.models.chunk_models import ChunkInput
+from app.models.job_models import IngestionJob, JobStatus
+
+client = TestClient(app)
+
+CHUNK_METADATA = {"source": "jobs", "created_at": "2023-04-01T12:45:00Z", "author": "tester", "language": "en"}
+
+
+def _create_library_and_document():
+    library_id = client.post("/libraries/", json={
+        "name": "Ingest Library",
+        "metadata": {"created_by": "tester", "created_at": "2023-04-01T12:00:00Z", "use_case": "ingestion"}
+    }).json()["id"]
+    document_id = client.post(f"/libraries/{library_id}/documents/", json={
+        "title": "Bulk Doc",
+        "metadata": {"category": "bulk", "created_at": "2023-04-01T12:30:00Z", "source_type": "manual", "tags": []}
+    }).json()["id"]
+    return library_id, document_id
+
+
+def _wait_for(manager, job_id, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = manager.get(job_id)
+        if job.status in (JobStatus.COMPLETED, JobStatus.FAILED):
+            return job
+        time.sleep(0.01)
+    raise AssertionError("job did not finish")
+
+
+def test_ingestion_job_reports_progress(fake_provider):
+    library_id, document_id = _create_library_and_document()
+    chunks = [{"text": f"chunk {i}", "metadata": CHUNK_METADATA} for i in range(10)]
+
+    resp = client.post(f"/libraries/{library_id}/documents/{document_id}/ingest", json={"chunks": chunks})
+    assert resp.status_code == 202
+    job_id = resp.json()["id"]
+
+    from app.core.jobs import job_manager
+    _wait_for(job_manager, job_id)
+    status = client.get(f"/jobs/{job_id}").json()
+    assert status["status"] == "completed"
+    assert status["processed"] == 10
+    assert status["progress"] == 1.0
+    assert len(db.get_library(library_id).documents[document_id].chunk_ids) == 10
+    client.delete(f"/libraries/{library_id}")
+
+
+def test_interrupted_job_resumes_from_cursor(fake_provider, tmp_path):
+    library_id, document_id = _create_library_and_document()
+    chunks = [{"text": f"chunk {i}", "metadata": CHUNK_METADATA} for i in range(7)]
+
+    # Checkpoint of a job that committed its first batch (chunks 0-2) before the process died
+    job = IngestionJob(library_id=library_id, document_id=document_id, status=JobStatus.RUNNING,
+                       total=7, processed=3, created_at="2023-04-01T12:45:00Z")
+    (tmp_path / f"{job.id}.json").write_text(json.dumps(job.model_dump(exclude={"progress"})))
+    (tmp_path / "inputs").mkdir()
+    (tmp_path / "inputs" / f"{job.id}.json").write_text(json.dumps(chunks))
+
+    resumed = JobManager(jobs_dir=tmp_path, batch_size=3)
+    resumed.resume_pending()
+    finished = _wait_for(resumed, job.id)
+    assert finished.status == JobStatus.COMPLETED
+    assert finished.processed == 7
+    assert len(db.get_library(library_id).documents[document_id].chunk_ids) == 4
+    client.delete(f"/libraries/{library_id}")
+
+
+def test_job_inputs_are_written_once_and_dropped_when_done(fake_provider, tmp_path, monkeypatch):
+    library_id, document_id = _create_library_and_document()
+    manager = JobManager(jobs_dir=tmp_path, batch_size=2)
+    writes = []
+    write = manager._write
+    monkeypatch.setattr(manager, "_write", lambda path, payload: (writes.append(path.parent.name), write(path, payload)))
+
+    job = manager.submit(library_id, document_id, [ChunkInput(text=f"chunk {i}") for i in range(7)])
+    assert _wait_for(manager, job.id).status == JobStatus.COMPLETED
+    # Inputs once, then the job on submit, after each of the 4 batches and on completion
+    assert writes.count("inputs") == 1
+    assert writes.count(tmp_path.name) == 6
+    assert not (tmp_path / "inputs" / f"{job.id}.json").exists()
+    assert job.id not in manager._inputs
+    client.delete(f"/libraries/{library_id}")
+
+
+def test_finished_jobs_expire(fake_provider, tmp_path):
+    library_id, document_id = _create_library_and_document()
+    manager = JobManager(jobs_dir=tmp_path, retention_seconds=0)
+    job = manager.submit(library_id, document_id, [ChunkInput(text="chunk")])
+    _wait_for(manager, job.id)
+
+    assert manager.list() == []
+    assert manager.get(job.id) is None
+    assert not (tmp_path / f"{job.id}.json").exists()
+    client.delete(f"/libraries/{library_id}")
+
+
+def test_transient_provider_errors_are_retried(fake_provider, tmp_path, monkeypatch):
+    library_id, document_id = _create_library_and_document()
+    failures = iter([TimeoutError("provider timed out")])
+    embed = fake_provider.embed
+
+    def flaky(texts):
+        error = next(failures, None)
+        if error:
+            raise error
+        return embed(texts)
+
+    monkeypatch.setattr(fake_provider, "embed", flaky)
+    monkeypatch.setattr("app.core.jobs.time.sleep", lambda seconds: None)
+    manager = JobManager(jobs_dir=tmp_path)
+    job = _wait_for(manager, manager.submit(library_id, document_id, [ChunkInput(text="chunk")]).id)
+    assert job.status == JobStatus.COMPLETED
+    assert job.errors == ["batch at 0: provider timed out"]
+
+    # A deleted library is not retried
+    client.delete(f"/libraries/{library_id}")
+    job = _wait_for(manager, manager.submit(library_id, document_id, [ChunkInput(text="again")]).id)
+    assert job.status == JobStatus.FAILED
+    assert len(job.errors) == 1
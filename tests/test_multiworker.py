@@ -0,0 +1,139 @@
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+import app.core.db as db_module
+import app.routers.query as query_router
+from app.core.db import InMemoryDB
+from app.core.snapshots import SnapshotDB, SnapshotExporter
+from app.main import app
+from app.models.chunk_models import Chunk
+from app.models.document_models import Document
+from app.models.library_models import Library
+from app.models.metadata_models import ChunkMetadata, LibraryMetadata
+
+CHUNK_METADATA = ChunkMetadata(source="workers", created_at="2023-04-01T12:45:00Z", author="tester", language="en")
+
+
+@pytest.fixture
+def writer_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(db_module, "PERSIST_PATH", tmp_path / "db.json")
+    monkeypatch.setattr(db_module, "CHANGES_PATH", tmp_path / "changes.jsonl")
+    return InMemoryDB()
+
+
+@pytest.fixture
+def exporter(writer_db, tmp_path):
+    return SnapshotExporter(writer_db, directory=tmp_path / "snapshots", interval=0, max_delay=0)
+
+
+@pytest.fixture
+def reader_db(tmp_path):
+    return SnapshotDB(directory=tmp_path / "snapshots", poll_interval=0)
+
+
+def _add_library(database, name, n=20):
+    metadata = LibraryMetadata(created_by="tester", created_at="2023-04-01T12:00:00Z", use_case="workers")
+    library = Library(name=name, metadata=metadata)
+    database.add_library(library)
+    document = Document(library_id=library.id, title=name, metadata=None)
+    library.documents[document.id] = document
+    chunks = [Chunk(text=f"{name} {i:04d}", document_id=document.id, embedding=[float(i), 1.0, 1.0, 1.0],
+                    metadata=CHUNK_METADATA) for i in range(n)]
+    database.add_chunks(library.id, document.id, chunks)
+    return library.id, document.id
+
+
+def test_reader_serves_published_snapshots(writer_db, exporter, reader_db):
+    lid, doc_id = _add_library(writer_db, "first")
+    canonical = next(iter(writer_db.get_library(lid).chunk_map.values()))
+    linked = Chunk(text=canonical.text, document_id=doc_id, embedding=canonical.embedding, duplicate_of=canonical.id)
+    writer_db.add_chunks(lid, doc_id, [linked])
+    assert exporter.export_changed()
+
+    query = [3.2, 1.0, 1.0, 1.0]
+    expected = writer_db.get_indexing_service(lid).search_chunks(query, k=3)
+    results = reader_db.get_indexing_service(lid).search_chunks(query, k=3)
+    assert [cid for cid, _ in results] == [cid for cid, _ in expected]
+    assert reader_db.get_library_version(lid) == writer_db.get_library_version(lid)
+
+    library = reader_db.get_library(lid)
+    assert library.documents[doc_id].title == "first"
+    # Embeddings are views into the mapped snapshot; linked duplicates see their canonical row
+    assert isinstance(library.chunk_map[canonical.id].embedding, np.memmap)
+    assert list(library.chunk_map[linked.id].embedding) == canonical.embedding
+
+
+def test_readers_follow_new_generations(writer_db, exporter, reader_db, tmp_path):
+    first, doc_id = _add_library(writer_db, "first")
+    second, _ = _add_library(writer_db, "second")
+    exporter.export_changed()
+    assert not exporter.export_changed()
+    assert len(reader_db.list_libraries()) == 2
+    unchanged = reader_db.get_indexing_service(second)
+
+    writer_db.add_chunks(first, doc_id, [Chunk(text="new", document_id=doc_id, embedding=[100.0, 1.0, 1.0, 1.0])])
+    # Nothing is visible until the writer publishes
+    assert len(reader_db.get_library(first).chunk_map) == 20
+    exporter.export_changed()
+    assert len(reader_db.get_library(first).chunk_map) == 21
+    results = reader_db.get_indexing_service(first).search_chunks([99.0, 1.0, 1.0, 1.0], k=1)
+    assert reader_db.get_library(first).chunk_map[results[0][0]].text == "new"
+    # Libraries that did not change are not reloaded
+    assert reader_db.get_indexing_service(second) is unchanged
+
+    writer_db.delete_library(second)
+    exporter.export_changed()
+    assert reader_db.get_library(second) is None
+    writer_db.add_chunks(first, doc_id, [Chunk(text="newer", document_id=doc_id, embedding=[0.0, 0.0, 0.0, 0.0])])
+    exporter.export_changed()
+    # Files of the current and the previous generation are kept, older ones are removed
+    names = {path.stem for path in (tmp_path / "snapshots").glob("*.npy")}
+    assert len(names) == 2
+    assert f"{first}-{writer_db.get_library_version(first)}" in names
+    assert not any(name.startswith(second) for name in names)
+
+
+def test_query_endpoint_on_reader(writer_db, exporter, reader_db, monkeypatch):
+    lid, _ = _add_library(writer_db, "served")
+    exporter.export_changed()
+    monkeypatch.setattr(query_router, "db", reader_db)
+
+    client = TestClient(app)
+    response = client.post("/query", json={"library_id": lid, "query_vector": [7.1, 1.0, 1.0, 1.0], "k": 2})
+    assert response.status_code == 200
+    assert [hit["text"] for hit in response.json()] == ["served 0007", "served 0008"]
+
+
+def test_changing_libraries_are_rewritten_once_they_settle(writer_db, tmp_path, reader_db):
+    exporter = SnapshotExporter(writer_db, directory=tmp_path / "snapshots", interval=0, max_delay=60)
+    lid, doc_id = _add_library(writer_db, "busy")
+    assert exporter.export_changed()  # new libraries are published right away
+
+    for i in range(3):
+        writer_db.add_chunks(lid, doc_id, [Chunk(text=f"more {i}", document_id=doc_id, embedding=[float(i), 0.0, 0.0, 0.0])])
+        assert not exporter.export_changed()  # still changing: no rewrite yet
+    assert exporter.export_changed()  # unchanged since the last tick
+    assert len(reader_db.get_library(lid).chunk_map) == 23
+
+    exporter.max_delay = 0
+    writer_db.add_chunks(lid, doc_id, [Chunk(text="late", document_id=doc_id, embedding=[9.0, 0.0, 0.0, 0.0])])
+    assert exporter.export_changed()  # waited long enough
+
+
+def test_evicted_libraries_are_exported_without_reloading(tmp_path, monkeypatch, reader_db):
+    monkeypatch.setattr(db_module, "PERSIST_PATH", tmp_path / "db.json")
+    monkeypatch.setattr(db_module, "CHANGES_PATH", tmp_path / "changes.jsonl")
+    monkeypatch.setattr(db_module, "SPILL_DIR", tmp_path / "spill")
+    monkeypatch.setattr(db_module, "DB_EVICTION_MIN_IDLE_SECONDS", 0)
+    # Room for roughly one library of 20 four-dim chunks
+    writer_db = InMemoryDB(memory_budget_bytes=20 * (4 * 32 + 256 + 10) + 100)
+    first, _ = _add_library(writer_db, "first")
+    second, _ = _add_library(writer_db, "second")
+    assert writer_db.memory_stats()["evicted_libraries"] == 1
+
+    SnapshotExporter(writer_db, directory=tmp_path / "snapshots", interval=0, max_delay=0).export_changed()
+    stats = writer_db.memory_stats()
+    assert stats["evicted_libraries"] == 1 and stats["reloads"] == 0
+    assert {len(reader_db.get_library(lid).chunk_map) for lid in (first, second)} == {20}
+    results = reader_db.get_indexing_service(first).search_chunks([3.0, 1.0, 1.0, 1.0], k=1)
+    assert reader_db.get_library(first).chunk_map[results[0][0]].text == "first 0003"
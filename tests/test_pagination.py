@@ -0,0 +1,88 @@
+import json
+from fastapi.testclient import TestClient
+from app.main import app
+
+client = TestClient(app)
+
+LIBRARY = {
+    "name": "Paged Library",
+    "metadata": {
+        "created_by": "tester",
+        "created_at": "2023-04-01T12:00:00Z",
+        "use_case": "pagination",
+    }
+}
+
+
+def _document(title):
+    return {
+        "title": title,
+        "metadata": {
+            "category": "paging",
+            "created_at": "2023-04-01T12:30:00Z",
+            "source_type": "manual",
+            "tags": []
+        }
+    }
+
+
+def test_documents_cursor_pagination_and_projection():
+    library_id = client.post("/libraries/", json=LIBRARY).json()["id"]
+    created = [
+        client.post(f"/libraries/{library_id}/documents/", json=_document(f"Doc {i}")).json()["id"]
+        for i in range(5)
+    ]
+
+    seen = []
+    cursor = None
+    while True:
+        params = {"limit": 2, "fields": "title"}
+        if cursor:
+            params["cursor"] = cursor
+        resp = client.get(f"/libraries/{library_id}/documents/", params=params)
+        assert resp.status_code == 200
+        for doc in resp.json():
+            assert set(doc) == {"id", "title"}
+            seen.append(doc["id"])
+        cursor = resp.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    assert seen == created
+
+    bad = client.get(f"/libraries/{library_id}/documents/", params={"fields": "nope"})
+    assert bad.status_code == 400
+    client.delete(f"/libraries/{library_id}")
+
+
+def test_unpaged_lists_return_every_item():
+    library_id = client.post("/libraries/", json=LIBRARY).json()["id"]
+    created = [
+        client.post(f"/libraries/{library_id}/documents/", json=_document(f"Doc {i}")).json()["id"]
+        for i in range(105)
+    ]
+
+    # Clients that predate pagination send neither limit nor cursor and get the whole list
+    resp = client.get(f"/libraries/{library_id}/documents/")
+    assert [doc["id"] for doc in resp.json()] == created
+    assert "X-Next-Cursor" not in resp.headers
+
+    # Paging clients keep the default page size when they follow a cursor without a limit
+    first = client.get(f"/libraries/{library_id}/documents/", params={"limit": 2})
+    rest = client.get(f"/libraries/{library_id}/documents/", params={"cursor": first.headers["X-Next-Cursor"]})
+    assert [doc["id"] for doc in rest.json()] == created[2:102]
+    assert rest.headers["X-Next-Cursor"]
+    client.delete(f"/libraries/{library_id}")
+
+
+def test_libraries_ndjson_stream_excludes_documents_by_default():
+    library_id = client.post("/libraries/", json=LIBRARY).json()["id"]
+    client.post(f"/libraries/{library_id}/documents/", json=_document("Doc"))
+
+    resp = client.get("/libraries/", params={"format": "ndjson"})
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in resp.text.splitlines()]
+    row = next(r for r in rows if r["id"] == library_id)
+    assert "documents" not in row
+    assert row["document_count"] == 1
+    client.delete(f"/libraries/{library_id}")
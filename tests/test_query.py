@@ -100,3 +100,144 @@ def test_chunk_index_add_delete_and_query(test_library, test_document, fruit_chu
     returned_ids_after = [res["chunk_id"] for res in results_after_delete]
     assert chunk_to_delete not in returned_ids_after, "Deleted chunk still appears in query results"
     logger.info(f"Search Results (after delete): {results_after_delete}")
+
+
+def _library_with_vectors(vectors):
+    library_id = client.post("/libraries/", json={
+        "name": "Vector Library",
+        "metadata": {
+            "created_by": "index-tester",
+            "created_at": "2023-04-01T12:00:00Z",
+            "use_case": "vector-search",
+            "index_type": "linear"
+        }
+    }).json()["id"]
+    document_id = client.post(f"/libraries/{library_id}/documents/", json={
+        "title": "Vector Doc",
+        "metadata": {"category": "indexing", "created_at": "2023-04-01T12:30:00Z", "source_type": "manual", "tags": []}
+    }).json()["id"]
+    metadata = {"created_at": "2023-04-01T12:45:00Z", "author": "index-test", "language": "en", "source": "query-fixture"}
+    # The fake provider embeds text by its length, so "x" * n lands at [n, 1, 1, 1]
+    chunk_ids = [
+        client.post(f"/libraries/{library_id}/documents/{document_id}/chunks/",
+                    json={"text": "x" * n, "metadata": metadata}).json()["id"]
+        for n in vectors
+    ]
+    return library_id, chunk_ids
+
+
+def test_query_by_vector_and_chunk_id_skip_embedding(fake_provider):
+    library_id, chunk_ids = _library_with_vectors([1, 2, 5, 9])
+    calls_before = fake_provider.calls
+
+    by_vector = client.post("/query", json={"library_id": library_id, "query_vector": [2.1, 1, 1, 1], "k": 2})
+    assert by_vector.status_code == 200
+    assert [r["chunk_id"] for r in by_vector.json()] == [chunk_ids[1], chunk_ids[0]]
+
+    by_chunk = client.post("/query", json={"library_id": library_id, "chunk_id": chunk_ids[2], "k": 1})
+    assert [r["chunk_id"] for r in by_chunk.json()] == [chunk_ids[1]]
+
+    batch = client.post("/query/similar", json={"library_id": library_id, "chunk_ids": chunk_ids[:2], "k": 1}).json()
+    assert [r["chunk_id"] for r in batch[chunk_ids[0]]] == [chunk_ids[1]]
+    assert [r["chunk_id"] for r in batch[chunk_ids[1]]] == [chunk_ids[0]]
+    assert fake_provider.calls == calls_before
+
+    wrong_dim = client.post("/query", json={"library_id": library_id, "query_vector": [1.0, 2.0], "k": 1})
+    assert wrong_dim.status_code == 400
+    ambiguous = client.post("/query", json={"library_id": library_id, "query_text": "x", "chunk_id": chunk_ids[0]})
+    assert ambiguous.status_code == 422
+    client.delete(f"/libraries/{library_id}")
+
+
+def test_federated_query_merges_libraries(fake_provider):
+    first_id, first_chunks = _library_with_vectors([1, 8])
+    second_id, second_chunks = _library_with_vectors([3, 20])
+    calls_before = fake_provider.calls
+
+    resp = client.post("/query/federated", json={
+        "library_ids": [first_id, second_id, "missing-library"],
+        "query_text": "xxx",
+        "k": 3,
+    })
+    assert resp.status_code == 200
+    body = resp.json()
+    assert [(r["library_id"], r["chunk_id"]) for r in body["results"]] == [
+        (second_id, second_chunks[0]), (first_id, first_chunks[0]), (first_id, first_chunks[1])
+    ]
+    assert body["partial"] is True
+    assert list(body["failed_libraries"]) == ["missing-library"]
+    assert fake_provider.calls == calls_before + 1  # embedded once for all libraries
+
+    client.delete(f"/libraries/{first_id}")
+    client.delete(f"/libraries/{second_id}")
+
+
+def test_range_query_with_score_cutoff(fake_provider):
+    library_id, chunk_ids = _library_with_vectors([1, 2, 5, 40])
+
+    resp = client.post("/query", json={
+        "library_id": library_id, "query_vector": [1.5, 1, 1, 1], "k": None, "max_distance": 1.0
+    })
+    assert resp.status_code == 200
+    assert sorted(r["chunk_id"] for r in resp.json()) == sorted(chunk_ids[:2])
+
+    cosine = client.post("/query", json={
+        "library_id": library_id, "query_vector": [40, 1, 1, 1], "k": 10,
+        "distance_metric": "cosine", "min_score": 0.95
+    }).json()
+    assert [r["chunk_id"] for r in cosine][0] == chunk_ids[3]
+    assert all(r["score"] >= 0.95 for r in cosine)
+    assert [r["score"] for r in cosine] == sorted((r["score"] for r in cosine), reverse=True)
+
+    invalid = client.post("/query", json={"library_id": library_id, "query_vector": [1, 1, 1, 1], "min_score": 0.8})
+    assert invalid.status_code == 422
+    client.delete(f"/libraries/{library_id}")
+
+
+def test_query_grouped_by_document(fake_provider):
+    library_id, chunk_ids = _library_with_vectors([1, 2, 3])
+    other_document = client.post(f"/libraries/{library_id}/documents/", json={
+        "title": "Other Doc",
+        "metadata": {"category": "indexing", "created_at": "2023-04-01T12:30:00Z", "source_type": "manual", "tags": []}
+    }).json()["id"]
+    metadata = {"created_at": "2023-04-01T12:45:00Z", "author": "index-test", "language": "en", "source": "query-fixture"}
+    client.post(f"/libraries/{library_id}/documents/{other_document}/chunks/", json={"text": "x" * 10, "metadata": metadata})
+
+    resp = client.post("/query", json={
+        "library_id": library_id, "query_vector": [1, 1, 1, 1], "k": 2, "group_by": "document", "chunks_per_group": 2
+    })
+    assert resp.status_code == 200
+    groups = resp.json()
+    assert [g["title"] for g in groups] == ["Vector Doc", "Other Doc"]
+    assert [c["chunk_id"] for c in groups[0]["chunks"]] == chunk_ids[:2]
+    assert groups[0]["score"] == groups[0]["chunks"][0]["score"]
+    assert len(groups[1]["chunks"]) == 1
+    client.delete(f"/libraries/{library_id}")
+
+
+def test_repeated_query_is_served_from_cache_until_the_library_changes(fake_provider):
+    library_id, chunk_ids = _library_with_vectors([1, 5])
+    document_id = client.get(f"/libraries/{library_id}/documents/").json()[0]["id"]
+    query = {"library_id": library_id, "query_text": "xx", "k": 1}
+
+    def counts():
+        stats = client.get("/query/cache/stats").json()
+        return stats["hits"], stats["misses"]
+
+    hits, misses = counts()
+    first = client.post("/query", json=query)
+    assert counts() == (hits, misses + 1)
+    calls = fake_provider.calls
+    repeated = client.post("/query", json=query)
+    assert counts() == (hits + 1, misses + 1)
+    assert repeated.json() == first.json() and [r["chunk_id"] for r in first.json()] == [chunk_ids[0]]
+    assert fake_provider.calls == calls  # a hit is not embedded again
+
+    # Adding a chunk bumps the library version, so the cached result is no longer used
+    metadata = {"created_at": "2023-04-01T12:45:00Z", "author": "index-test", "language": "en", "source": "query-fixture"}
+    closer = client.post(f"/libraries/{library_id}/documents/{document_id}/chunks/",
+                         json={"text": "xx", "metadata": metadata}).json()["id"]
+    after_insert = client.post("/query", json=query)
+    assert counts() == (hits + 1, misses + 2)
+    assert [r["chunk_id"] for r in after_insert.json()] == [closer]
+    client.delete(f"/libraries/{library_id}")
@@ -0,0 +1,110 @@
+import threading
+import time
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.core.db import InMemoryDB, db
+from app.core.replication import Replica
+from tests.test_jobs import CHUNK_METADATA, _create_library_and_document
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def replica():
+    return Replica(InMemoryDB(persist=False), client=client, replica_id="test-follower")
+
+
+def _assert_replicated(replica, library_id):
+    primary = db.get_library(library_id)
+    follower = replica.database.get_library(library_id)
+    assert follower is not None
+    assert follower.name == primary.name and follower.metadata == primary.metadata
+    assert follower.documents == primary.documents
+    assert follower.chunk_map == primary.chunk_map
+    query = next(iter(primary.chunk_map.values())).embedding
+    assert (replica.database.get_indexing_service(library_id).search_chunks(query, k=3)
+            == db.get_indexing_service(library_id).search_chunks(query, k=3))
+
+
+def _add_chunk(library_id, document_id, text):
+    response = client.post(f"/libraries/{library_id}/documents/{document_id}/chunks/",
+                           json={"text": text, "metadata": CHUNK_METADATA})
+    assert response.status_code == 200
+    return response
+
+
+def test_follower_applies_the_primary_log(fake_provider, replica):
+    library_id, document_id = _create_library_and_document()
+    _add_chunk(library_id, document_id, "seed")
+    replica.catch_up()  # starts from a snapshot
+    _assert_replicated(replica, library_id)
+
+    chunks_url = f"/libraries/{library_id}/documents/{document_id}/chunks"
+    first = _add_chunk(library_id, document_id, "alpha").json()
+    second = _add_chunk(library_id, document_id, "beta").json()
+    client.put(f"{chunks_url}/{first['id']}", json={"text": "alpha, edited", "metadata": CHUNK_METADATA})
+    client.delete(f"{chunks_url}/{second['id']}")
+    other_document = client.post(f"/libraries/{library_id}/documents/", json={
+        "title": "Second Doc",
+        "metadata": {"category": "bulk", "created_at": "2023-04-01T12:30:00Z", "source_type": "manual", "tags": []}
+    }).json()["id"]
+    _add_chunk(library_id, other_document, "gamma")
+
+    assert replica.status()["lag_seq"] == 0  # the follower has not heard of these yet
+    assert replica.catch_up() > 0
+    _assert_replicated(replica, library_id)
+    status = replica.status()
+    assert status["lag_seq"] == 0 and status["lag_seconds"] == 0.0
+    assert client.get("/replication/status").json()["followers"]["test-follower"]["applied_seq"] <= status["applied_seq"]
+
+    client.delete(f"/libraries/{library_id}")
+    replica.catch_up()
+    assert replica.database.get_library(library_id) is None
+
+
+def test_follower_resyncs_when_the_log_was_truncated(fake_provider, replica):
+    library_id, document_id = _create_library_and_document()
+    _add_chunk(library_id, document_id, "seed")
+    replica.catch_up()
+
+    _add_chunk(library_id, document_id, "missed")
+    replica.applied_seq = 10 ** 9  # a position the primary cannot resume from
+    replica.sync_once()
+    assert replica.resyncs == 2
+    _assert_replicated(replica, library_id)
+
+
+def test_read_your_writes_waits_for_the_written_seq(fake_provider, replica):
+    library_id, document_id = _create_library_and_document()
+    replica.catch_up()
+
+    written = int(_add_chunk(library_id, document_id, "fresh").headers["X-Change-Seq"])
+    assert not replica.wait_for(written, timeout=0.05)
+    syncer = threading.Thread(target=replica.catch_up)
+    syncer.start()
+    assert replica.wait_for(written, timeout=5)
+    syncer.join()
+    assert any(chunk.text == "fresh" for chunk in replica.database.get_library(library_id).chunk_map.values())
+
+
+def test_follower_rebuilds_its_index_when_precision_changes(fake_provider, replica):
+    library_id, document_id = _create_library_and_document()
+    _add_chunk(library_id, document_id, "seed")
+    replica.catch_up()
+    metadata = db.get_library(library_id).metadata.model_dump(mode="json")
+
+    for precision, rescore in [("int8", True), ("int8", False)]:
+        client.put(f"/libraries/{library_id}",
+                   json={"name": "Quantized", "metadata": {**metadata, "precision": precision, "rescore": rescore}})
+        replica.catch_up()
+        deadline = time.monotonic() + 5
+        while True:
+            quantization = replica.database.get_indexing_service(library_id).strategy.quantization
+            if quantization is not None and quantization.rescore == rescore:
+                break
+            assert time.monotonic() < deadline, "follower kept its old index"
+            time.sleep(0.01)
+        assert quantization.quantizer.precision.value == precision
+
+    client.delete(f"/libraries/{library_id}")
@@ -0,0 +1,193 @@
+import asyncio
+import threading
+import time
+import pytest
+import app.core.db as db_module
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+from app.main import app
+from app.core.db import InMemoryDB
+from app.models.chunk_models import Chunk
+from app.models.document_models import Document
+from app.models.library_models import Library
+from app.models.metadata_models import LibraryMetadata
+from app.core.scheduler import (
+    PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, PRIORITY_NORMAL, Gate, Overloaded, Scheduler, scheduler
+)
+
+client = TestClient(app)
+
+
+def test_released_slots_go_to_the_highest_priority_waiter():
+    gate = Gate("read", limit=1, max_queue=10, max_wait_ms=5000)
+    order = []
+
+    async def request(name, priority):
+        await gate.enter(priority)
+        order.append(name)
+        gate.leave(0.01)
+
+    async def scenario():
+        await gate.enter(PRIORITY_NORMAL)  # occupy the only slot
+        waiting = [asyncio.create_task(request(name, priority)) for name, priority in
+                   [("background", PRIORITY_BACKGROUND), ("crud", PRIORITY_NORMAL),
+                    ("search", PRIORITY_INTERACTIVE), ("search 2", PRIORITY_INTERACTIVE)]]
+        await asyncio.sleep(0.01)
+        assert gate.stats()["queued"] == 4
+        gate.leave(0.01)
+        await asyncio.gather(*waiting)
+
+    asyncio.run(scenario())
+    assert order == ["search", "search 2", "crud", "background"]
+    assert gate.stats()["active"] == 0
+
+
+def test_gate_sheds_load_instead_of_queueing():
+    async def scenario():
+        full = Gate("write", limit=1, max_queue=1, max_wait_ms=50)
+        await full.enter(PRIORITY_NORMAL)
+        queued = asyncio.create_task(full.enter(PRIORITY_NORMAL))
+        await asyncio.sleep(0)
+        with pytest.raises(Overloaded) as rejected:
+            await full.enter(PRIORITY_NORMAL)  # queue full
+        assert rejected.value.status_code == 429 and rejected.value.retry_after >= 1
+        with pytest.raises(Overloaded) as timed_out:
+            await queued  # waited longer than max_wait
+        assert timed_out.value.status_code == 503
+
+        slow = Gate("read", limit=1, max_queue=10, max_wait_ms=100)
+        await slow.enter(PRIORITY_NORMAL)
+        slow.leave(2.0)  # average service time is now 0.4s, well over max_wait
+        await slow.enter(PRIORITY_NORMAL)
+        start = asyncio.get_running_loop().time()
+        with pytest.raises(Overloaded) as estimated:
+            await slow.enter(PRIORITY_NORMAL)
+        # Rejected up front from the estimated wait, without waiting out max_wait
+        assert estimated.value.status_code == 503 and asyncio.get_running_loop().time() - start < 0.05
+        assert slow.stats()["rejected"] == 1 and slow.stats()["queued"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_per_library_limit_and_background_writes():
+    local = Scheduler(library_concurrency=1, write_concurrency=1)
+
+    async def scenario():
+        async with local.admit(local.reads, PRIORITY_INTERACTIVE, "a"):
+            # Another library is not held up, the same library has to queue
+            async with local.admit(local.reads, PRIORITY_INTERACTIVE, "b"):
+                pass
+            second = local.admit(local.reads, PRIORITY_INTERACTIVE, "a")
+            entering = asyncio.create_task(second.__aenter__())
+            await asyncio.sleep(0.01)
+            assert local.stats()["libraries"]["a"]["queued"] == 1
+        await entering
+        await second.__aexit__(None, None, None)
+        assert local.stats()["libraries"] == {}
+
+    asyncio.run(scenario())
+
+    done = threading.Event()
+
+    def background():
+        with local.background_write("c"):
+            done.set()
+
+    async def writes():
+        async with local.admit(local.writes, PRIORITY_NORMAL, "c"):
+            thread = threading.Thread(target=background)
+            thread.start()
+            await asyncio.sleep(0.05)
+            assert not done.is_set()  # the job batch waits for the request's slot
+        return thread
+
+    asyncio.run(writes()).join(timeout=5)
+    assert done.is_set()
+
+
+def test_overloaded_requests_get_retry_after(monkeypatch):
+    busy = Gate("read", limit=1, max_queue=0, max_wait_ms=100)
+    monkeypatch.setattr(scheduler, "reads", busy)
+    asyncio.run(busy.enter(PRIORITY_NORMAL))
+
+    response = client.post("/query", json={"library_id": "missing", "k": 1, "query_vector": [1.0]})
+    assert response.status_code == 429 and response.headers["Retry-After"] == "1"
+    assert client.get("/stats/scheduler").status_code == 429  # GETs use the read gate too
+
+    busy.leave(0.0)
+    assert client.post("/query", json={"library_id": "missing", "k": 1, "query_vector": [1.0]}).status_code == 404
+    assert client.get("/stats/scheduler").json()["read"]["rejected"] == 2
+
+
+def test_streamed_responses_hold_their_slot_until_the_body_is_sent():
+    from app.main import admission_control
+    active = []
+
+    async def body():
+        for part in (b"a", b"b"):
+            active.append(scheduler.reads.stats()["active"])
+            yield part
+
+    async def call_next(request):
+        return StreamingResponse(body())
+
+    async def scenario():
+        request = Request({"type": "http", "method": "GET", "path": "/libraries/", "query_string": b"", "headers": []})
+        response = await admission_control(request, call_next)
+        assert scheduler.reads.stats()["active"] == 1
+        assert [part async for part in response.body_iterator] == [b"a", b"b"]
+
+    asyncio.run(scenario())
+    assert active == [1, 1]
+    assert scheduler.reads.stats()["active"] == 0
+
+
+def test_snapshots_are_admitted_but_long_polls_are_not():
+    def classify(path):
+        request = Request({"type": "http", "method": "GET", "path": path, "query_string": b"", "headers": []})
+        return asyncio.run(scheduler.classify(request))
+
+    assert classify("/replication/log") is None
+    assert classify("/replication/snapshot")[0] is scheduler.reads
+    assert classify("/backup/")[0] is scheduler.reads
+
+
+def test_reads_do_not_wait_for_the_database_save(tmp_path, monkeypatch):
+    monkeypatch.setattr(db_module, "PERSIST_PATH", tmp_path / "db.json")
+    monkeypatch.setattr(db_module, "CHANGES_PATH", tmp_path / "changes.jsonl")
+    database = InMemoryDB()
+    metadata = LibraryMetadata(created_by="tester", created_at="2023-04-01T12:00:00Z", use_case="persistence")
+    library = Library(name="busy", metadata=metadata)
+    database.add_library(library)
+    document = Document(library_id=library.id, title="doc", metadata=None)
+    library.documents[document.id] = document
+    assert database.flush()
+
+    # Make encoding db.json take as long as a large database would
+    encoding, release = threading.Event(), threading.Event()
+    encode = InMemoryDB._encode
+
+    def slow_encode(part, previous):
+        encoding.set()
+        release.wait(2)
+        return encode(part, previous)
+
+    monkeypatch.setattr(InMemoryDB, "_encode", staticmethod(slow_encode))
+    chunks = [Chunk(text=f"c{i}", document_id=document.id, embedding=[float(i), 1.0]) for i in range(100)]
+    writer = threading.Thread(target=database.add_chunks, args=(library.id, document.id, chunks))
+    writer.start()
+    assert encoding.wait(1)
+
+    # The save is in progress, yet reads and even other writes go through right away
+    start = time.monotonic()
+    assert database.get_library_version(library.id) is not None
+    assert len(database.get_library(library.id).chunk_map) == 100
+    database.add_chunks(library.id, document.id, [Chunk(text="late", document_id=document.id, embedding=[0.0, 0.0])])
+    assert time.monotonic() - start < 0.2
+    writer.join(1)
+    assert not writer.is_alive()
+
+    release.set()
+    assert database.flush()
+    assert len(InMemoryDB(memory_budget_bytes=0).get_library(library.id).chunk_map) == 101
@@ -0,0 +1,61 @@
+import gc
+import json
+import weakref
+from fastapi.testclient import TestClient
+from app.main import app
+from app.models import DocumentQueryResult, QueryResult
+from app.models.chunk_models import Chunk
+from app.utils.serialization import FragmentCache, dumps
+from tests.test_jobs import CHUNK_METADATA, _create_library_and_document
+
+client = TestClient(app)
+
+
+def test_fast_query_responses_match_the_response_models(fake_provider):
+    library_id, document_id = _create_library_and_document()
+    other_id = client.post(f"/libraries/{library_id}/documents/", json={
+        "title": "Other Doc",
+        "metadata": {"category": "bulk", "created_at": "2023-04-01T12:30:00Z", "source_type": "manual", "tags": []}
+    }).json()["id"]
+    for i in range(6):
+        client.post(f"/libraries/{library_id}/documents/{(document_id, other_id)[i % 2]}/chunks/",
+                    json={"text": "ü" * (i + 1), "metadata": CHUNK_METADATA})
+
+    query = {"library_id": library_id, "query_vector": [3.4, 1.0, 1.0, 1.0], "k": 4}
+    hits = client.post("/query", json=query).json()
+    assert [QueryResult(**hit).model_dump() for hit in hits] == hits
+    assert [hit["text"] for hit in hits] == ["üüü", "üüüü", "üü", "üüüüü"]
+
+    groups = client.post("/query", json={**query, "group_by": "document", "chunks_per_group": 2}).json()
+    assert [DocumentQueryResult(**group).model_dump() for group in groups] == groups
+    assert [group["title"] for group in groups] == ["Bulk Doc", "Other Doc"]
+
+    # Updates replace the chunk object, so its cached fragment is not reused
+    chunk_id = hits[0]["chunk_id"]
+    client.put(f"/libraries/{library_id}/documents/{document_id}/chunks/{chunk_id}",
+               json={"text": "abc", "metadata": CHUNK_METADATA})
+    hits = client.post("/query", json=query).json()
+    assert (hits[0]["chunk_id"], hits[0]["text"]) == (chunk_id, "abc")
+
+
+def test_fragment_cache_is_bounded_and_keyed_by_chunk_object():
+    cache = FragmentCache(max_entries=2)
+    chunks = [Chunk(text=f"text {i}", document_id="d", embedding=[1.0]) for i in range(3)]
+    for chunk in chunks:
+        assert json.loads(b"{" + cache.get(chunk) + b"}") == {"text": chunk.text, "metadata": None}
+    assert len(cache) == 2
+
+    # Same id, new object: the old fragment is not served
+    replaced = chunks[2].model_copy(update={"text": "replaced"})
+    assert b"replaced" in cache.get(replaced)
+
+    # Cached fragments do not keep chunks alive
+    probe = weakref.ref(replaced)
+    del replaced, chunks, chunk
+    gc.collect()
+    assert probe() is None
+
+
+def test_dumps_matches_the_standard_encoder():
+    value = {"text": "naïve – ✓", "score": 0.1 + 0.2, "tags": [], "none": None}
+    assert dumps(value) == json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode()